@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from typing import Optional
+
+from TwitchConnection import (BYTES_RECEIVED, CAPABILITIES, CONNECT_TIMEOUT, CONNECTS, LINES_RECEIVED, LINES_SENT,
+                              PING_INTERVAL, PINGS_SENT, PLAIN_PORT, PONG_TIMEOUT, RECONNECTS, RECV_SIZE, SOCKET_WRITES,
+                              TLS_PORT, LineBuffer, PingTimeout, check_control_line, configure_socket, join_batches,
+                              tls_context)
+
+
+class AsyncTwitchConnection:
+    """Połączenie z czatem Twitcha oparte na strumieniach asyncio.
+
+    Interfejs odpowiada TwitchConnection, z tą różnicą, że connect, disconnect
+    i receive_messages są korutynami. send_privmsg tylko dopisuje linię do bufora,
+    więc można je wołać z synchronicznego handle_message; flush() oddaje cały bufor
+    transportowi jednym writelines (w asyncio to jeden sendmsg), a drain() dodatkowo
+    czeka, aż dane wyjdą.
+    """
+
+    def __init__(self, server: str = 'irc.twitch.tv', port: Optional[int] = None, tls: bool = False):
+        self.server: str = server
+        self.tls = tls
+        self.port: int = port or (TLS_PORT if tls else PLAIN_PORT)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.username: Optional[str] = None
+        self.oauth_token: Optional[str] = None
+        self.channels: list[str] = []
+        self._connected: bool = False
+        self.connect_count = 0  # Udane połączenia tego obiektu; każde po pierwszym to ponowne połączenie
+        self._lines = LineBuffer()
+        self._ping_pending = False  # Wysłaliśmy PING i czekamy na jakiekolwiek dane
+        self._pending: list[bytes] = []  # Linie czekające na flush()
+
+        self.logger = logging.getLogger(__name__)
+
+    async def connect(self, username: str, oauth_token: str, channels: list[str]) -> None:
+        if self._connected:
+            self.logger.warning("Already connected. Disconnecting and reconnecting.")
+            await self.disconnect()
+
+        self.username = username
+        self.oauth_token = oauth_token
+        self.channels = list(channels)
+
+        try:
+            self._lines.clear()
+            self._ping_pending = False
+            self._pending.clear()  # Niewysłane linie starego połączenia
+            opening = asyncio.open_connection(self.server, self.port, ssl=tls_context() if self.tls else None)
+            self.reader, self.writer = await asyncio.wait_for(opening, CONNECT_TIMEOUT)
+            configure_socket(self.writer.get_extra_info('socket'))
+            self._send_command(f'CAP REQ :{CAPABILITIES}')
+            self._send_command(f'PASS {self.oauth_token}')
+            self._send_command(f'NICK {self.username}')
+            self._join_channels()
+            await self.drain()
+            self._connected = True
+            CONNECTS.inc()
+            if self.connect_count:
+                RECONNECTS.inc()
+            self.connect_count += 1
+            self.logger.info(f"Connected to {', '.join(self.channels)} as {self.username}")
+        except Exception as e:
+            self.logger.error(f"Failed to connect: {str(e)}")
+            self.drop()
+            raise
+
+    def drop(self) -> None:
+        """Zamyka martwe połączenie bez żegnania się z serwerem (PART i tak by nie doszedł)."""
+        writer, self.writer = self.writer, None
+        self.reader = None
+        self._connected = False
+        if writer is not None:
+            writer.transport.abort()  # Bez czekania na wysłanie bufora do martwego gniazda
+
+    async def disconnect(self) -> None:
+        if self._connected and self.writer:
+            try:
+                for batch in join_batches(self.channels):
+                    self._send_command(f'PART {batch}')
+                self.flush()
+                self.writer.close()
+                await self.writer.wait_closed()
+                self.logger.info(f"Disconnected from {', '.join(self.channels)}")
+            except Exception as e:
+                self.logger.error(f"Error during disconnection: {str(e)}")
+            finally:
+                self._connected = False
+                self.reader = None
+                self.writer = None
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def send_privmsg(self, channel: str, message: str) -> None:
+        """Dopisuje wiadomość do bufora; wychodzi przy najbliższym flush()."""
+        if not self._connected:
+            raise ConnectionError("Not connected to Twitch IRC")
+        self._send_command(f'PRIVMSG #{channel} :{message}')
+
+    def _join_channels(self) -> None:
+        for batch in join_batches(self.channels):
+            self._send_command(f'JOIN {batch}')
+
+    def join(self, channel: str) -> None:
+        """Dołącza do kanału w trakcie działania; po ponownym połączeniu kanał jest już na liście JOIN."""
+        if channel not in self.channels:
+            self.channels.append(channel)
+        if self._connected:
+            self._send_command(f'JOIN #{channel}')
+            self.flush()
+
+    def part(self, channel: str) -> None:
+        if channel in self.channels:
+            self.channels.remove(channel)
+        if self._connected:
+            self._send_command(f'PART #{channel}')
+            self.flush()
+
+    def flush(self) -> None:
+        """Oddaje zbuforowane linie transportowi jednym writelines, czyli jednym zapisem do gniazda."""
+        if not self._pending:
+            return
+        if not self.writer:
+            raise ConnectionError("Socket not initialized")
+        pending, self._pending = self._pending, []
+        self.writer.writelines(pending)
+        SOCKET_WRITES.inc()
+        LINES_SENT.inc(len(pending))
+
+    async def drain(self) -> None:
+        """Wysyła bufor i czeka, aż dane zostaną przyjęte przez system."""
+        if self.writer:
+            self.flush()
+            await self.writer.drain()
+
+    async def receive_messages(self) -> list[str]:
+        """Odbiera dane ze strumienia i zwraca wszystkie kompletne linie IRC (bez CRLF)."""
+        if not self._connected or not self.reader:
+            raise ConnectionError("Not connected to Twitch IRC")
+        while True:
+            try:
+                async with asyncio.timeout(PONG_TIMEOUT if self._ping_pending else PING_INTERVAL):
+                    chunk = await self.reader.read(RECV_SIZE)
+            except TimeoutError:
+                self._ping()
+                continue
+            if not chunk:
+                raise ConnectionError("Connection closed by Twitch IRC")
+            self._ping_pending = False
+            BYTES_RECEIVED.inc(len(chunk))
+            lines = self._lines.feed(chunk)
+            LINES_RECEIVED.inc(len(lines))
+            for line in lines:
+                if line.startswith('PING'):
+                    self.pong(line[5:] or ':tmi.twitch.tv')
+                elif line.startswith(':tmi.twitch.tv ') and not line.startswith(':tmi.twitch.tv PONG'):
+                    check_control_line(line)
+            if self._pending:
+                self.flush()  # PONG
+            if lines:
+                return lines
+
+    def _ping(self) -> None:
+        """Po PING_INTERVAL ciszy sprawdza, czy serwer żyje; po drugim przekroczeniu czasu rzuca PingTimeout."""
+        if self._ping_pending:
+            raise PingTimeout(f"No reply to PING in {PONG_TIMEOUT:.0f} s")
+        self._ping_pending = True
+        self._send_command('PING :tmi.twitch.tv')
+        self.flush()
+        PINGS_SENT.inc()
+
+    def _send_command(self, command: str) -> None:
+        """Dopisuje linię do bufora wysyłania (bez wywołania systemowego)."""
+        if not self.writer:
+            raise ConnectionError("Socket not initialized")
+        if not command.startswith('PASS'):
+            self.logger.info('< %s', command, extra={'event': 'send'})
+        self._pending.append((command + '\r\n').encode())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+    def pong(self, payload: str = ':tmi.twitch.tv'):
+        self._send_command(f'PONG {payload}')
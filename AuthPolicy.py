@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+from ConfigSnapshot import ConfigSnapshot
+
+AUTH_KEYS = ('all_users_mod', 'white_list_enabled', 'white_list', 'black_list_enabled', 'black_list', 'bot_moderators')
+CACHE_SIZE = 4096  # Ile decyzji (użytkownik, rangi) trzymać w pamięci
+
+
+class AuthPolicy:
+    """Reguły uprawnień skompilowane z konfiguracji do zbiorów, z pamięcią ostatnich decyzji.
+
+    Reguły są te same co w dawnym TwitchBot.is_authorized: all_users_mod, potem
+    whitelista (albo blacklista), potem rangi z 'bot_moderators'. Po przeładowaniu
+    konfiguracji należy zbudować nową politykę, razem z pustą pamięcią decyzji.
+    """
+
+    __slots__ = ('all_users_mod', 'white_list', 'black_list', 'moderator_badges', 'cache_size',
+                 '_cache', 'hits', 'misses')
+
+    def __init__(self, all_users_mod: bool, white_list: frozenset[str] | None, black_list: frozenset[str] | None,
+                 moderator_badges: frozenset[str], cache_size: int = CACHE_SIZE):
+        self.all_users_mod = all_users_mod
+        self.white_list = white_list  # None, gdy whitelista jest wyłączona
+        self.black_list = black_list  # None, gdy blacklista jest wyłączona lub przykryta whitelistą
+        self.moderator_badges = moderator_badges
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], bool] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: ConfigSnapshot, cache_size: int = CACHE_SIZE) -> 'AuthPolicy':
+        white_list = frozenset(name.lower() for name in config.white_list) if config.white_list_enabled else None
+        # Tak jak wcześniej: blacklista działa tylko, gdy whitelista jest wyłączona
+        black_list = (frozenset(name.lower() for name in config.black_list)
+                      if config.black_list_enabled and white_list is None else None)
+        return cls(config.all_users_mod, white_list, black_list, frozenset(config.bot_moderators), cache_size)
+
+    def is_authorized(self, badge: str, user: str) -> bool:
+        """Sprawdź, czy użytkownik ma uprawnienia do komend moderujących licznik."""
+        if self.all_users_mod:
+            return True
+
+        key = (user, badge)
+        cache = self._cache
+        decision = cache.get(key)
+        if decision is not None:
+            cache.move_to_end(key)
+            self.hits += 1
+            return decision
+
+        self.misses += 1
+        decision = self._decide(badge, user)
+        cache[key] = decision
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return decision
+
+    def _decide(self, badge: str, user: str) -> bool:
+        name = user.lower()
+        if self.white_list is not None and name in self.white_list:
+            return True
+        if self.black_list is not None and name in self.black_list:
+            return False
+
+        # 'broadcaster/1,subscriber/12' -> {'broadcaster', 'subscriber'}
+        for user_badge in badge.split(','):
+            if user_badge.partition('/')[0] in self.moderator_badges:
+                return True
+        return False
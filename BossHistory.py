@@ -0,0 +1,243 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import Metrics
+from ChannelState import ChannelState, format_seconds
+
+HISTORY_FILE = 'history.sqlite3'
+BATCH_DELAY = 0.2  # Ile sekund zbierać kolejne zdarzenia, zanim zapiszemy je jedną transakcją
+BATCH_SIZE = 500  # Najwięcej zdarzeń w jednej transakcji
+QUEUE_SIZE = 10000  # Przy zablokowanym dysku nadmiarowe zdarzenia są gubione zamiast blokować czat
+MIN_RATE_SPAN = 600.0  # Najkrótszy okres do liczenia śmierci na godzinę, żeby pierwsza śmierć nie dała 60/h
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fights (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    boss TEXT NOT NULL,
+    boss_key TEXT NOT NULL,
+    finished REAL NOT NULL,
+    seconds INTEGER NOT NULL,
+    deaths INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fights_boss ON fights (channel, boss_key, seconds, deaths);
+CREATE INDEX IF NOT EXISTS fights_finished ON fights (channel, finished);
+CREATE TABLE IF NOT EXISTS deaths (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    ts REAL NOT NULL,
+    delta INTEGER NOT NULL,
+    boss TEXT,
+    user TEXT
+);
+CREATE INDEX IF NOT EXISTS deaths_time ON deaths (channel, ts);
+"""
+
+ROWS_WRITTEN = Metrics.counter('twitchbot_history_rows_total', 'Rows written to the boss history database', ('table',))
+ROWS_DROPPED = Metrics.counter('twitchbot_history_dropped_total', 'History events dropped from a full queue')
+BATCH_SECONDS = Metrics.histogram('twitchbot_history_batch_seconds', 'Time to commit one batch of history rows',
+                                  buckets=(1e-4, 5e-4, 1e-3, 5e-3, 0.025, 0.1, 0.5, 1.0, 5.0))
+QUERY_SECONDS = Metrics.histogram('twitchbot_history_query_seconds', 'Time to answer one history query')
+
+
+def boss_key(name: str) -> str:
+    """Nazwa bossa do wyszukiwania: bez wielkości liter i nadmiarowych spacji."""
+    return ' '.join(name.split()).casefold()
+
+
+class BossHistory:
+    """Historia walk z bossami i śmierci w lokalnej bazie SQLite.
+
+    Komendy tylko wrzucają zdarzenie do kolejki; osobny wątek zbiera je przez BATCH_DELAY
+    i zapisuje jedną transakcją, więc czat nie czeka na dysk. Zapytania dla komend
+    (!bossstats, !pb, !dph) idą osobnym połączeniem i korzystają z indeksów po kanale,
+    bossie i czasie, więc nie zwalniają wraz z latami historii. Baza jest w trybie WAL,
+    dzięki czemu odczyt nie czeka na trwający zapis. Zdarzenie jest widoczne w zapytaniach
+    po zapisaniu paczki, czyli po około BATCH_DELAY.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE, batch_delay: float = BATCH_DELAY):
+        self.path = path
+        self.batch_delay = batch_delay
+        self.session_start = time.time()  # Od tej chwili liczymy śmierci na godzinę
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._reader_lock = threading.Lock()
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def available(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> bool:
+        """Tworzy bazę i uruchamia wątek zapisujący; False, gdy bazy nie da się otworzyć."""
+        if self._thread is not None:
+            return True
+        try:
+            db = sqlite3.connect(self.path)
+            try:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(SCHEMA)
+            finally:
+                db.close()
+            self._reader = sqlite3.connect(self.path, check_same_thread=False)
+        except sqlite3.Error as e:
+            self.logger.error(f"Boss history not available ({self.path}): {e}")
+            return False
+        self._thread = threading.Thread(target=self._run, name='history', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Zapisuje zaległe zdarzenia i zamyka bazę."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        with self._reader_lock:
+            self._reader.close()
+            self._reader = None
+
+    def report(self) -> None:
+        self.logger.info(f"History: {self.written} rows in {self.batches} batches, {self.dropped} dropped")
+
+    # Zdarzenia, wołane z wątku czatu
+
+    def add_deaths(self, state: ChannelState, delta: int, user: str) -> None:
+        """Zapamiętuje zmianę licznika śmierci (ujemną przy '!death-')."""
+        if delta:
+            boss = state.boss_name if state.boss_active and not state.boss_paused else None
+            self._put(('deaths', (state.channel, time.time(), delta, boss, user)))
+
+    def finish_fight(self, state: ChannelState, seconds: float) -> None:
+        """Zapamiętuje zakończoną walkę: boss, śmierci na bossie i czas walki bez pauz."""
+        name = ' '.join(state.boss_name.split())
+        self._put(('fights', (state.channel, name, boss_key(name), time.time(), int(seconds),
+                              state.deaths_boss or 0)))
+
+    def _put(self, event: tuple) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            ROWS_DROPPED.inc()
+
+    # Zapytania dla komend
+
+    def boss_stats(self, channel: str, name: str) -> Optional[dict]:
+        """Ubite razy, suma, najmniej i średnio śmierci oraz najlepszy czas bossa; None, gdy brak walk."""
+        row = self._query('SELECT COUNT(*), SUM(deaths), MIN(deaths), AVG(deaths), MIN(seconds) FROM fights '
+                          'WHERE channel = ? AND boss_key = ?', (channel, boss_key(name)))
+        if not row or not row[0]:
+            return None
+        attempts, total, fewest, average, fastest = row
+        return {'stats_boss': self._display_name(channel, name), 'attempts': attempts, 'total_deaths': total,
+                'best_deaths': fewest, 'avg_deaths': f'{average:.1f}', 'best_time': format_seconds(fastest)}
+
+    def personal_best(self, channel: str, name: Optional[str] = None) -> Optional[dict]:
+        """Najszybsza walka z bossem (przy równym czasie ta z mniejszą liczbą śmierci).
+
+        Bez nazwy dotyczy bossa z ostatniej zakończonej walki na kanale.
+        """
+        if not name:
+            last = self._query('SELECT boss FROM fights WHERE channel = ? ORDER BY finished DESC LIMIT 1',
+                               (channel,))
+            if not last:
+                return None
+            name = last[0]
+        row = self._query('SELECT seconds, deaths, finished FROM fights WHERE channel = ? AND boss_key = ? '
+                          'ORDER BY seconds, deaths LIMIT 1', (channel, boss_key(name)))
+        if not row:
+            return None
+        seconds, deaths, finished = row
+        return {'stats_boss': self._display_name(channel, name), 'best_time': format_seconds(seconds),
+                'best_deaths': deaths, 'best_date': time.strftime('%Y-%m-%d', time.localtime(finished))}
+
+    def deaths_per_hour(self, channel: str) -> Optional[dict]:
+        """Śmierci na godzinę od startu bota (czyli zwykle od początku streama)."""
+        row = self._query('SELECT COALESCE(SUM(delta), 0) FROM deaths WHERE channel = ? AND ts >= ?',
+                          (channel, self.session_start))
+        if row is None:
+            return None
+        hours = max(time.time() - self.session_start, MIN_RATE_SPAN) / 3600
+        return {'session_deaths': row[0], 'deaths_per_hour': f'{row[0] / hours:.1f}',
+                'session_time': format_seconds(time.time() - self.session_start)}
+
+    def _display_name(self, channel: str, name: str) -> str:
+        """Nazwa bossa tak, jak zapisano ją przy ostatniej walce (wpisana może mieć inne wielkości liter)."""
+        row = self._query('SELECT boss FROM fights WHERE channel = ? AND boss_key = ? ORDER BY finished DESC LIMIT 1',
+                          (channel, boss_key(name)))
+        return row[0] if row else name
+
+    def _query(self, sql: str, params: tuple) -> Optional[tuple]:
+        started = time.perf_counter()
+        with self._reader_lock:
+            if self._reader is None:
+                return None
+            try:
+                row = self._reader.execute(sql, params).fetchone()
+            except sqlite3.Error as e:
+                self.logger.error(f"History query failed: {e}")
+                return None
+        QUERY_SECONDS.observe(time.perf_counter() - started)
+        return row
+
+    # Wątek zapisujący
+
+    def _run(self) -> None:
+        db = sqlite3.connect(self.path)
+        db.execute('PRAGMA synchronous=NORMAL')  # W trybie WAL awaria zasilania może zgubić tylko ostatnie paczki
+        try:
+            stopping = False
+            while not stopping:
+                event = self._queue.get()
+                if event is None:
+                    break
+                batch = [event]
+                deadline = time.monotonic() + self.batch_delay
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if event is None:
+                        stopping = True
+                        break
+                    batch.append(event)
+                self._write(db, batch)
+        finally:
+            db.close()
+
+    def _write(self, db: sqlite3.Connection, batch: list[tuple]) -> None:
+        started = time.perf_counter()
+        rows: dict[str, list[tuple]] = {'fights': [], 'deaths': []}
+        for table, row in batch:
+            rows[table].append(row)
+        try:
+            with db:
+                if rows['fights']:
+                    db.executemany('INSERT INTO fights (channel, boss, boss_key, finished, seconds, deaths) '
+                                   'VALUES (?, ?, ?, ?, ?, ?)', rows['fights'])
+                if rows['deaths']:
+                    db.executemany('INSERT INTO deaths (channel, ts, delta, boss, user) VALUES (?, ?, ?, ?, ?)',
+                                   rows['deaths'])
+        except sqlite3.Error as e:
+            self.logger.error(f"Error writing {len(batch)} history events: {e}")
+            return
+        for table, table_rows in rows.items():
+            if table_rows:
+                ROWS_WRITTEN.labels(table).inc(len(table_rows))
+        self.written += len(batch)
+        self.batches += 1
+        BATCH_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional, Any
+
+from ChatAnalytics import ChatStats
+from ConfigSnapshot import ConfigSnapshot
+
+BOSS_NONE = 'none'
+BOSS_RUNNING = 'running'
+BOSS_PAUSED = 'paused'
+
+
+def format_seconds(seconds: float) -> str:
+    """Czas walki jako 'GG:MM:SS' (pełne sekundy)."""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}'
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class StateView:
+    """Niezmienny obraz stanu kanału w jednej chwili.
+
+    Timer bossa to czas walki sprzed bieżącego odcinka (boss_base) plus, gdy boss
+    tyka, czas od boss_since na zegarze monotonicznym, więc zmiana zegara systemowego
+    go nie przestawia. Po pauzie i po zakończeniu walki boss_base trzyma czas końcowy.
+    """
+
+    deaths: int = 0  # Licznik ogólnych śmierci
+    deaths_boss: int = 0  # Licznik śmierci bossa
+    boss_name: str = ''
+    boss: str = BOSS_NONE  # BOSS_NONE, BOSS_RUNNING albo BOSS_PAUSED
+    boss_base: float = 0.0  # Sekundy walki przed bieżącym odcinkiem
+    boss_since: Optional[float] = None  # time.monotonic() wznowienia, tylko gdy boss tyka
+
+    def boss_seconds(self, now: Optional[float] = None) -> float:
+        """Czas walki z bossem bez pauz, w sekundach."""
+        if self.boss_since is None:
+            return self.boss_base
+        return self.boss_base + (time.monotonic() if now is None else now) - self.boss_since
+
+
+EMPTY_VIEW = StateView()
+
+
+class ChannelState:
+    """Stan licznika jednego kanału: śmierci, boss i timery.
+
+    Stan trzymany jest w niezmiennym StateView. Metody zmieniające stan (wołane
+    z wątku czatu) budują nowy obraz i podmieniają atrybut view jednym przypisaniem,
+    więc zapis pliku, nakładka i dziennik czytają spójny obraz bez blokad: wystarczy
+    raz odczytać state.view. Zapisujących szereguje jedna blokada wspólna dla wszystkich
+    kanałów; zmiany to komendy, więc prawie nigdy na siebie nie czekają.
+    """
+
+    __slots__ = ('channel', 'config', 'name_file', 'view', 'chat', 'received')
+
+    _lock = threading.Lock()
+
+    def __init__(self, channel: str, config: ConfigSnapshot):
+        self.channel = channel  # Nazwa kanału bez '#'
+        self.config = config  # Snapshot konfiguracji z nadpisaniami dla tego kanału, podmieniany przy przeładowaniu
+        self.name_file = channel + '.txt'
+        self.view = EMPTY_VIEW
+        self.chat = ChatStats()  # Okna statystyk czatu i stan spam bota, tylko z wątku czatu
+        self.received = 0  # Wszystkie wiadomości czatu od startu, do liczenia obciążenia
+
+    @property
+    def emotes(self) -> tuple[str, ...]:
+        return self.config.emotes
+
+    # Odczyt; pola w szablonach odpowiedzi ('{deaths}', '{boss_timer}'...) też czytane są stąd
+
+    @property
+    def deaths(self) -> int:
+        return self.view.deaths
+
+    @property
+    def deaths_boss(self) -> int:
+        return self.view.deaths_boss
+
+    @property
+    def boss_name(self) -> str:
+        return self.view.boss_name
+
+    @property
+    def boss_active(self) -> bool:
+        """Czy walka trwa i nie jest wstrzymana."""
+        return self.view.boss == BOSS_RUNNING
+
+    @property
+    def boss_paused(self) -> bool:
+        return self.view.boss == BOSS_PAUSED
+
+    @property
+    def boss_running(self) -> bool:
+        """Czy timer bossa aktualnie tyka."""
+        return self.view.boss == BOSS_RUNNING
+
+    @property
+    def boss_timer(self) -> str:
+        return format_seconds(self.view.boss_seconds())
+
+    def boss_seconds(self) -> float:
+        """Czas walki z bossem bez pauz."""
+        return self.view.boss_seconds()
+
+    # Zmiany stanu
+
+    def _update(self, **changes) -> StateView:
+        with self._lock:
+            self.view = view = replace(self.view, **changes)
+        return view
+
+    def restore(self, view: StateView) -> None:
+        """Podmienia cały stan, np. po wczytaniu z dziennika."""
+        with self._lock:
+            self.view = view
+
+    def add_deaths(self, delta: int) -> int:
+        """Zmienia licznik śmierci (i śmierci bossa, gdy boss trwa), nie schodząc poniżej zera.
+        Zwraca faktyczną zmianę licznika ogólnego."""
+        with self._lock:
+            view = self.view
+            deaths = max(0, view.deaths + delta)
+            deaths_boss = max(0, view.deaths_boss + delta) if view.boss == BOSS_RUNNING else view.deaths_boss
+            self.view = replace(view, deaths=deaths, deaths_boss=deaths_boss)
+        return deaths - view.deaths
+
+    def set_deaths(self, deaths: int) -> int:
+        """Ustawia licznik śmierci, zwraca zmianę względem poprzedniej wartości."""
+        with self._lock:
+            view = self.view
+            self.view = replace(view, deaths=deaths)
+        return deaths - view.deaths
+
+    def set_boss_deaths(self, deaths: int) -> None:
+        self._update(deaths_boss=deaths)
+
+    def start_boss(self, name: str) -> None:
+        self._update(boss_name=name, boss=BOSS_RUNNING, deaths_boss=0, boss_base=0.0, boss_since=time.monotonic())
+
+    def finish_boss(self) -> float:
+        """Kończy walkę i zwraca jej czas w sekundach; nazwa i czas zostają do odpowiedzi na komendę."""
+        with self._lock:
+            view = self.view
+            seconds = view.boss_seconds()
+            self.view = replace(view, boss=BOSS_NONE, boss_base=seconds, boss_since=None)
+        return seconds
+
+    def pause_boss(self) -> None:
+        with self._lock:
+            view = self.view
+            if view.boss == BOSS_RUNNING:
+                self.view = replace(view, boss=BOSS_PAUSED, boss_base=view.boss_seconds(), boss_since=None)
+
+    def resume_boss(self) -> None:
+        with self._lock:
+            view = self.view
+            if view.boss == BOSS_PAUSED:
+                self.view = replace(view, boss=BOSS_RUNNING, boss_since=time.monotonic())
+
+    # Plik kanału
+
+    def read_file_view(self) -> Optional[StateView]:
+        """Stan zapisany w pliku kanału; None przy złym formacie, FileNotFoundError, gdy pliku nie ma."""
+        deaths = deaths_boss = 0
+        boss_name = ''
+        boss = BOSS_NONE
+        seconds = 0
+        with open(self.name_file, 'r', encoding='utf-8') as file:
+            data = file.read().splitlines()
+            if len(data) == 1:
+                temp = data[0].split(" ")
+                deaths = int(temp[1])
+
+            elif len(data) == 5:
+                temp = data[0].split(" ")
+                deaths = int(temp[1])
+                temp = data[2].split(" ")
+                boss_name = " ".join(temp[1:])
+                if data[2] != ' ':
+                    boss = BOSS_PAUSED  # Przerwana walka wraca jako wstrzymana
+                if data[3] != ' ':
+                    temp = data[3].split(" ")
+                    deaths_boss = int(temp[1])
+                if data[4] != ' ':
+                    temp = data[4].split(" ")
+                    h, m, s = map(int, temp[1].split(':'))
+                    seconds = h * 3600 + m * 60 + s
+            else:
+                return None
+        return StateView(deaths, deaths_boss, boss_name, boss, float(seconds))
+
+    def read_data_from_file(self):
+        view = EMPTY_VIEW
+        try:
+            view = self.read_file_view()
+            if view is None:
+                print(f'Error: Incorrect data format in file {self.name_file}.')
+                view = EMPTY_VIEW
+        except FileNotFoundError as e:
+            logging.error(e)
+            print(f'Error: File {self.name_file} not found. Creating...')
+
+        self.restore(view)
+
+    def render_data(self) -> str:
+        """
+            Zwraca treść pliku kanału: liczbę śmierci, nazwę bossa, liczbę śmierci bossa oraz czas bossa.
+        """
+        view = self.view
+        if view.boss != BOSS_NONE:
+            return (
+                f'śmierci: {view.deaths}\n\n'
+                f'boss: {view.boss_name}\n'
+                f'śmierci: {view.deaths_boss}\n'
+                f'czas: {format_seconds(view.boss_seconds())}'
+            )
+        return f'śmierci: {view.deaths}\n\n \n \n '
+
+    def seconds_to_next_tick(self) -> float:
+        """Ile sekund zostało do zmiany wyświetlanej sekundy timera bossa."""
+        return 1.0 - self.view.boss_seconds() % 1.0 + 0.001
+
+    def overlay_view(self) -> dict[str, Any]:
+        """Stan dla nakładki w przeglądarce; timer jako chwila startu, żeby tykał po stronie klienta.
+
+        Trwający boss ma timer_start (ms od epoki, zaokrąglone, więc stałe między wywołaniami),
+        zatrzymany ma timer_ms, czyli czas walki w chwili pauzy.
+        """
+        view = self.view
+        timer_start = timer_ms = None
+        if view.boss == BOSS_RUNNING:
+            timer_start = round((time.time() - view.boss_seconds()) * 10) * 100
+        elif view.boss == BOSS_PAUSED:
+            timer_ms = int(view.boss_base) * 1000
+        return {'deaths': view.deaths, 'boss': view.boss, 'boss_name': view.boss_name if view.boss != BOSS_NONE else '',
+                'deaths_boss': view.deaths_boss, 'timer_start': timer_start, 'timer_ms': timer_ms}
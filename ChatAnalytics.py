@@ -0,0 +1,194 @@
+import time
+from typing import Optional
+
+RECENT_SPAN = 600.0  # Okno statystyk: 10 minut w kubełkach po 10 s
+MINUTE_SPAN = 60.0  # "Teraz" to ostatnie kubełki okna, liczone dopiero przy odczycie
+BUCKETS = 60
+TOP_COUNT = 3  # Ile komend i emotek pokazuje !chatstats
+MAX_EMOTE_NAMES = 4096  # Pamięć nazw emotek kanału (id -> nazwa) jest czyszczona po przekroczeniu
+
+
+def _expire(buckets: list[Optional[dict]], slot: int, totals: dict[str, int]) -> None:
+    bucket = buckets[slot]
+    if bucket is None:
+        return
+    for key, count in bucket.items():
+        left = totals[key] - count
+        if left:
+            totals[key] = left
+        else:
+            del totals[key]
+    buckets[slot] = None
+
+
+def _bump(buckets: list[Optional[dict]], slot: int, totals: dict[str, int], key: str, count: int = 1) -> None:
+    bucket = buckets[slot]
+    if bucket is None:
+        buckets[slot] = {key: count}
+    else:
+        bucket[key] = bucket.get(key, 0) + count
+    totals[key] = totals.get(key, 0) + count
+
+
+class SlidingWindow:
+    """Wiadomości, piszący, komendy i emotki z ostatnich span sekund.
+
+    Okno to pierścień BUCKETS kubełków po span/BUCKETS sekund. Sumy dla całego okna
+    poprawiane są przy dodaniu i przy wygaśnięciu kubełka, więc wiadomość kosztuje
+    O(1) (wygaśnięcie rozkłada się na wiadomości, które kubełek zebrał), a odczyt nie
+    przegląda kubełków. Piszący trzymani są jako numer odcinka ich ostatniej wiadomości,
+    więc kolejna wiadomość tej samej osoby w tym samym odcinku to jedno wyszukanie
+    w słowniku; liczba różnych piszących to len(seen).
+    """
+
+    __slots__ = ('width', 'tick', 'messages', 'seen', 'commands', 'emotes',
+                 '_messages', '_users', '_commands', '_emotes')
+
+    def __init__(self, span: float, now: float):
+        self.width = span / BUCKETS
+        self.tick = int(now / self.width)  # Numer najnowszego odcinka czasu
+        self.messages = 0
+        self.seen: dict[str, int] = {}  # Piszący -> numer odcinka jego ostatniej wiadomości
+        self.commands: dict[str, int] = {}
+        self.emotes: dict[str, int] = {}  # Id emotki -> wystąpienia
+        self._messages = [0] * BUCKETS
+        self._users: list[Optional[list[str]]] = [None] * BUCKETS  # Kto pisał w odcinku
+        self._commands: list[Optional[dict]] = [None] * BUCKETS
+        self._emotes: list[Optional[dict]] = [None] * BUCKETS
+
+    def add(self, now: float, user: Optional[str]) -> int:
+        """Liczy wiadomość i zwraca numer kubełka dla add_command/add_emote."""
+        tick = int(now / self.width)
+        if tick != self.tick:
+            self.advance(now)
+        slot = tick % BUCKETS
+        self._messages[slot] += 1
+        self.messages += 1
+        if user and self.seen.get(user) != tick:
+            self.seen[user] = tick
+            users = self._users[slot]
+            if users is None:
+                self._users[slot] = [user]
+            else:
+                users.append(user)
+        return slot
+
+    def add_command(self, slot: int, command: str) -> None:
+        _bump(self._commands, slot, self.commands, command)
+
+    def add_emote(self, slot: int, emote_id: str, count: int) -> None:
+        _bump(self._emotes, slot, self.emotes, emote_id, count)
+
+    def advance(self, now: float) -> None:
+        """Usuwa kubełki starsze niż span sekund."""
+        tick = int(now / self.width)
+        if tick <= self.tick:
+            return
+        if tick - self.tick >= BUCKETS:
+            # Cisza dłuższa niż okno: wszystko wygasło
+            self.messages = 0
+            self.seen, self.commands, self.emotes = {}, {}, {}
+            self._messages = [0] * BUCKETS
+            self._users, self._commands, self._emotes = [None] * BUCKETS, [None] * BUCKETS, [None] * BUCKETS
+        else:
+            seen = self.seen
+            for old in range(self.tick + 1, tick + 1):
+                slot = old % BUCKETS
+                self.messages -= self._messages[slot]
+                self._messages[slot] = 0
+                users = self._users[slot]
+                if users is not None:
+                    stale = old - BUCKETS  # Odcinek, z którego pochodzi zawartość kubełka
+                    for user in users:
+                        if seen.get(user) == stale:  # Nie pisał później
+                            del seen[user]
+                    self._users[slot] = None
+                _expire(self._commands, slot, self.commands)
+                _expire(self._emotes, slot, self.emotes)
+        self.tick = tick
+
+    def tail(self, now: float, span: float) -> tuple[int, int]:
+        """Wiadomości i piszący z ostatnich span sekund, z dokładnością do kubełka (bieżący jest niepełny).
+
+        Liczone przy odczycie, bo to rzadkie, a dodanie wiadomości zostaje jednym zapisem."""
+        self.advance(now)
+        first = self.tick - max(1, min(BUCKETS, round(span / self.width))) + 1
+        messages = sum(self._messages[tick % BUCKETS] for tick in range(first, self.tick + 1))
+        return messages, sum(1 for tick in self.seen.values() if tick >= first)
+
+
+def _top(totals: dict[str, int], names: Optional[dict[str, str]] = None) -> str:
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:TOP_COUNT]
+    return ', '.join(f'{names.get(key, key) if names else key} ×{count}' for key, count in ranked) or '-'
+
+
+class ChatStats:
+    """Statystyki czatu jednego kanału i stan przypominajki spam bota.
+
+    Jedno dziesięciominutowe okno liczy wiadomości, piszących, komendy i emotki;
+    ostatnia minuta wycinana jest z niego przy odczycie. Przypominajka wychodzi po
+    spam_bot_messages wiadomościach, ale nie częściej niż co spam_bot_min_interval
+    sekund, a w wolnym czacie po spam_bot_max_interval sekundach, jeśli w ostatnich
+    10 minutach pisało co najmniej spam_bot_min_chatters osób.
+    """
+
+    __slots__ = ('recent', 'emote_names', 'since_reminder', 'reminded_at')
+
+    def __init__(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.recent = SlidingWindow(RECENT_SPAN, now)
+        self.emote_names: dict[str, str] = {}  # Id emotki -> nazwa, wycinana z tekstu przy pierwszym wystąpieniu
+        self.since_reminder = 0  # Wiadomości od ostatniej przypominajki
+        self.reminded_at = now  # Od startu liczy się jak od przypominajki, więc nie wychodzi od razu
+
+    def record(self, now: float, user: Optional[str], command: Optional[str] = None, emotes: str = '',
+               text: str = '', offset: int = 0) -> None:
+        """Liczy wiadomość. emotes to surowy tag ('25:0-4,12-16/1902:6-10'), a jego pozycje liczone są
+        od indeksu offset w text (na szybkiej ścieżce text to cała linia IRC, więc nic nie wycinamy)."""
+        slot = self.recent.add(now, user)
+        self.since_reminder += 1
+        if command:
+            self.recent.add_command(slot, command)
+        if emotes:
+            names = self.emote_names
+            for emote in emotes.split('/'):
+                emote_id, _, positions = emote.partition(':')
+                if emote_id in names or self._learn_emote(emote_id, positions, text, offset):
+                    self.recent.add_emote(slot, emote_id, positions.count(',') + 1)
+
+    def _learn_emote(self, emote_id: str, positions: str, text: str, offset: int) -> bool:
+        start, _, end = positions.partition(',')[0].partition('-')
+        if not (start.isdigit() and end.isdigit()):
+            return False
+        start, end = offset + int(start), offset + int(end) + 1
+        if not start < end <= len(text):
+            return False
+        if len(self.emote_names) >= MAX_EMOTE_NAMES:
+            self.emote_names = {key: self.emote_names[key] for key in self.recent.emotes}
+        self.emote_names[emote_id] = text[start:end]
+        return True
+
+    def reminder_due(self, config, now: float) -> bool:
+        elapsed = now - self.reminded_at
+        if self.since_reminder >= config.spam_bot_messages and elapsed >= config.spam_bot_min_interval:
+            return True
+        if not 0 < config.spam_bot_max_interval <= elapsed:
+            return False
+        self.recent.advance(now)  # Na cichym kanale okno nie było przesuwane przez wiadomości
+        return len(self.recent.seen) >= config.spam_bot_min_chatters
+
+    def reminded(self, now: float) -> None:
+        self.since_reminder = 0
+        self.reminded_at = now
+
+    def summary(self, now: float) -> dict[str, str]:
+        """Pola szablonu !chatstats."""
+        messages, chatters = self.recent.tail(now, MINUTE_SPAN)
+        return {
+            'msgs_per_min': str(messages),  # Wiadomości z ostatniej minuty, bez ekstrapolacji po starcie
+            'chatters': str(chatters),
+            'msgs_10m': str(self.recent.messages),
+            'chatters_10m': str(len(self.recent.seen)),
+            'top_commands': _top(self.recent.commands),
+            'top_emotes': _top(self.recent.emotes, self.emote_names),
+        }
@@ -0,0 +1,421 @@
+import random
+import string
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
+
+import Metrics
+from CooldownTracker import NO_COOLDOWN, CooldownPolicy, CooldownTracker
+
+ACTION_TEXT = 'text'  # Komenda, która tylko odpowiada tekstem
+ARG_SCHEMAS = ('none', 'int', 'text')  # Bez argumentów, liczba >= 0 (None, gdy jej brak), dowolny tekst
+PERMISSIONS = ('everyone', 'mod')
+COOLDOWN_SCOPES = ('global', 'command', 'user')
+CHARGED_OUTCOMES = frozenset({'ok', 'boss'})  # Wyniki akcji, po których zaczyna się cooldown
+
+# Pola wyliczane przez komendy historii bossów i statystyk czatu; w innych komendach są puste
+HISTORY_FIELDS = frozenset({'stats_boss', 'attempts', 'total_deaths', 'best_deaths', 'avg_deaths', 'best_time',
+                            'best_date', 'session_deaths', 'session_time', 'deaths_per_hour',
+                            'msgs_per_min', 'chatters', 'msgs_10m', 'chatters_10m', 'top_commands', 'top_emotes'})
+# Pola dostępne w szablonach odpowiedzi, np. "Wypierdolki: {deaths} {emote}"
+TEMPLATE_FIELDS = frozenset({'user', 'channel', 'deaths', 'deaths_boss', 'boss_name', 'boss_timer',
+                             'emote', 'prefix', 'cooldown', 'args', *HISTORY_FIELDS})
+
+_NO_BOSS = 'Nie ma ustawionego bossa hm'
+
+COMMAND_SECONDS = Metrics.histogram('twitchbot_command_seconds', 'Command dispatch time', ('command',))
+COOLDOWN_REJECTIONS = Metrics.counter('twitchbot_cooldown_rejections_total', 'Commands rejected by a cooldown',
+                                      ('command',))
+
+# Wbudowane komendy. Wpisy z sekcji 'commands' w settings.yaml nakładane są na te
+# wartości, więc można zmienić np. tylko aliasy albo jedną odpowiedź.
+# Odpowiedź None oznacza, że bot nic nie pisze. Cooldown 'default' to wartość command_cooldown.
+DEFAULT_COMMANDS: dict[str, dict[str, Any]] = {
+    'deaths': {
+        'action': 'show_deaths', 'args': 'none', 'permission': 'everyone',
+        'responses': {
+            'ok': '@{user} {channel} wypierdolił się już {deaths} razy {emote}',
+            'boss': '@{user} {boss_name} robiony od {boss_timer} i tylko {deaths_boss} wyjebki ok w sumie {deaths}',
+        },
+    },
+    'death+': {
+        'action': 'increment_deaths', 'args': 'none', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': 'Wypierdolki: {deaths} {emote}',
+            'boss': '{deaths_boss} wyjebek na bossie i {deaths} ugółem {emote}, {boss_timer}',
+            'vote': None,  # Głos w trybie głosowania, który jeszcze nie zaliczył śmierci
+        },
+    },
+    'death-': {
+        'action': 'decrement_deaths', 'args': 'none', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': 'Wypierdolki: {deaths} {emote}',
+            'boss': '{deaths_boss} wyjebek na bossie i {deaths} ugółem {emote}',
+            'denied': 'Nie masz uprawnień do używania tej komendy.',
+            'cooldown': 'Nie masz uprawnień do używania tej komendy.',
+        },
+    },
+    'setdeaths': {
+        'action': 'set_deaths', 'args': 'int', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {'ok': 'Ustawiono liczbę śmierci na: {deaths} {emote}'},
+    },
+    'setbossdeaths': {
+        'action': 'set_boss_deaths', 'args': 'int', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': 'Ustawiono liczbę śmierci na bossie na: {deaths_boss}',
+            'no_boss': _NO_BOSS,
+            'usage': '@{user} Coś się Zepsuło {emote} oznacz mnie albo napisz priv "/w Krwawyy nie działa"',
+        },
+    },
+    'startboss': {
+        'action': 'start_boss', 'args': 'text', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': 'Boss: {boss_name} {emote}',
+            'active': '@{user} Boss {boss_name} jest aktywny zakończ go wpisując "{prefix}finishboss" '
+                      'przed zaczęciem nowego {emote}',
+        },
+    },
+    'finishboss': {
+        'action': 'finish_boss', 'args': 'none', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': '@{user} {boss_name} rozwalony z {deaths_boss} wyjebkami {emote} po {boss_timer}',
+            'no_boss': _NO_BOSS,
+        },
+    },
+    'pauseboss': {
+        'action': 'pause_boss', 'args': 'none', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': ' {channel} się zmęczył po {deaths_boss} wyjebkach, czas: {boss_timer} {emote}',
+            'no_boss': _NO_BOSS,
+        },
+    },
+    'resumeboss': {
+        'action': 'resume_boss', 'args': 'none', 'permission': 'mod', 'cooldown': 'default',
+        'responses': {
+            'ok': '@{user} Boss: {boss_name} wznowiony {emote}',
+            'no_boss': _NO_BOSS,
+        },
+    },
+    'bossstats': {
+        'action': 'boss_stats', 'args': 'text', 'permission': 'everyone', 'cooldown': 'default',
+        'responses': {
+            'ok': '{stats_boss}: ubity {attempts} razy, w sumie {total_deaths} wyjebek, średnio {avg_deaths}, '
+                  'najmniej {best_deaths}, najszybciej {best_time} {emote}',
+            'unknown': '@{user} {channel} jeszcze nie ubił {stats_boss} {emote}',
+            'usage': '@{user} Napisz "{prefix}bossstats nazwa bossa"',
+            'unavailable': None,
+        },
+    },
+    'pb': {
+        'action': 'personal_best', 'args': 'text', 'permission': 'everyone', 'cooldown': 'default',
+        'responses': {
+            'ok': 'PB na {stats_boss}: {best_time} i {best_deaths} wyjebek ({best_date}) {emote}',
+            'unknown': '@{user} Nie ma jeszcze ubitego bossa {stats_boss} {emote}',
+            'unavailable': None,
+        },
+    },
+    'dph': {
+        'action': 'deaths_per_hour', 'args': 'none', 'permission': 'everyone', 'cooldown': 'default',
+        'responses': {
+            'ok': '{deaths_per_hour} wyjebek na godzinę ({session_deaths} w {session_time}) {emote}',
+            'unavailable': None,
+        },
+    },
+    'chatstats': {
+        'action': 'chat_stats', 'args': 'none', 'permission': 'everyone', 'cooldown': 'default',
+        'responses': {
+            'ok': 'Czat: {msgs_per_min} wiadomości/min, {chatters} osób w ostatniej minucie, {chatters_10m} '
+                  'w 10 minut ({msgs_10m} wiadomości). Komendy: {top_commands}. Emotki: {top_emotes}',
+        },
+    },
+    'help': {
+        'action': ACTION_TEXT, 'args': 'none', 'permission': 'everyone',
+        'responses': {
+            'ok': 'Są dostępne komendy: {prefix}deaths (liczba śmierci), {prefix}death+ (dodaj 1), '
+                  '{prefix}death- (odejmij 1), {prefix}setdeaths liczba (ustaw liczbę śmierci), '
+                  '{prefix}startboss nazwa (rozpocznij bossa), {prefix}finishboss (zakończ bossa), '
+                  '{prefix}pauseboss (pauza bossa), {prefix}resumeboss (wznów bossa), '
+                  '{prefix}setbossdeaths liczba (ustaw śmierci bossa), {prefix}bossstats nazwa (historia bossa), '
+                  '{prefix}pb (najlepsza walka), {prefix}dph (śmierci na godzinę), '
+                  '{prefix}chatstats (statystyki czatu), '
+                  '{prefix}author (info o autorze). '
+                  'Cooldown: {cooldown}s.',
+        },
+    },
+    'author': {
+        'action': ACTION_TEXT, 'args': 'none', 'permission': 'everyone',
+        'responses': {
+            'ok': 'Zostałem stworzony przez Krwawyy, z propozycjami lub błędami pisz na pw na Twitchu okok, '
+                  'jakbyś chciał coś dodać napisz to wyśle link do GitHuba wuda',
+        },
+    },
+}
+
+ACTIONS = frozenset(spec['action'] for spec in DEFAULT_COMMANDS.values())
+_SPEC_KEYS = frozenset({'action', 'aliases', 'args', 'permission', 'cooldown', 'response', 'responses', 'enabled'})
+
+
+@dataclass(frozen=True, slots=True)
+class CommandSpec:
+    """Sprawdzona deklaracja jednej komendy z konfiguracji."""
+
+    name: str
+    action: str
+    aliases: tuple[str, ...]
+    args: str
+    permission: str
+    responses: Mapping[str, Optional[str]]  # Wynik akcji -> szablon odpowiedzi
+    cooldown: CooldownPolicy = NO_COOLDOWN
+    literal: bool = False  # Odpowiedzi to zwykły tekst, bez pól {…} (dawne extra_command_*)
+
+
+def _check_template(name: str, outcome: str, template: Any) -> None:
+    if template is None:
+        return
+    if not isinstance(template, str):
+        raise ValueError(f"'commands.{name}.responses.{outcome}' must be text, got {template!r}")
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise ValueError(f"'commands.{name}.responses.{outcome}' is not a valid template: {e}")
+    for _, field, spec, conversion in parsed:
+        if field is not None and (field not in TEMPLATE_FIELDS or spec or conversion):
+            raise ValueError(f"'commands.{name}.responses.{outcome}' uses unknown field {{{field}}}, "
+                             f"available: {', '.join(sorted(TEMPLATE_FIELDS))}")
+
+
+def _seconds(name: str, value: Any, default: float) -> float:
+    if value == 'default':
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"'commands.{name}.cooldown' must be a non-negative number or 'default', got {value!r}")
+    return float(value)
+
+
+def _cooldown(name: str, raw: Any, default: float) -> CooldownPolicy:
+    """'cooldown: 15' dotyczy samej komendy; 'cooldown: {global: 2, command: 15, user: 60}' ustawia zakresy osobno."""
+    if raw is None:
+        return NO_COOLDOWN
+    if not isinstance(raw, Mapping):
+        return CooldownPolicy(command_seconds=_seconds(name, raw, default))
+    bad = [key for key in raw if key not in COOLDOWN_SCOPES]
+    if bad:
+        raise ValueError(f"'commands.{name}.cooldown' scopes must be: {', '.join(COOLDOWN_SCOPES)}")
+    return CooldownPolicy(_seconds(name, raw.get('global', 0), default),
+                          _seconds(name, raw.get('command', 0), default),
+                          _seconds(name, raw.get('user', 0), default))
+
+
+def _spec(name: str, raw: Mapping[str, Any], default_cooldown: float) -> Optional[CommandSpec]:
+    bad = [key for key in raw if key not in _SPEC_KEYS]
+    if bad:
+        raise ValueError(f"'commands.{name}' has unknown keys: {', '.join(map(str, bad))}")
+    if not raw.get('enabled', True):
+        return None
+
+    action = raw.get('action', ACTION_TEXT)
+    if action not in ACTIONS:
+        raise ValueError(f"'commands.{name}.action' must be one of: {', '.join(sorted(ACTIONS))}")
+    args = raw.get('args', 'none')
+    if args not in ARG_SCHEMAS:
+        raise ValueError(f"'commands.{name}.args' must be one of: {', '.join(ARG_SCHEMAS)}")
+    permission = raw.get('permission', 'everyone')
+    if permission not in PERMISSIONS:
+        raise ValueError(f"'commands.{name}.permission' must be one of: {', '.join(PERMISSIONS)}")
+
+    aliases = raw.get('aliases') or ()
+    aliases = [aliases] if isinstance(aliases, str) else aliases
+    if not isinstance(aliases, (list, tuple)) or not all(isinstance(a, str) and a for a in aliases):
+        raise ValueError(f"'commands.{name}.aliases' must be a list of texts, got {aliases!r}")
+
+    responses = raw.get('responses') or {}
+    if not isinstance(responses, Mapping):
+        raise ValueError(f"'commands.{name}.responses' must be a mapping of outcome -> text")
+    responses = dict(responses)
+    if 'response' in raw:
+        responses['ok'] = raw['response']
+    if action == ACTION_TEXT and not responses.get('ok'):
+        raise ValueError(f"'commands.{name}' needs a 'response' text")
+    for outcome, template in responses.items():
+        _check_template(name, outcome, template)
+
+    return CommandSpec(name, action, tuple(a.lower() for a in aliases), args, permission,
+                       MappingProxyType(responses), _cooldown(name, raw.get('cooldown'), default_cooldown))
+
+
+def _legacy_command(command: str, text: str) -> CommandSpec:
+    return CommandSpec(command.lower(), ACTION_TEXT, (), 'none', 'everyone', MappingProxyType({'ok': text}),
+                       literal=True)
+
+
+def build_command_specs(values: Mapping[str, Any], *layers: Optional[Mapping[str, Any]]) -> tuple[CommandSpec, ...]:
+    """Nakłada kolejne sekcje 'commands' (globalną, potem kanału) na wbudowane komendy i dokłada extra_command_1/2.
+
+    Rzuca ValueError przy błędnej deklaracji albo powtórzonej nazwie/aliasie.
+    """
+    declared: dict[str, dict[str, Any]] = {name: dict(spec) for name, spec in DEFAULT_COMMANDS.items()}
+    for raw in layers:
+        raw = raw or {}
+        if not isinstance(raw, Mapping):
+            raise ValueError("'commands' must be a mapping of command name -> settings")
+        for name, overrides in raw.items():
+            if not isinstance(overrides, Mapping):
+                raise ValueError(f"'commands.{name}' must be a mapping of settings")
+            name = str(name).lower()
+            merged = declared.setdefault(name, {})
+            if 'responses' in overrides and 'responses' in merged:
+                # Odpowiedzi łączymy po kluczu, żeby można było zmienić tylko jedną
+                overrides = {**overrides, 'responses': {**merged['responses'], **(overrides['responses'] or {})}}
+            declared[name] = {**merged, **overrides}
+
+    specs = []
+    taken: dict[str, str] = {}
+    for name, spec_raw in declared.items():
+        if values['death_vote_enabled'] and spec_raw.get('action') == 'increment_deaths' \
+                and spec_raw.get('cooldown') == 'default':
+            # Powtórzenia po jednej śmierci odsiewa głosowanie; domyślny cooldown gubiłby kolejne śmierci
+            spec_raw = {**spec_raw, 'cooldown': None}
+        spec = _spec(name, spec_raw, values['command_cooldown'])
+        if spec is None:
+            continue
+        for word in (spec.name, *spec.aliases):
+            if word in taken:
+                raise ValueError(f"'commands.{name}': '{word}' is already used by '{taken[word]}'")
+            taken[word] = name
+        specs.append(spec)
+
+    # Dawne dodatkowe komendy tekstowe; jak wcześniej mają pierwszeństwo przed wbudowanymi
+    for number in (1, 2):
+        if values[f'extra_command_{number}_enabled']:
+            specs.append(_legacy_command(values[f'extra_command_{number}'], values[f'extra_command_{number}_text']))
+    return tuple(specs)
+
+
+class ResponseContext:
+    """Wartości pól szablonu liczone dopiero wtedy, gdy szablon ich używa."""
+
+    __slots__ = ('state', 'user', 'args', 'fields')
+
+    def __init__(self, state, user: str, args: list, fields: Optional[Mapping[str, Any]] = None):
+        self.state = state
+        self.user = user
+        self.args = args
+        self.fields = fields  # Pola policzone przez akcję, np. statystyki bossa
+
+    def __getitem__(self, key: str) -> Any:
+        if self.fields is not None and key in self.fields:
+            return self.fields[key]
+        if key in HISTORY_FIELDS:
+            return ''
+        if key == 'user':
+            return self.user
+        if key == 'emote':
+            return random.choice(self.state.emotes)
+        if key == 'prefix':
+            return self.state.config.prefix
+        if key == 'cooldown':
+            return f'{self.state.config.command_cooldown:g}'
+        if key == 'args':
+            return ' '.join(self.args)
+        return getattr(self.state, key)
+
+
+class Route:
+    """Skompilowana komenda: akcja, schemat argumentów i gotowe szablony."""
+
+    __slots__ = ('name', 'action', 'args', 'mod_only', 'cooldown', 'responses', 'latency', 'rejections')
+
+    def __init__(self, spec: CommandSpec, action: Callable):
+        self.name = spec.name
+        self.action = action
+        self.args = spec.args
+        self.mod_only = spec.permission == 'mod'
+        self.cooldown = spec.cooldown
+        # Metryki po nazwie komendy (nie aliasu), więc ich liczba jest ograniczona przez konfigurację
+        self.latency = COMMAND_SECONDS.labels(spec.name)
+        self.rejections = COOLDOWN_REJECTIONS.labels(spec.name)
+        # Wynik -> (tekst, czy trzeba wstawić pola); szablony bez pól są od razu gotowym tekstem
+        self.responses: dict[str, tuple[str, bool]] = {}
+        for outcome, template in spec.responses.items():
+            if template is None:
+                continue
+            if spec.literal:
+                self.responses[outcome] = (template, False)
+            elif any(field is not None for _, field, _, _ in string.Formatter().parse(template)):
+                self.responses[outcome] = (template, True)
+            else:
+                self.responses[outcome] = (template.format_map({}), False)
+
+
+class CommandRouter:
+    """Zamienia deklaracje komend ze snapshotu konfiguracji w jedną tablicę nazwa/alias -> Route.
+
+    Tablica budowana jest raz na snapshot, więc obsługa komendy to jedno wyszukanie
+    w słowniku i najwyżej jedno format_map, niezależnie od liczby komend.
+    Akcja dostaje (stan, użytkownik, argument) i zwraca klucz odpowiedzi albo None,
+    ewentualnie razem ze słownikiem dodatkowych pól szablonu: (klucz, pola).
+    Cooldowny komendy sprawdzane są przed akcją i zaczynają się po wyniku z CHARGED_OUTCOMES.
+    """
+
+    def __init__(self, actions: Mapping[str, Callable], cooldowns: Optional[CooldownTracker] = None):
+        self.actions = {ACTION_TEXT: self.text, **actions}
+        self.cooldowns = cooldowns if cooldowns is not None else CooldownTracker()
+        self._tables: dict[Any, dict[str, Route]] = {}
+
+    def table(self, config) -> dict[str, Route]:
+        table = self._tables.get(config)
+        if table is None:
+            table = {}
+            for spec in config.commands:
+                route = Route(spec, self.actions[spec.action])
+                for word in (spec.name, *spec.aliases):
+                    table[word] = route
+            self._tables[config] = table
+        return table
+
+    def route_name(self, config, command: str) -> Optional[str]:
+        """Nazwa komendy dla słowa z czatu (bez prefiksu), także dla aliasu; None dla nieznanej."""
+        route = self.table(config).get(command)
+        return route.name if route is not None else None
+
+    def clear(self) -> None:
+        """Zapomina skompilowane tablice, np. po przeładowaniu konfiguracji."""
+        self._tables.clear()
+
+    def dispatch(self, state, command: str, user: str, authorized: bool, args: list) -> Optional[str]:
+        route = self.table(state.config).get(command)
+        if route is None:
+            return None
+
+        started = time.perf_counter()
+        cooldown = route.cooldown
+        fields = None
+        if route.mod_only and not authorized:
+            outcome = 'denied'
+        elif cooldown and self.cooldowns.remaining(state.channel, route.name, user, cooldown):
+            outcome = 'cooldown'
+            route.rejections.inc()
+        else:
+            if route.args == 'none':
+                outcome = route.action(state, user, None)
+            elif route.args == 'int':
+                # Brak liczby to 'usage', ale zwraca je akcja, żeby najpierw sprawdziła stan (np. 'no_boss')
+                outcome = route.action(state, user, int(args[0]) if args and args[0].isdecimal() else None)
+            else:
+                outcome = route.action(state, user, args)
+            if type(outcome) is tuple:
+                outcome, fields = outcome
+            if cooldown and outcome in CHARGED_OUTCOMES:
+                self.cooldowns.start(state.channel, route.name, user, cooldown)
+
+        response = route.responses.get(outcome)
+        if response is not None:
+            text, has_fields = response
+            response = text.format_map(ResponseContext(state, user, args, fields)) if has_fields else text
+        route.latency.observe(time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def text(state, user: str, arg) -> str:
+        return 'ok'
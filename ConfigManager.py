@@ -1,15 +1,54 @@
+import marshal
 import os
-from typing import Any, Dict
+import threading
+from typing import Any, Callable, Dict, Optional
 import logging
-from ruamel.yaml import YAML, comments
+
+from ConfigSnapshot import ConfigSnapshot, build_snapshot, default_config as default_config_values
+
+CACHE_FORMAT = 1  # Zmiana układu pliku .cache unieważnia stare pliki
+
+
+def _plain(value: Any) -> Any:
+    """Wartość z ruamel.yaml (CommentedMap, ScalarFloat...) jako zwykłe typy Pythona, które zapisze marshal."""
+    if isinstance(value, dict):
+        return {_plain(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, bool) or type(value).__name__ == 'ScalarBoolean':
+        return bool(value)
+    for kind in (int, float, str):
+        if isinstance(value, kind):
+            return kind(value)
+    return value
 
 
 class ConfigManager:
+    """Wczytuje settings.yaml i publikuje go jako niezmienny ConfigSnapshot.
+
+    Gorąca ścieżka czyta wyłącznie self.snapshot. Po zmianie pliku watcher wczytuje
+    i sprawdza go w tle, a nowy snapshot podmienia jednym przypisaniem; jeśli plik
+    jest błędny, zostaje ostatni poprawny snapshot.
+
+    Poprawna konfiguracja zapisywana jest też w '<plik>.cache' (marshal) razem z czasem
+    modyfikacji, rozmiarem i skrótem pliku. Przy starcie bez zmian w pliku YAML nie jest
+    parsowany, a ruamel.yaml nie jest nawet importowany; po samej zmianie czasu
+    modyfikacji (np. kopia przy wdrożeniu) wystarcza porównanie skrótu.
+    """
+
     def __init__(self, config_file: str = 'settings.yaml'):
         self.logger = logging.getLogger(__name__)
         self.config_file = config_file
         self.config: Dict[str, Any] = {}
-        self.yaml = YAML()
+        self.snapshot: Optional[ConfigSnapshot] = None
+        self.cache_file = config_file + '.cache'
+        self._yaml = None
+        self._from_cache = False  # self.config to zwykły słownik z cache, bez komentarzy z pliku
+        self._reload_listeners: list[Callable[[ConfigSnapshot], None]] = []
+        self._file_signature: Optional[tuple[int, int]] = None
+        self._pending_signature: Optional[tuple[int, int]] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
         self.load_config()
 
     def load_config(self) -> None:
@@ -18,18 +57,161 @@ class ConfigManager:
             if not os.path.exists(self.config_file):
                 self.create_default_config()
 
-            with open(self.config_file, 'r', encoding='utf-8') as file:
-                self.config = self.yaml.load(file)
-            self.logger.info(f"Configuration loaded from {self.config_file}")
+            signature = self._signature()
+            config, from_cache = self._read(signature)
+            snapshot = build_snapshot(config)
+            self.logger.info(f"Configuration loaded from {self.cache_file if from_cache else self.config_file}")
         except Exception as e:
             self.logger.error(f"Error loading configuration: {str(e)}")
             raise
+        self._publish(config, snapshot, signature, from_cache)
+
+    def reload(self) -> bool:
+        """Wczytuje plik ponownie. Przy błędzie zostawia poprzednią konfigurację i zwraca False."""
+        try:
+            signature = self._signature()
+            config, from_cache = self._read(signature)
+            snapshot = build_snapshot(config)
+        except Exception as e:
+            # Błąd odczytu, składni YAML albo walidacji (ConfigError)
+            self.logger.error(f"Configuration not reloaded, keeping previous settings: {e}")
+            self._file_signature = signature  # Nie próbujemy ponownie, dopóki plik się nie zmieni
+            return False
+
+        if snapshot.channels != self.snapshot.channels:
+            self.logger.warning("Changing the channel list requires a restart; new channel list ignored")
+            snapshot = build_snapshot({**config, 'channel': list(self.snapshot.channels)})
+        self.logger.info(f"Configuration reloaded from {self.config_file}")
+        self._publish(config, snapshot, signature, from_cache)
+        return True
+
+    def check_for_changes(self) -> bool:
+        """Przeładowuje konfigurację, jeśli plik zmienił się od ostatniego wczytania.
+
+        Plik musi wyglądać tak samo przy dwóch kolejnych sprawdzeniach, żeby nie
+        wczytywać go w trakcie zapisu przez edytor.
+        """
+        signature = self._signature()
+        if signature == self._file_signature:
+            return False
+        if signature != self._pending_signature:
+            self._pending_signature = signature
+            return False
+        return self.reload()
+
+    def start_watching(self, interval: Optional[float] = None) -> None:
+        """Uruchamia wątek, który co 'interval' sekund sprawdza, czy plik się zmienił."""
+        interval = self.snapshot.config_reload_interval if interval is None else interval
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='config-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        self._watcher = None
+
+    def on_reload(self, listener: Callable[[ConfigSnapshot], None]) -> None:
+        """Rejestruje funkcję wołaną z nowym snapshotem po każdym wczytaniu konfiguracji."""
+        self._reload_listeners.append(listener)
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop_watching.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                self.logger.error(f"Error checking configuration file: {e}")
+
+    def _signature(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def yaml(self):
+        """Parser ruamel.yaml (tryb z zachowaniem komentarzy), importowany dopiero przy pierwszym użyciu."""
+        if self._yaml is None:
+            from ruamel.yaml import YAML
+            self._yaml = YAML()
+        return self._yaml
+
+    def _read(self, signature) -> tuple[Dict[str, Any], bool]:
+        """Konfiguracja z cache, jeśli plik się nie zmienił, w przeciwnym razie z YAML. Zwraca (config, z_cache)."""
+        cached = self._read_cache()
+        if cached is not None and signature is not None and cached['signature'] == list(signature):
+            return cached['config'], True
+
+        from hashlib import blake2b
+        with open(self.config_file, 'rb') as file:
+            data = file.read()
+        digest = blake2b(data, digest_size=16).hexdigest()
+        if cached is not None and cached['digest'] == digest:
+            self._write_cache(signature, digest, cached['config'])  # Ta sama treść, nowy czas modyfikacji
+            return cached['config'], True
+
+        config = self.yaml.load(data.decode('utf-8'))
+        build_snapshot(config)  # Do cache trafia tylko poprawna konfiguracja; błąd przerywa wczytywanie
+        self._write_cache(signature, digest, _plain(config))
+        return config, False
+
+    def _read_cache(self) -> Optional[dict]:
+        try:
+            with open(self.cache_file, 'rb') as file:
+                cached = marshal.load(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(cached, dict) or cached.get('format') != CACHE_FORMAT:
+            return None
+        return cached
+
+    def _write_cache(self, signature, digest: str, config: Dict[str, Any]) -> None:
+        if signature is None:
+            return
+        import tempfile  # Tylko przy zmianie pliku; zwykły start z cache go nie potrzebuje
+        tmp_path = None
+        try:
+            data = marshal.dumps({'format': CACHE_FORMAT, 'signature': list(signature), 'digest': digest,
+                                  'config': config})
+            # Procesy ShardSupervisor startują razem i zapisują ten sam cache, więc każdy ma własny plik tymczasowy
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.cache_file) + '.', suffix='.tmp',
+                                            dir=os.path.dirname(os.path.abspath(self.cache_file)))
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, self.cache_file)
+        except (OSError, ValueError) as e:
+            # ValueError: wartość, której marshal nie zapisze (np. data w YAML); działamy bez cache
+            self.logger.warning(f"Configuration cache not written: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _editable(self) -> Dict[str, Any]:
+        """Konfiguracja do zmiany i zapisu: wczytana z YAML razem z komentarzami, a nie z cache."""
+        if self._from_cache:
+            with open(self.config_file, 'r', encoding='utf-8') as file:
+                self.config = self.yaml.load(file)
+            self._from_cache = False
+        return self.config
+
+    def _publish(self, config: Dict[str, Any], snapshot: ConfigSnapshot, signature, from_cache: bool) -> None:
+        self.config = config
+        self._from_cache = from_cache
+        self.snapshot = snapshot  # Pojedyncze przypisanie: czytelnicy widzą stary albo nowy snapshot
+        self._file_signature = signature
+        for listener in self._reload_listeners:
+            listener(snapshot)
 
     def save_config(self) -> None:
         """Zapisuje aktualną konfigurację do pliku YAML."""
         try:
+            config = self._editable()
             with open(self.config_file, 'w', encoding='utf-8') as file:
-                self.yaml.dump(self.config, file)
+                self.yaml.dump(config, file)
             self.logger.info(f"Configuration saved to {self.config_file}")
         except Exception as e:
             self.logger.error(f"Error saving configuration: {str(e)}")
@@ -37,35 +219,25 @@ class ConfigManager:
 
     def create_default_config(self) -> None:
         """Tworzy domyślną konfigurację, jeśli plik nie istnieje."""
-        default_config = comments.CommentedMap({
-            'channel': 'krwawyy',
-            'prefix': "!",
-            'spam_bot_enabled': True,
-            'spam_bot_messages': 50,
-            'spam_bot_message': "Wpisujcie '!death+', aby zwiększyć licznik, istnieje też komenda '!help' w której są wypisane wszystkie komendy!",
-            'white_list_enabled': True,
-            'white_list': ['your_nickname', 'arquel'],
-            'black_list_enabled': False,
-            'black_list': ['nick'],
-            'emotes': ["aha9", "aha1000", "HAHAHA", "beka", "alejaja", "gachiRoll", "duch", "buh", "xdd", "xpp", "trup",
-                       "blushh", "owo", "owoCheer", "Evilowo"],
-            'command_cooldown': 15,
-            'all_users_mod': True,
-            'bot_moderators': ['mod', 'subscriber', 'vip', 'broadcaster'],
-            'extra_command_1_enabled': False,
-            'extra_command_1': 'malenia',
-            'extra_command_1_text': 'Malenia rozwalona po 10 godzinach',
-            'extra_command_2_enabled': False,
-            'extra_command_2': 'dis',
-            'extra_command_2_text': 'Dis rozwalony po 20 latach'
-        })
+        from ruamel.yaml import comments
+        default_config = comments.CommentedMap(default_config_values())
 
         # Dodawanie komentarzy do konfiguracji
-        default_config.yaml_add_eol_comment('Kanał na którym ma działać bot np. "krwawyy"', key='channel')
+        default_config.yaml_add_eol_comment('Kanał na którym ma działać bot np. "krwawyy" lub lista kanałów np. ["krwawyy", "arquel"]', key='channel')
+        default_config.yaml_add_eol_comment(
+            'Ustawienia nadpisane dla wybranych kanałów, np. {krwawyy: {prefix: "^", command_cooldown: 5}}',
+            key='channel_overrides')
         default_config.yaml_add_eol_comment('Prefix komend np. "!" lub "^", pamiętaj, aby zmienić prefiksy poniżej!', key='prefix')
         default_config.yaml_add_eol_comment('Wyłącza lub włącza automatyczne wysyłanie wiadomości co spambot_cooldown',
                                             key='spam_bot_enabled')
         default_config.yaml_add_eol_comment('Czas co ile wiadomości ma wysyłać wiadomość', key='spam_bot_messages')
+        default_config.yaml_add_eol_comment('Najmniej sekund między wiadomościami spam bota, nawet w szybkim czacie',
+                                            key='spam_bot_min_interval')
+        default_config.yaml_add_eol_comment(
+            'Po tylu sekundach wiadomość wychodzi także w wolnym czacie (0 wyłącza)', key='spam_bot_max_interval')
+        default_config.yaml_add_eol_comment(
+            'Ile różnych osób musi pisać w ostatnich 10 minutach, żeby zadziałał spam_bot_max_interval '
+            '(0: wiadomość wychodzi nawet w pustym czacie)', key='spam_bot_min_chatters')
         default_config.yaml_add_eol_comment(
             'Wiadomość wysyłana co x wiadomości, pamiętaj żeby zmienić prefix w wiadomości!', key='spam_bot_message')
         default_config.yaml_add_eol_comment(
@@ -80,6 +252,34 @@ class ConfigManager:
         default_config.yaml_add_eol_comment(
             'Cooldown na wiadomości, np. 15 oznacza, że przez 15 sekund po napisaniu np. "!death+" kolejne wywołania komendy nie zadziałają',
             key='command_cooldown')
+        default_config.yaml_add_eol_comment(
+            'Tryb głosowania: "!death+" zwiększa licznik dopiero, gdy napisze je death_vote_quorum różnych osób '
+            'w ciągu death_vote_window sekund; kolejne "!death+" przez death_vote_absorb sekund dotyczą tej samej '
+            'śmierci',
+            key='death_vote_enabled')
+        default_config.yaml_add_eol_comment('Okno głosowania w sekundach', key='death_vote_window')
+        default_config.yaml_add_eol_comment('Ile różnych osób musi napisać "!death+" (1 = tylko pomijanie powtórzeń)',
+                                            key='death_vote_quorum')
+        default_config.yaml_add_eol_comment(
+            'Przez ile sekund po zaliczeniu śmierci każde "!death+" dotyczy tej samej śmierci; później do końca okna '
+            'pomijane są tylko powtórzenia osób, które ją zaliczyły, a nowe quorum innych osób to kolejna śmierć',
+            key='death_vote_absorb')
+        default_config.yaml_add_eol_comment(
+            'Co ile sekund najwyżej bot odpowiada na tę samą komendę; odpowiedzi w tym czasie łączone są w jedną',
+            key='response_coalesce_window')
+        default_config.yaml_add_eol_comment(
+            'Co ile sekund sprawdzać, czy plik ustawień się zmienił (0 wyłącza przeładowywanie w locie)',
+            key='config_reload_interval')
+        default_config.yaml_add_eol_comment(
+            'Połączenie z czatem szyfrowane TLS (port 6697); zmiana wymaga restartu', key='tls_enabled')
+        default_config.yaml_add_eol_comment(
+            'Udostępnia metryki bota pod http://127.0.0.1:<metrics_port>/metrics (format Prometheusa)',
+            key='metrics_enabled')
+        default_config.yaml_add_eol_comment('Port endpointu z metrykami', key='metrics_port')
+        default_config.yaml_add_eol_comment(
+            'Nakładka dla OBS (źródło "Przeglądarka"): http://127.0.0.1:<overlay_port>/overlay?channel=<kanał>',
+            key='overlay_enabled')
+        default_config.yaml_add_eol_comment('Port serwera nakładki', key='overlay_port')
         default_config.yaml_add_eol_comment(
             'Czy wszyscy użytkownicy mogą moderować bota: "!death+", "!death-", "!setdeaths", "!startboss", "!pauseboss", "!finishboss", "!setbossdeaths"',
             key='all_users_mod')
@@ -91,6 +291,9 @@ class ConfigManager:
         default_config.yaml_add_eol_comment('Czy włączyć dodatkową komendę?', key='extra_command_2_enabled')
         default_config.yaml_add_eol_comment('Jak ma być wywoływana ta komenda?', key='extra_command_2')
         default_config.yaml_add_eol_comment('Co bot ma pisać gdy, ktoś wpisze komendę?', key='extra_command_2_text')
+        default_config.yaml_add_eol_comment(
+            'Własne komendy i zmiany wbudowanych, np. {deaths: {aliases: [d]}, discord: {response: "discord.gg/..."}}',
+            key='commands')
 
         self.config = default_config
         self.save_config()
@@ -99,10 +302,18 @@ class ConfigManager:
         print(f"Edit configuration file: {self.config_file} and start again.")
         exit(1)
 
+    def channels(self) -> list[str]:
+        """Zwraca listę kanałów (bez '#', małymi literami), do których bot ma dołączyć."""
+        return list(self.snapshot.channels)
+
+    def for_channel(self, channel: str) -> ConfigSnapshot:
+        """Zwraca snapshot konfiguracji z nadpisaniami dla podanego kanału."""
+        return self.snapshot.for_channel(channel)
+
     def __getitem__(self, key: str) -> Any:
         """Pobiera wartość z konfiguracji za pomocą nawiasów kwadratowych."""
         return self.config.get(key)
 
     def __setitem__(self, key: str, value: Any) -> None:
         """Ustawia wartość w konfiguracji za pomocą nawiasów kwadratowych."""
-        self.config[key] = value
\ No newline at end of file
+        self._editable()[key] = value
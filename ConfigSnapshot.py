@@ -0,0 +1,207 @@
+import copy
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from CommandRouter import CommandSpec, build_command_specs
+
+# Domyślne ustawienia; brakujące w settings.yaml klucze biorą wartość stąd
+DEFAULT_CONFIG: dict[str, Any] = {
+    'channel': 'krwawyy',
+    'channel_overrides': {},
+    'commands': {},
+    'prefix': "!",
+    'spam_bot_enabled': True,
+    'spam_bot_messages': 50,
+    'spam_bot_min_interval': 120,
+    'spam_bot_max_interval': 900,
+    'spam_bot_min_chatters': 3,
+    'spam_bot_message': "Wpisujcie '!death+', aby zwiększyć licznik, istnieje też komenda '!help' w której są wypisane wszystkie komendy!",
+    'white_list_enabled': True,
+    'white_list': ['your_nickname', 'arquel'],
+    'black_list_enabled': False,
+    'black_list': ['nick'],
+    'emotes': ["aha9", "aha1000", "HAHAHA", "beka", "alejaja", "gachiRoll", "duch", "buh", "xdd", "xpp", "trup",
+               "blushh", "owo", "owoCheer", "Evilowo"],
+    'command_cooldown': 15,
+    'death_vote_enabled': False,
+    'death_vote_window': 10,
+    'death_vote_quorum': 3,
+    'death_vote_absorb': 3,
+    'response_coalesce_window': 5,
+    'config_reload_interval': 2,
+    'tls_enabled': False,
+    'metrics_enabled': False,
+    'metrics_port': 9108,
+    'overlay_enabled': False,
+    'overlay_port': 8108,
+    'all_users_mod': True,
+    'bot_moderators': ['mod', 'subscriber', 'vip', 'broadcaster'],
+    'extra_command_1_enabled': False,
+    'extra_command_1': 'malenia',
+    'extra_command_1_text': 'Malenia rozwalona po 10 godzinach',
+    'extra_command_2_enabled': False,
+    'extra_command_2': 'dis',
+    'extra_command_2_text': 'Dis rozwalony po 20 latach'
+}
+
+# Klucze, których nie można nadpisać per kanał
+GLOBAL_ONLY_KEYS = frozenset({'channel', 'channel_overrides', 'config_reload_interval', 'tls_enabled',
+                              'metrics_enabled', 'metrics_port', 'overlay_enabled', 'overlay_port'})
+
+
+class ConfigError(ValueError):
+    """Błędna wartość w settings.yaml."""
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class ConfigSnapshot:
+    """Niezmienna, sprawdzona kopia ustawień, czytana zwykłym dostępem do atrybutów.
+
+    Snapshot globalny trzyma w channel_snapshots gotowe snapshoty kanałów
+    z nałożonymi 'channel_overrides'; for_channel zwraca odpowiedni. Snapshoty
+    porównywane są po tożsamości, więc mogą być kluczami pamięci podręcznych.
+    """
+
+    channels: tuple[str, ...]
+    prefix: str
+    spam_bot_enabled: bool
+    spam_bot_messages: int
+    spam_bot_min_interval: float
+    spam_bot_max_interval: float
+    spam_bot_min_chatters: int
+    spam_bot_message: str
+    white_list_enabled: bool
+    white_list: tuple[str, ...]
+    black_list_enabled: bool
+    black_list: tuple[str, ...]
+    emotes: tuple[str, ...]
+    command_cooldown: float
+    death_vote_enabled: bool
+    death_vote_window: float
+    death_vote_quorum: int
+    death_vote_absorb: float
+    response_coalesce_window: float
+    config_reload_interval: float
+    tls_enabled: bool
+    metrics_enabled: bool
+    metrics_port: int
+    overlay_enabled: bool
+    overlay_port: int
+    all_users_mod: bool
+    bot_moderators: tuple[str, ...]
+    extra_command_1_enabled: bool
+    extra_command_1: str
+    extra_command_1_text: str
+    extra_command_2_enabled: bool
+    extra_command_2: str
+    extra_command_2_text: str
+    commands: tuple[CommandSpec, ...] = ()  # Komendy wbudowane, z sekcji 'commands' i extra_command_*
+    overridden: frozenset[str] = frozenset()  # Klucze nadpisane dla kanału
+    channel_snapshots: Mapping[str, 'ConfigSnapshot'] = field(default_factory=lambda: MappingProxyType({}))
+
+    def for_channel(self, channel: str) -> 'ConfigSnapshot':
+        return self.channel_snapshots.get(channel, self)
+
+    def __getitem__(self, key: str) -> Any:
+        """Dostęp przez nawiasy, jak w ConfigManager."""
+        return getattr(self, key)
+
+
+_FIELD_TYPES = {f.name: f.type for f in fields(ConfigSnapshot)}
+ZERO_ALLOWED = frozenset({'spam_bot_min_chatters'})  # Liczby całkowite, dla których 0 ma sens
+
+
+def _coerce(key: str, value: Any) -> Any:
+    expected = _FIELD_TYPES[key]
+    if expected == 'bool' or expected is bool:
+        if not isinstance(value, bool):
+            raise ConfigError(f"'{key}' must be True or False, got {value!r}")
+        return value
+    if expected in ('int', int):
+        if key in ZERO_ALLOWED:
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ConfigError(f"'{key}' must be a non-negative integer, got {value!r}")
+        elif isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ConfigError(f"'{key}' must be a positive integer, got {value!r}")
+        return value
+    if expected in ('float', float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ConfigError(f"'{key}' must be a non-negative number, got {value!r}")
+        return float(value)
+    if expected in ('str', str):
+        if not isinstance(value, str):
+            raise ConfigError(f"'{key}' must be text, got {value!r}")
+        return value
+    # Listy tekstów
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+        raise ConfigError(f"'{key}' must be a list of texts, got {value!r}")
+    return tuple(value)
+
+
+def _values(raw: Mapping[str, Any], base: dict[str, Any]) -> dict[str, Any]:
+    values = dict(base)
+    for key, value in raw.items():
+        if key in _FIELD_TYPES and key not in ('channels', 'commands', 'overridden', 'channel_snapshots'):
+            values[key] = _coerce(key, value)
+    return values
+
+
+def _commands(values: Mapping[str, Any], *layers: Any) -> tuple[CommandSpec, ...]:
+    try:
+        return build_command_specs(values, *layers)
+    except ValueError as e:
+        raise ConfigError(str(e)) from None
+
+
+def _checked(snapshot: ConfigSnapshot) -> ConfigSnapshot:
+    if not snapshot.prefix:
+        raise ConfigError("'prefix' must not be empty")
+    if not snapshot.emotes:
+        raise ConfigError("'emotes' must contain at least one emote")
+    return snapshot
+
+
+def build_snapshot(raw: Mapping[str, Any]) -> ConfigSnapshot:
+    """Sprawdza surową konfigurację z YAML i buduje z niej snapshot. Rzuca ConfigError przy błędzie."""
+    if raw is None:
+        raise ConfigError("configuration file is empty")
+
+    base = _values(DEFAULT_CONFIG, {})
+    values = _values(raw, base)
+
+    channel = raw.get('channel', DEFAULT_CONFIG['channel'])
+    channel = [channel] if isinstance(channel, str) else channel
+    if not isinstance(channel, (list, tuple)) or not channel or not all(isinstance(c, str) for c in channel):
+        raise ConfigError(f"'channel' must be a channel name or a list of names, got {channel!r}")
+    values['channels'] = tuple(dict.fromkeys(c.lstrip('#').lower() for c in channel))
+    commands = raw.get('commands')
+    values['commands'] = _commands(values, commands)
+
+    snapshot = _checked(ConfigSnapshot(**values))
+
+    overrides = raw.get('channel_overrides') or {}
+    if not isinstance(overrides, Mapping):
+        raise ConfigError("'channel_overrides' must be a mapping of channel -> settings")
+    channel_snapshots = {}
+    for name, channel_raw in overrides.items():
+        if not isinstance(channel_raw, Mapping):
+            raise ConfigError(f"'channel_overrides.{name}' must be a mapping of settings")
+        bad = [key for key in channel_raw if key in GLOBAL_ONLY_KEYS or key not in _FIELD_TYPES]
+        if bad:
+            raise ConfigError(f"'channel_overrides.{name}' cannot set: {', '.join(map(str, bad))}")
+        channel_values = _values(channel_raw, {})
+        if ('commands' in channel_raw or 'command_cooldown' in channel_values or 'death_vote_enabled' in channel_values
+                or any(key.startswith('extra_command_') for key in channel_values)):
+            # Komendy kanału nakładane są na globalną sekcję 'commands'
+            channel_values['commands'] = _commands({**values, **channel_values}, commands, channel_raw.get('commands'))
+        channel_snapshots[str(name).lstrip('#').lower()] = _checked(replace(
+            snapshot, overridden=frozenset(channel_raw), **channel_values))
+
+    return replace(snapshot, channel_snapshots=MappingProxyType(channel_snapshots))
+
+
+def default_config() -> dict[str, Any]:
+    return copy.deepcopy(DEFAULT_CONFIG)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import Metrics
+from MessageScheduler import MessageScheduler
+from TwitchConnection import PingTimeout, ReconnectRequested
+
+BACKOFF_INITIAL = 1.0  # Górna granica odczekania przed drugą próbą (pierwsza jest natychmiastowa)
+BACKOFF_MAX = 60.0  # Najdłuższe odczekanie między próbami
+STABLE_AFTER = 60.0  # Połączenie trwające tyle sekund zeruje backoff
+
+DISCONNECTS = Metrics.counter('twitchbot_disconnects_total', 'Lost connections to Twitch IRC', ('reason',))
+RECOVERY_SECONDS = Metrics.histogram('twitchbot_recovery_seconds', 'Time from detecting a lost connection to '
+                                     'rejoining all channels',
+                                     buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+
+
+class Backoff:
+    """Wykładnicze odczekanie z losowym rozrzutem (połowa stała, połowa losowa).
+
+    Pierwsza próba jest natychmiastowa, kolejne czekają 0.5-1 s, 1-2 s, 2-4 s... do maximum.
+    Rozrzut sprawia, że po awarii Twitcha wiele botów nie łączy się w tej samej chwili.
+    """
+
+    def __init__(self, initial: float = BACKOFF_INITIAL, maximum: float = BACKOFF_MAX,
+                 rng: Optional[random.Random] = None):
+        self.initial = initial
+        self.maximum = maximum
+        self.attempt = 0
+        self.rng = rng or random.Random()
+
+    def next_delay(self) -> float:
+        self.attempt += 1
+        if self.attempt == 1:
+            return 0.0
+        ceiling = min(self.maximum, self.initial * 2 ** (self.attempt - 2))
+        return ceiling / 2 + self.rng.uniform(0, ceiling / 2)
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+def disconnect_reason(error: BaseException) -> str:
+    if isinstance(error, PingTimeout):
+        return 'ping_timeout'
+    if isinstance(error, ReconnectRequested):
+        return 'reconnect_requested'
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return 'timeout'
+    return 'closed' if isinstance(error, ConnectionError) else 'error'
+
+
+class ConnectionSupervisor:
+    """Utrzymuje połączenie z czatem: czyta linie, a po zerwaniu łączy się ponownie.
+
+    Po błędzie gniazda, braku odpowiedzi na PING albo RECONNECT od Twitcha połączenie
+    jest zamykane, a po odczekaniu (Backoff) nawiązywane od nowa, z CAP/PASS/NICK/JOIN
+    dla wszystkich kanałów. Na czas przerwy kolejka wiadomości wychodzących jest
+    wstrzymana, więc odpowiedzi z tego czasu wychodzą po ponownym JOIN. Stan kanałów
+    (liczniki, timery bossów) żyje w TwitchBot i nie jest przy tym ruszany.
+    LoginFailed i inne wyjątki spoza OSError kończą run().
+    """
+
+    def __init__(self, connection, username: str, oauth_token: str, channels: list[str],
+                 outbox: Optional[MessageScheduler] = None, backoff: Optional[Backoff] = None,
+                 stable_after: float = STABLE_AFTER):
+        self.connection = connection
+        self.username = username
+        self.oauth_token = oauth_token
+        self.channels = list(channels)
+        self.outbox = outbox
+        self.backoff = backoff or Backoff()
+        self.stable_after = stable_after
+        self.disconnects = 0
+        self.last_recovery: Optional[float] = None  # Sekundy od zerwania do ponownego połączenia
+
+        self._down_since: Optional[float] = None
+        self._connected_at = 0.0
+        self._stop = threading.Event()
+        self._async_stop: Optional[asyncio.Event] = None
+
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, handle: Callable[[list[str]], None]) -> None:
+        """Pętla dla trybu wątkowego; handle dostaje każdą paczkę odebranych linii."""
+        self._stop.clear()
+        self._pause_outbox()
+        while not self._stop.is_set():
+            try:
+                self.connection.connect(self.username, self.oauth_token, self.channels)
+            except OSError as e:
+                self._stop.wait(self._retry_delay(e))
+                continue
+            self._connected()
+            try:
+                while not self._stop.is_set():
+                    handle(self.connection.receive_messages())
+            except OSError as e:
+                if self._stop.is_set():
+                    break
+                self._lost(e)
+                self._stop.wait(self.backoff.next_delay())
+
+    async def run_async(self, handle: Callable[[list[str]], None]) -> None:
+        """Pętla dla trybu asyncio; po każdej paczce czeka na opróżnienie bufora wysyłania."""
+        self._async_stop = asyncio.Event()
+        self._pause_outbox()
+        try:
+            while not self._stop.is_set():
+                try:
+                    await self.connection.connect(self.username, self.oauth_token, self.channels)
+                except (OSError, asyncio.TimeoutError) as e:
+                    await self._sleep(self._retry_delay(e))
+                    continue
+                self._connected()
+                try:
+                    while not self._stop.is_set():
+                        handle(await self.connection.receive_messages())
+                        await self.connection.drain()
+                except OSError as e:
+                    if self._stop.is_set():
+                        break
+                    self._lost(e)
+                    await self._sleep(self.backoff.next_delay())
+        finally:
+            self._async_stop = None
+
+    def stop(self) -> None:
+        """Kończy run()/run_async() bez ponownego łączenia; samo połączenie zamyka wywołujący."""
+        self._stop.set()
+        if self._async_stop is not None:
+            self._async_stop.set()
+
+    def join(self, channel: str) -> None:
+        """Dodaje kanał; gdy wysłanie JOIN się nie uda, dołączy przy ponownym połączeniu."""
+        if channel not in self.channels:
+            self.channels.append(channel)
+        try:
+            self.connection.join(channel)
+        except OSError as e:
+            self.logger.warning(f"JOIN #{channel} not sent ({e}), joining after reconnect")
+
+    def part(self, channel: str) -> None:
+        if channel in self.channels:
+            self.channels.remove(channel)
+        try:
+            self.connection.part(channel)
+        except OSError as e:
+            self.logger.warning(f"PART #{channel} not sent ({e})")
+
+    def stats(self) -> dict:
+        return {'connects': self.connection.connect_count, 'disconnects': self.disconnects,
+                'last_recovery_s': None if self.last_recovery is None else round(self.last_recovery, 3)}
+
+    def _connected(self) -> None:
+        now = time.monotonic()
+        self._connected_at = now
+        if self._down_since is not None:
+            self.last_recovery = now - self._down_since
+            RECOVERY_SECONDS.observe(self.last_recovery)
+            self.logger.info(f"Reconnected after {self.last_recovery:.2f} s")
+            self._down_since = None
+        if self.outbox is not None:
+            self.outbox.resume()
+
+    def _lost(self, error: BaseException) -> None:
+        now = time.monotonic()
+        self._down_since = now
+        self.disconnects += 1
+        reason = disconnect_reason(error)
+        DISCONNECTS.labels(reason).inc()
+        self._pause_outbox()
+        self.connection.drop()
+        # Po stabilnym połączeniu pierwsza próba od razu; serwer zrywający co chwilę daje coraz dłuższe przerwy
+        if now - self._connected_at >= self.stable_after:
+            self.backoff.reset()
+        self.logger.warning(f"Connection lost ({reason}: {error}), reconnecting")
+
+    def _pause_outbox(self) -> None:
+        if self.outbox is not None:
+            self.outbox.pause()
+
+    def _retry_delay(self, error: BaseException) -> float:
+        delay = self.backoff.next_delay()
+        self.logger.warning(f"Connecting to {self.connection.server}:{self.connection.port} failed ({error}), "
+                            f"next attempt in {delay:.1f} s")
+        return delay
+
+    async def _sleep(self, delay: float) -> None:
+        try:
+            await asyncio.wait_for(self._async_stop.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
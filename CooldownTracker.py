@@ -0,0 +1,116 @@
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+MAX_ENTRIES = 100_000  # Górna granica pamiętanych cooldownów (kanały x komendy x użytkownicy)
+
+
+@dataclass(frozen=True, slots=True)
+class CooldownPolicy:
+    """Cooldowny komendy w sekundach; 0 wyłącza dany zakres.
+
+    global_seconds blokuje na kanale wszystkie komendy z niezerowym zakresem globalnym,
+    command_seconds blokuje tę komendę na kanale dla wszystkich, a user_seconds
+    tylko dla użytkownika, który ją wywołał.
+    """
+
+    global_seconds: float = 0.0
+    command_seconds: float = 0.0
+    user_seconds: float = 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self.global_seconds or self.command_seconds or self.user_seconds)
+
+
+NO_COOLDOWN = CooldownPolicy()
+
+
+class CooldownTracker:
+    """Cooldowny komend na zegarze monotonicznym, z wygasaniem przez kopiec.
+
+    Każdy aktywny cooldown to wpis klucz -> chwila wygaśnięcia oraz pozycja w kopcu
+    uporządkowanym po tej chwili. Przy każdym sprawdzeniu z wierzchu kopca zdejmowane są
+    wpisy, które już wygasły, więc pamiętane są tylko trwające cooldowny. Gdyby mimo to
+    było ich więcej niż max_entries, zapominane są te, które wygasają najwcześniej.
+    """
+
+    __slots__ = ('max_entries', 'clock', '_expiry', '_heap', 'blocked', 'evicted')
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._expiry: dict[tuple, float] = {}
+        self._heap: list[tuple[float, tuple]] = []
+        self.blocked = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def remaining(self, channel: str, command: str, user: str, policy: CooldownPolicy,
+                  now: Optional[float] = None) -> float:
+        """Ile sekund zostało do końca najdłuższego trwającego cooldownu (0, gdy można wykonać komendę)."""
+        now = self.clock() if now is None else now
+        self._purge(now)
+        expiry = self._expiry
+        until = 0.0
+        if policy.global_seconds:
+            until = max(until, expiry.get((channel,), 0.0))
+        if policy.command_seconds:
+            until = max(until, expiry.get((channel, command), 0.0))
+        if policy.user_seconds:
+            until = max(until, expiry.get((channel, command, user.lower()), 0.0))
+        if until > now:
+            self.blocked += 1
+            return until - now
+        return 0.0
+
+    def start(self, channel: str, command: str, user: str, policy: CooldownPolicy,
+              now: Optional[float] = None) -> None:
+        """Rozpoczyna cooldowny komendy po jej wykonaniu."""
+        now = self.clock() if now is None else now
+        if policy.global_seconds:
+            self._set((channel,), now + policy.global_seconds)
+        if policy.command_seconds:
+            self._set((channel, command), now + policy.command_seconds)
+        if policy.user_seconds:
+            self._set((channel, command, user.lower()), now + policy.user_seconds)
+
+    def reset(self, channel: Optional[str] = None) -> None:
+        """Kasuje cooldowny kanału albo wszystkie."""
+        if channel is None:
+            self._expiry.clear()
+            self._heap.clear()
+            return
+        self._expiry = {key: until for key, until in self._expiry.items() if key[0] != channel}
+        self._heap = [(until, key) for key, until in self._expiry.items()]
+        heapq.heapify(self._heap)
+
+    def stats(self) -> dict[str, int]:
+        return {'active': len(self._expiry), 'heap': len(self._heap), 'blocked': self.blocked,
+                'evicted': self.evicted}
+
+    def _set(self, key: tuple, until: float) -> None:
+        self._expiry[key] = until
+        heapq.heappush(self._heap, (until, key))
+        if len(self._expiry) > self.max_entries:
+            self._evict()
+
+    def _purge(self, now: float) -> None:
+        heap = self._heap
+        expiry = self._expiry
+        while heap and heap[0][0] <= now:
+            until, key = heapq.heappop(heap)
+            # Klucz mógł zostać odnowiony później; wtedy w kopcu jest nowszy wpis
+            if expiry.get(key) == until:
+                del expiry[key]
+
+    def _evict(self) -> None:
+        heap = self._heap
+        expiry = self._expiry
+        while heap and len(expiry) > self.max_entries:
+            until, key = heapq.heappop(heap)
+            if expiry.get(key) == until:
+                del expiry[key]
+                self.evicted += 1
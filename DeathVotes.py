@@ -0,0 +1,85 @@
+import time
+from typing import Callable, Optional
+
+import Metrics
+
+VOTES = Metrics.counter('twitchbot_death_votes_total', 'Crowd votes for a death by result', ('result',))
+VOTE_PENDING = VOTES.labels('pending')
+VOTE_DUPLICATE = VOTES.labels('duplicate')
+VOTE_ABSORBED = VOTES.labels('absorbed')
+VOTE_COUNTED = VOTES.labels('counted')
+
+ABSORB = 3.0  # Domyślnie: przez ile sekund po zaliczeniu każdy głos dotyczy tej samej śmierci
+
+
+class VoteRound:
+    __slots__ = ('voters', 'absorb_until', 'counted', 'counted_until')
+
+    def __init__(self):
+        self.voters: dict[str, float] = {}  # Użytkownik -> chwila głosu, w kolejności głosów
+        self.absorb_until = 0.0  # Do tej chwili każdy głos dotyczy już zaliczonej śmierci
+        self.counted: frozenset[str] = frozenset()  # Kto złożył quorum ostatniej zaliczonej śmierci
+        self.counted_until = 0.0  # Do tej chwili ich ponowne głosy dotyczą tej samej śmierci
+
+
+class DeathVotes:
+    """Głosowanie widzów na śmierć zamiast zliczania każdego '!death+'.
+
+    Głos użytkownika liczy się raz w oknie window sekund (okno przesuwne, starsze głosy
+    wypadają). Gdy różnych głosujących jest quorum, śmierć jest zaliczana. Przez krótkie
+    absorb sekund po tym każdy głos uznawany jest za spóźniony głos na tę samą śmierć,
+    więc 40 osób piszących '!death+' po jednej śmierci daje jedno zwiększenie licznika
+    i jedną odpowiedź. Później, do końca okna, pomijane są tylko powtórzenia osób, które
+    złożyły quorum; nowe quorum innych osób to kolejna śmierć. quorum 1 oznacza samo
+    odszumianie: pierwszy głos zalicza śmierć, kolejne przez absorb sekund są pomijane.
+    """
+
+    __slots__ = ('clock', '_rounds')
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._rounds: dict[str, VoteRound] = {}
+
+    def vote(self, channel: str, user: str, window: float, quorum: int, absorb: float = ABSORB,
+             now: Optional[float] = None) -> bool:
+        """Dodaje głos; zwraca True, gdy ten głos zalicza śmierć."""
+        now = self.clock() if now is None else now
+        round_ = self._rounds.get(channel)
+        if round_ is None:
+            round_ = self._rounds[channel] = VoteRound()
+        if now < round_.absorb_until or (user in round_.counted and now < round_.counted_until):
+            VOTE_ABSORBED.inc()
+            return False
+
+        voters = round_.voters
+        oldest = now - window
+        while voters:
+            first_user = next(iter(voters))
+            if voters[first_user] > oldest:
+                break
+            del voters[first_user]
+        if user in voters:
+            VOTE_DUPLICATE.inc()
+            return False
+        voters[user] = now
+        if len(voters) < quorum:
+            VOTE_PENDING.inc()
+            return False
+
+        round_.counted = frozenset(voters)
+        round_.counted_until = now + window
+        round_.absorb_until = now + min(absorb, window)
+        voters.clear()
+        VOTE_COUNTED.inc()
+        return True
+
+    def pending(self, channel: str) -> int:
+        """Ile głosów czeka na quorum na kanale."""
+        round_ = self._rounds.get(channel)
+        return len(round_.voters) if round_ is not None else 0
+
+    def reset(self, channel: Optional[str] = None) -> None:
+        if channel is None:
+            self._rounds.clear()
+        else:
+            self._rounds.pop(channel, None)
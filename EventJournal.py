@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import time
+from dataclasses import replace
+from typing import Optional, TextIO
+
+from ChannelState import BOSS_NONE, BOSS_PAUSED, BOSS_RUNNING, ChannelState, StateView
+
+SNAPSHOT_EVERY = 500  # Po ilu zdarzeniach zapisać snapshot i skrócić dziennik
+
+
+class EventJournal:
+    """Dziennik zmian stanu kanałów z okresowymi snapshotami.
+
+    Każda zmiana wykonana komendą jest dopisywana jako jedna linia JSON do
+    '<kanał>.journal' razem z wynikowym stanem licznika. Co SNAPSHOT_EVERY zdarzeń
+    stan trafia do '<kanał>.snapshot.json', a dziennik jest czyszczony, więc przy
+    starcie wystarczy wczytać snapshot i odtworzyć krótki ogon dziennika.
+    """
+
+    def __init__(self, directory: str = '.', snapshot_every: int = SNAPSHOT_EVERY):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self._files: dict[str, TextIO] = {}
+        self._seq: dict[str, int] = {}  # Numer ostatniego zdarzenia kanału
+        self._since_snapshot: dict[str, int] = {}
+
+        self.logger = logging.getLogger(__name__)
+
+    def journal_path(self, channel: str) -> str:
+        return os.path.join(self.directory, channel + '.journal')
+
+    def snapshot_path(self, channel: str) -> str:
+        return os.path.join(self.directory, channel + '.snapshot.json')
+
+    def append(self, state: ChannelState, event: str, user: str) -> None:
+        """Dopisuje zdarzenie i wynikowy stan kanału do dziennika."""
+        channel = state.channel
+        seq = self._seq.get(channel, 0) + 1
+        self._seq[channel] = seq
+        record = {'seq': seq, 'ts': round(time.time(), 3), 'event': event, 'user': user, **self._capture(state)}
+        try:
+            file = self._file(channel)
+            file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            file.flush()
+        except OSError as e:
+            self.logger.error(f"Error writing journal for {channel}: {e}")
+            return
+
+        self._since_snapshot[channel] = self._since_snapshot.get(channel, 0) + 1
+        if self._since_snapshot[channel] >= self.snapshot_every:
+            self.snapshot(state)
+
+    def snapshot(self, state: ChannelState) -> None:
+        """Zapisuje snapshot stanu kanału i kompaktuje dziennik."""
+        channel = state.channel
+        data = {'seq': self._seq.get(channel, 0), 'ts': round(time.time(), 3), **self._capture(state)}
+        path = self.snapshot_path(channel)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+
+            # Wszystko do 'seq' jest już w snapshocie, więc dziennik można wyczyścić
+            if channel in self._files:
+                self._files.pop(channel).close()
+            open(self.journal_path(channel), 'w', encoding='utf-8').close()
+            self._since_snapshot[channel] = 0
+        except OSError as e:
+            self.logger.error(f"Error writing snapshot for {channel}: {e}")
+
+    def restore(self, state: ChannelState, handoff: bool = False) -> bool:
+        """Wczytuje snapshot i odtwarza dziennik kanału. Zwraca False, gdy nie ma czego wczytać.
+
+        handoff=True oznacza kanał przekazany przez inny proces: trwający boss tyka dalej
+        zamiast wracać jako wstrzymany.
+        """
+        channel = state.channel
+        last: Optional[dict] = None
+        seq = 0
+
+        try:
+            with open(self.snapshot_path(channel), 'r', encoding='utf-8') as file:
+                last = json.load(file)
+                seq = last['seq']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            self.logger.error(f"Corrupted snapshot for {channel}: {e}")
+
+        try:
+            with open(self.journal_path(channel), 'r', encoding='utf-8') as file:
+                lines = file.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+
+        # Każdy wpis zawiera cały wynikowy stan, a numery w pliku rosną, więc wystarczy
+        # ostatni poprawny wpis; przy starcie nie parsujemy całego dziennika
+        replayed = 0
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Urwana linia po awarii
+                self.logger.warning(f"Skipping damaged journal line for {channel}")
+                continue
+            if record['seq'] > seq:  # Inaczej wszystko jest już w snapshocie
+                replayed = record['seq'] - seq
+                last = record
+                seq = record['seq']
+            break
+
+        self._seq[channel] = seq
+        self._since_snapshot[channel] = replayed
+        if last is None:
+            return False
+
+        self._apply(state, last, handoff)
+        if not handoff:
+            self._catch_up_timer(state)
+        self.logger.info(f"Restored {channel} from journal (seq {seq}, {replayed} events replayed)")
+        return True
+
+    def close(self, states: Optional[list[ChannelState]] = None) -> None:
+        """Zamyka pliki dziennika, opcjonalnie zapisując snapshoty podanych kanałów."""
+        for state in states or []:
+            # Tykający timer bossa zmienia się bez zdarzeń w dzienniku
+            if self._since_snapshot.get(state.channel) or state.boss_running:
+                self.snapshot(state)
+        for file in self._files.values():
+            file.close()
+        self._files.clear()
+
+    def _file(self, channel: str) -> TextIO:
+        file = self._files.get(channel)
+        if file is None:
+            file = open(self.journal_path(channel), 'a', encoding='utf-8')
+            self._files[channel] = file
+        return file
+
+    def _catch_up_timer(self, state: ChannelState) -> None:
+        """Timer bossa trafia do dziennika tylko przy komendach, a plik kanału jest odświeżany co sekundę,
+        więc po awarii w trakcie walki nowszy czas jest w pliku; bierzemy go, jeśli to ta sama walka."""
+        view = state.view
+        if view.boss == BOSS_NONE:
+            return
+        try:
+            file_view = state.read_file_view()
+        except (OSError, ValueError, IndexError):
+            return
+        if (file_view is not None and file_view.boss != BOSS_NONE and file_view.boss_name == view.boss_name
+                and file_view.boss_base > view.boss_base):
+            state.restore(replace(view, boss_base=file_view.boss_base))
+
+    @staticmethod
+    def _capture(state: ChannelState) -> dict:
+        view = state.view
+        return {
+            'deaths': view.deaths,
+            'deaths_boss': view.deaths_boss,
+            'boss_name': view.boss_name,
+            'boss_active': view.boss == BOSS_RUNNING,
+            'boss_paused': view.boss == BOSS_PAUSED,
+            'boss_seconds': int(view.boss_seconds()),
+        }
+
+    @staticmethod
+    def _apply(state: ChannelState, record: dict, handoff: bool = False) -> None:
+        seconds = float(record['boss_seconds'])
+        if handoff and record['boss_active']:
+            # Czas przekazania też się liczy: wznowienie w chwili zapisu, przeliczonej na zegar monotoniczny
+            boss, since = BOSS_RUNNING, time.monotonic() - max(0.0, time.time() - record['ts'])
+        elif record['boss_active'] or record['boss_paused']:
+            boss, since = BOSS_PAUSED, None  # Jak przy wczytywaniu z pliku: przerwany boss wraca jako wstrzymany
+        else:
+            boss, since = BOSS_NONE, None
+        state.restore(StateView(record['deaths'], record['deaths_boss'], record['boss_name'], boss, seconds, since))
@@ -0,0 +1,174 @@
+from typing import Optional
+
+# Znaki ucieczki w wartościach tagów IRCv3
+_TAG_ESCAPES = {':': ';', 's': ' ', '\\': '\\', 'r': '\r', 'n': '\n'}
+
+
+def unescape_tag_value(value: str) -> str:
+    """Dekoduje wartość tagu IRCv3 ('\\s' -> spacja, '\\:' -> ';' itd.)."""
+    if '\\' not in value:
+        return value
+    result = []
+    i = 0
+    length = len(value)
+    while i < length:
+        char = value[i]
+        if char == '\\':
+            i += 1
+            if i < length:
+                result.append(_TAG_ESCAPES.get(value[i], value[i]))
+        else:
+            result.append(char)
+        i += 1
+    return ''.join(result)
+
+
+def parse_tags(raw: str) -> dict[str, str]:
+    """Zamienia surowe tagi 'a=1;b=2' (bez '@') na słownik."""
+    tags = {}
+    for item in raw.split(';'):
+        key, sep, value = item.partition('=')
+        tags[key] = unescape_tag_value(value) if sep else ''
+    return tags
+
+
+class IrcMessage:
+    """Pojedyncza linia IRC z Twitcha.
+
+    Tagi są przechowywane w surowej postaci i dekodowane dopiero przy pierwszym
+    odczycie, więc wiadomości, których nikt nie ogląda (JOIN, ROOMSTATE, czat bez
+    komend), nie kosztują parsowania tagów.
+    """
+
+    __slots__ = ('raw_tags', 'prefix', 'command', 'params', 'trailing', '_tags')
+
+    def __init__(self, raw_tags: Optional[str], prefix: Optional[str], command: str,
+                 params: list[str], trailing: Optional[str]):
+        self.raw_tags = raw_tags  # Tagi bez '@' albo None
+        self.prefix = prefix  # 'nick!user@host' albo 'tmi.twitch.tv'
+        self.command = command  # PRIVMSG, PING, USERNOTICE, ...
+        self.params = params  # Parametry przed ' :'
+        self.trailing = trailing  # Tekst po ' :' (treść wiadomości)
+        self._tags: Optional[dict[str, str]] = None
+
+    @property
+    def tags(self) -> dict[str, str]:
+        if self._tags is None:
+            self._tags = parse_tags(self.raw_tags) if self.raw_tags else {}
+        return self._tags
+
+    def tag(self, key: str, default: str = '') -> str:
+        """Zwraca jeden tag; bez budowania słownika, jeśli tagi nie były jeszcze dekodowane."""
+        if self._tags is not None:
+            return self._tags.get(key, default)
+        raw = self.raw_tags
+        if not raw:
+            return default
+        if raw.startswith(key + '='):
+            start = len(key) + 1
+        else:
+            start = raw.find(';' + key + '=')
+            if start < 0:
+                return default
+            start += len(key) + 2
+        end = raw.find(';', start)
+        return unescape_tag_value(raw[start:] if end < 0 else raw[start:end])
+
+    @property
+    def channel(self) -> Optional[str]:
+        """Nazwa kanału bez '#'."""
+        if self.params and self.params[0].startswith('#'):
+            return self.params[0][1:]
+        return None
+
+    @property
+    def user(self) -> Optional[str]:
+        """Login nadawcy z prefiksu."""
+        if not self.prefix:
+            return None
+        return self.prefix.split('!', 1)[0]
+
+    @property
+    def badges(self) -> dict[str, str]:
+        """Rangi nadawcy jako {nazwa: wersja}, niezależnie od kolejności tagów."""
+        raw = self.tag('badges')
+        if not raw:
+            return {}
+        return dict(badge.partition('/')[::2] for badge in raw.split(','))
+
+    @property
+    def badge_string(self) -> str:
+        """Surowa wartość tagu badges, np. 'broadcaster/1,subscriber/12'."""
+        return self.tag('badges')
+
+    @property
+    def display_name(self) -> str:
+        return self.tag('display-name') or (self.user or '')
+
+    @property
+    def user_id(self) -> str:
+        return self.tag('user-id')
+
+    @property
+    def emotes(self) -> dict[str, list[tuple[int, int]]]:
+        """Emotki z tagu emotes jako {id: [(początek, koniec), ...]}."""
+        raw = self.tag('emotes')
+        if not raw:
+            return {}
+        result = {}
+        for emote in raw.split('/'):
+            emote_id, _, positions = emote.partition(':')
+            ranges = []
+            for position in positions.split(','):
+                start, _, end = position.partition('-')
+                if start and end:
+                    ranges.append((int(start), int(end)))
+            result[emote_id] = ranges
+        return result
+
+    def __repr__(self) -> str:
+        return (f'IrcMessage(command={self.command!r}, prefix={self.prefix!r}, '
+                f'params={self.params!r}, trailing={self.trailing!r})')
+
+
+def parse(line: str) -> Optional[IrcMessage]:
+    """Parsuje jedną linię IRC (bez CRLF) w jednym przejściu. Zwraca None dla pustej linii."""
+    pos = 0
+    length = len(line)
+    raw_tags = None
+    prefix = None
+
+    if line.startswith('@'):
+        end = line.find(' ')
+        if end < 0:
+            return None
+        raw_tags = line[1:end]
+        pos = end + 1
+
+    if pos < length and line[pos] == ':':
+        end = line.find(' ', pos)
+        if end < 0:
+            return None
+        prefix = line[pos + 1:end]
+        pos = end + 1
+
+    end = line.find(' ', pos)
+    if end < 0:
+        command = line[pos:]
+        return IrcMessage(raw_tags, prefix, command, [], None) if command else None
+    command = line[pos:end]
+    pos = end + 1
+
+    trailing = None
+    if line.startswith(':', pos):
+        trailing = line[pos + 1:]
+        params = []
+    else:
+        end = line.find(' :', pos)
+        if end < 0:
+            params = line[pos:].split()
+        else:
+            params = line[pos:end].split()
+            trailing = line[end + 2:]
+
+    return IrcMessage(raw_tags, prefix, command, params, trailing)
@@ -0,0 +1,148 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Optional
+
+MAX_BYTES = 5 * 1024 * 1024  # Rozmiar pliku logu, po którym zaczynamy nowy
+BACKUP_COUNT = 5  # Ile starych plików '<kanał>.log.N' trzymać
+ROTATE_INTERVAL = 24 * 3600  # Nowy plik najpóźniej co dobę, nawet jeśli mały
+QUEUE_SIZE = 10000  # Przy zablokowanym dysku nadmiarowe wpisy są gubione zamiast blokować czat
+
+# Pola przekazywane przez extra={...}, które trafiają do linii JSON
+STRUCTURED_FIELDS = ('event', 'channel', 'user', 'command', 'deaths', 'deaths_boss', 'boss_name', 'latency_ms')
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Jeden wpis logu jako jedna linia JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = record.__dict__
+        for name in STRUCTURED_FIELDS:
+            value = fields.get(name)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, który nie formatuje wpisu w wątku wywołującym.
+
+    Standardowy prepare() składa komunikat od razu, czyli na wątku czatu; tu wpis trafia
+    do kolejki z surowym msg i args, a składa go dopiero wątek zapisujący. Argumenty
+    logowania muszą więc być niezmienne (liczby, teksty), co w tym projekcie jest prawdą.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RotatingLogFileHandler(logging.handlers.RotatingFileHandler):
+    """Zmienia plik po przekroczeniu rozmiaru albo po upływie interval sekund."""
+
+    def __init__(self, filename: str, max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT,
+                 interval: float = ROTATE_INTERVAL):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class LogPipeline:
+    """Logowanie bez blokowania wątku czatu.
+
+    Wszystkie loggery piszą do ograniczonej kolejki; osobny wątek (QueueListener) formatuje
+    wpisy i zapisuje je jako linie JSON do rotowanego '<kanał>.log' oraz krótko na konsolę.
+    """
+
+    def __init__(self, path: str, level: int = logging.INFO, console: bool = True,
+                 max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT, interval: float = ROTATE_INTERVAL):
+        self.path = path
+        self.level = level
+        self.queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+        self.handler = DeferredQueueHandler(self.queue)
+
+        self.file_handler = RotatingLogFileHandler(path, max_bytes, backup_count, interval)
+        self.file_handler.setFormatter(JsonLineFormatter())
+        handlers: list[logging.Handler] = [self.file_handler]
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(logging.Formatter('%(message)s'))
+            handlers.append(console_handler)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._started = False
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def start(self) -> None:
+        if self._started:
+            return
+        root = logging.getLogger()
+        # logging.error() wywołane przed startem dodaje domyślny handler (basicConfig); zastępujemy go
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+        self._started = True
+
+    def stop(self) -> None:
+        """Zapisuje wszystko, co zostało w kolejce, i odłącza kolejkę od loggerów."""
+        if not self._started:
+            return
+        self._started = False
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+        self.file_handler.close()
+        if self.handler.dropped:
+            print(f'{self.handler.dropped} log records dropped (log queue full)', file=sys.stderr)
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def setup(path: str, **kwargs) -> LogPipeline:
+    """Uruchamia wspólny dla procesu LogPipeline (kolejne wywołania zwracają ten sam)."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(path, **kwargs)
+        _pipeline.start()
+    return _pipeline
+
+
+def shutdown() -> None:
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
@@ -0,0 +1,293 @@
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+PRIORITY_REPLY = 0  # Odpowiedzi na komendy
+PRIORITY_BROADCAST = 10  # Wiadomości spam bota
+
+RATE_WINDOW = 30.0  # Limity Twitcha liczone są w oknie 30 s
+RATE_LIMIT_NORMAL = 20  # Wiadomości na okno, gdy bot nie ma rangi na kanale
+RATE_LIMIT_ELEVATED = 100  # Wiadomości na okno, gdy bot jest modem/VIP-em/właścicielem kanału
+RATE_MARGIN = 0.5  # Zapas na opóźnienia w sieci, żeby Twitch nie zobaczył dwóch wiadomości bliżej niż my
+COALESCE_WINDOW = 5.0  # Minimalny odstęp między odpowiedziami na tę samą komendę
+MAX_QUEUE = 200
+
+
+class SendLog:
+    """Chwile ostatnich wysłań na zegarze monotonicznym; pozwala na najwyżej limit wysłań w każdym oknie.
+
+    Twitch liczy wiadomości w przesuwanym oknie 30 s, więc kubełek z ciągłym dolewaniem
+    przepuściłby prawie dwa limity w jednym oknie (pełny kubełek na starcie plus dolewka).
+    """
+
+    __slots__ = ('limit', 'window', 'sent')
+
+    def __init__(self, limit: int, window: float = RATE_WINDOW + RATE_MARGIN):
+        self.limit = limit
+        self.window = window
+        self.sent: deque[float] = deque()
+
+    def _expire(self, now: float) -> None:
+        sent = self.sent
+        while sent and sent[0] <= now - self.window:
+            sent.popleft()
+
+    def delay(self, now: float) -> float:
+        """Ile sekund do chwili, w której kolejne wysłanie zmieści się w limicie (0, jeśli już teraz)."""
+        self._expire(now)
+        return 0.0 if len(self.sent) < self.limit else self.sent[0] + self.window - now
+
+    def take(self, now: float) -> None:
+        self.sent.append(now)
+
+
+class OutboundMessage:
+    __slots__ = ('priority', 'seq', 'channel', 'text', 'key', 'created')
+
+    def __init__(self, priority: int, seq: int, channel: str, text: str, key: Optional[str]):
+        self.priority = priority
+        self.seq = seq
+        self.channel = channel
+        self.text = text
+        self.key = key
+        self.created = time.monotonic()
+
+    def __lt__(self, other: 'OutboundMessage') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class MessageScheduler:
+    """Kolejka wiadomości wychodzących z limitem Twitcha, priorytetami i łączeniem odpowiedzi.
+
+    Odpowiedzi z tym samym kluczem (np. nazwą komendy) na tym samym kanale wysyłane
+    są najwyżej raz na coalesce_window sekund; nowsza odpowiedź czekająca w kolejce
+    zastępuje starszą, więc 30 osób wpisujących '!deaths' dostaje jedną aktualną odpowiedź.
+    """
+
+    def __init__(self, coalesce_window: float = COALESCE_WINDOW, max_queue: int = MAX_QUEUE):
+        self.coalesce_window = coalesce_window
+        self.max_queue = max_queue
+
+        self._queue: list[OutboundMessage] = []
+        self._pending: dict[tuple[str, str], OutboundMessage] = {}  # Czekające wiadomości z kluczem
+        self._last_sent: dict[tuple[str, str], float] = {}
+        self._held: list[OutboundMessage] = []  # Wiadomości czekające na koniec okna łączenia
+        self._seq = 0
+        self._normal = SendLog(RATE_LIMIT_NORMAL)  # Wiadomości na kanałach bez rangi
+        self._all = SendLog(RATE_LIMIT_ELEVATED)  # Wszystkie wiadomości, także na kanałach z rangą
+        self.elevated_channels: set[str] = set()  # Kanały, na których bot ma rangę mod/VIP
+        self.paused = False  # Bez połączenia wiadomości czekają w kolejce zamiast przepadać
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._async_wakeup: Optional[asyncio.Event] = None
+        self._stop = threading.Event()
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue) + len(self._held)
+
+    def stats(self) -> dict[str, int]:
+        return {'depth': self.depth, 'sent': self.sent, 'dropped': self.dropped, 'coalesced': self.coalesced}
+
+    def set_elevated(self, channel: str, elevated: bool) -> None:
+        """Ustawia, czy bot ma na kanale rangę z wyższym limitem (z USERSTATE)."""
+        if elevated:
+            self.elevated_channels.add(channel)
+        else:
+            self.elevated_channels.discard(channel)
+
+    def submit(self, channel: str, text: str, priority: int = PRIORITY_REPLY, key: Optional[str] = None) -> bool:
+        """Dodaje wiadomość do kolejki. Zwraca False, jeśli została odrzucona lub połączona z inną."""
+        with self._lock:
+            if key is not None:
+                pending = self._pending.get((channel, key))
+                if pending is not None:
+                    # Nowsza odpowiedź zastępuje tę, która jeszcze nie wyszła
+                    pending.text = text
+                    self.coalesced += 1
+                    return False
+
+            if self.depth >= self.max_queue and not self._evict(priority):
+                self.dropped += 1
+                return False
+
+            self._seq += 1
+            message = OutboundMessage(priority, self._seq, channel, text, key)
+            if key is not None:
+                self._pending[(channel, key)] = message
+            heapq.heappush(self._queue, message)
+        self._notify()
+        return True
+
+    def requeue(self, message: OutboundMessage) -> None:
+        """Przywraca wiadomość, której nie udało się wysłać."""
+        with self._lock:
+            if message.key is not None:
+                if (message.channel, message.key) in self._pending:
+                    return  # W kolejce jest już nowsza odpowiedź na tę komendę
+                self._pending[(message.channel, message.key)] = message
+            heapq.heappush(self._queue, message)
+        self._notify()
+
+    def pause(self) -> None:
+        """Wstrzymuje wysyłanie, np. na czas ponownego łączenia; nowe wiadomości dalej trafiają do kolejki."""
+        self.paused = True
+
+    def resume(self) -> None:
+        """Wznawia wysyłanie; zaległe wiadomości wychodzą w zwykłej kolejności i z limitem Twitcha."""
+        self.paused = False
+        self._notify()
+
+    def take(self, now: Optional[float] = None) -> tuple[Optional[OutboundMessage], Optional[float]]:
+        """Zwraca (wiadomość gotową do wysłania, None) albo (None, ile sekund czekać; None = pusto)."""
+        if self.paused:
+            return None, None  # resume() obudzi pętlę wysyłania
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._release_held(now)
+            wait = None
+            skipped = []
+            message = None
+            while self._queue:
+                candidate = heapq.heappop(self._queue)
+                delay = self._delay(candidate.channel, now)
+                if delay > 0:
+                    skipped.append(candidate)
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                if candidate.key is not None:
+                    until = self._last_sent.get((candidate.channel, candidate.key), 0.0) + self.coalesce_window
+                    if until > now:
+                        self._held.append(candidate)  # Zostaje w _pending, więc dalej może być zastąpiona
+                        continue
+                    self._pending.pop((candidate.channel, candidate.key), None)
+                    self._last_sent[(candidate.channel, candidate.key)] = now
+                self._record(candidate.channel, now)
+                message = candidate
+                break
+            for candidate in skipped:
+                heapq.heappush(self._queue, candidate)
+            if message is not None:
+                return message, None
+            for held in self._held:
+                delay = self._last_sent.get((held.channel, held.key), 0.0) + self.coalesce_window - now
+                wait = delay if wait is None else min(wait, delay)
+            self._expire_last_sent(now)
+            return None, wait
+
+    def run(self, send: Callable[[str, str], None], flush: Optional[Callable[[], None]] = None) -> None:
+        """Pętla wysyłania dla trybu wątkowego; send(kanał, tekst) wysyła wiadomość.
+
+        Z flush send tylko buforuje, a każdy obieg pętli wysyła wszystkie gotowe
+        wiadomości jednym flush(), więc seria odpowiedzi to jeden zapis do gniazda.
+        """
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            message, wait = self.take()
+            if message is None:
+                self._wakeup.wait(wait)
+                continue
+            if not self._send_ready(send, flush, message):
+                self._stop.wait(1.0)
+
+    async def run_async(self, send: Callable[[str, str], None], flush: Optional[Callable[[], None]] = None) -> None:
+        """Pętla wysyłania dla trybu asyncio."""
+        self._async_wakeup = asyncio.Event()
+        try:
+            while True:
+                self._async_wakeup.clear()
+                message, wait = self.take()
+                if message is None:
+                    try:
+                        await asyncio.wait_for(self._async_wakeup.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if not self._send_ready(send, flush, message):
+                    await asyncio.sleep(1.0)
+        finally:
+            self._async_wakeup = None
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+    def report(self) -> None:
+        self.logger.info(f"Outbound queue: {self.stats()}")
+
+    def _send_ready(self, send: Callable[[str, str], None], flush: Optional[Callable[[], None]],
+                    message: OutboundMessage) -> bool:
+        """Wysyła message i (z flush) wszystkie kolejne wiadomości, na które limit już pozwala."""
+        batch = [message]
+        try:
+            send(message.channel, message.text)
+            if flush is not None:
+                while True:
+                    message, _ = self.take()
+                    if message is None:
+                        break
+                    batch.append(message)
+                    send(message.channel, message.text)
+                flush()
+            self.sent += len(batch)
+            return True
+        except OSError as e:  # ConnectionError albo błąd gniazda zerwanego w trakcie wysyłania
+            self.logger.warning(f"Send failed, {len(batch)} messages kept in queue: {e}")
+            for message in batch:
+                self.requeue(message)
+            return False
+
+    def _notify(self) -> None:
+        self._wakeup.set()
+        if self._async_wakeup is not None:
+            self._async_wakeup.set()
+
+    def _delay(self, channel: str, now: float) -> float:
+        delay = self._all.delay(now)
+        if channel not in self.elevated_channels:
+            delay = max(delay, self._normal.delay(now))
+        return delay
+
+    def _record(self, channel: str, now: float) -> None:
+        self._all.take(now)
+        if channel not in self.elevated_channels:
+            self._normal.take(now)
+
+    def _release_held(self, now: float) -> None:
+        still_held = []
+        for message in self._held:
+            if self._last_sent.get((message.channel, message.key), 0.0) + self.coalesce_window <= now:
+                heapq.heappush(self._queue, message)
+            else:
+                still_held.append(message)
+        self._held = still_held
+
+    def _evict(self, priority: int) -> bool:
+        """Usuwa z pełnej kolejki najmniej ważną wiadomość, jeśli jest mniej ważna od nowej."""
+        if not self._queue:
+            return False
+        worst = max(self._queue)
+        if worst.priority <= priority:
+            return False
+        self._queue.remove(worst)
+        heapq.heapify(self._queue)
+        if worst.key is not None:
+            self._pending.pop((worst.channel, worst.key), None)
+        self.dropped += 1
+        return True
+
+    def _expire_last_sent(self, now: float) -> None:
+        # Czyścimy stare wpisy, żeby słownik nie rósł z liczbą kanałów i komend
+        if len(self._last_sent) > 1024:
+            self._last_sent = {k: t for k, t in self._last_sent.items() if t + self.coalesce_window > now}
@@ -0,0 +1,214 @@
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Optional
+
+# Granice kubełków histogramów czasu w sekundach: od 1 µs do 1 s
+TIME_BUCKETS = (1e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 0.025, 0.1, 1.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if isinstance(value, int) or float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Licznik rosnący; inc() to jedno dodawanie, bez blokad (wystarcza GIL)."""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """Histogram o stałych kubełkach; observe() to bisect i dwa dodawania."""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: tuple[float, ...] = TIME_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Ostatni kubełek to +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """Rodzina metryk o jednej nazwie; z etykietami każda kombinacja wartości ma własne dziecko."""
+
+    def __init__(self, kind: str, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 factory: Callable = Counter, callback: Optional[Callable[[], float]] = None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.factory = factory
+        self.callback = callback  # Wartość czytana dopiero przy pobraniu /metrics
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._default = None if labels or callback else factory()
+        if self._default is not None:
+            # Metryka bez etykiet: inc/set/observe wskazują wprost na metodę dziecka, bez dodatkowego wywołania
+            for method in ('inc', 'set', 'observe'):
+                if hasattr(self._default, method):
+                    setattr(self, method, getattr(self._default, method))
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self.factory())
+        return child
+
+    # Skróty dla metryk bez etykiet
+    def inc(self, amount: int = 1) -> None:
+        self._default.inc(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def samples(self) -> list[str]:
+        if self.callback is not None:
+            return [f'{self.name} {_number(self.callback())}']
+        children = [((), self._default)] if self._default is not None else list(self._children.items())
+        lines = []
+        for values, child in children:
+            if isinstance(child, Histogram):
+                cumulative = 0
+                for bound, count in zip((*child.bounds, float('inf')), child.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names, values, f"le=\"{le}\"")} '
+                                 f'{cumulative}')
+                labels = _format_labels(self.label_names, values)
+                lines.append(f'{self.name}_sum{labels} {repr(child.sum)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+            else:
+                lines.append(f'{self.name}{_format_labels(self.label_names, values)} {_number(child.value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Moduł zaimportowany drugi raz (np. jako __main__) dostaje tę samą metrykę,
+                # a nowy obiekt z callbackiem (np. kolejny TwitchBot) go podmienia
+                if metric.callback is not None:
+                    existing.callback = metric.callback
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                callback: Optional[Callable[[], float]] = None) -> Metric:
+        return self._register(Metric('counter', name, documentation, labels, Counter, callback))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+              callback: Optional[Callable[[], float]] = None) -> Metric:
+        return self._register(Metric('gauge', name, documentation, labels, Gauge, callback))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = TIME_BUCKETS) -> Metric:
+        return self._register(Metric('histogram', name, documentation, labels, lambda: Histogram(buckets)))
+
+    def render(self) -> str:
+        """Wszystkie metryki w formacie tekstowym Prometheusa (0.0.4)."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            if metric.callback is None and metric._default is None and not metric._children:
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                lines.append(f'# error reading {metric.name}: {e}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class MetricsServer:
+    """Endpoint HTTP '/metrics' w osobnym wątku, domyślnie tylko na 127.0.0.1."""
+
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> bool:
+        # http.server ciągnie za sobą sporo modułów; ładowany dopiero, gdy endpoint jest włączony
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Pobrania co kilka sekund zaśmiecałyby log
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            self.logger.error(f"Metrics endpoint not started on {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+        self.logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,237 @@
+import json
+import logging
+import queue
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import Metrics
+from ChannelState import ChannelState
+
+HEARTBEAT = 15.0  # Co ile sekund wysłać komentarz SSE, żeby przeglądarka i proxy nie zamknęły połączenia
+CLIENT_QUEUE = 64  # Zaległe zmiany na klienta; wolniejszy klient jest rozłączany i wczytuje stan od nowa
+RETRY_MS = 2000  # Po ilu ms EventSource ma się połączyć ponownie
+
+OVERLAY_EVENTS = Metrics.counter('twitchbot_overlay_events_total', 'State changes pushed to overlay clients')
+
+# Nakładka dla źródła "Przeglądarka" w OBS: ?channel=<kanał>, wygląd można zmienić polem "Własny CSS"
+OVERLAY_HTML = """<!DOCTYPE html>
+<html lang="pl">
+<head>
+<meta charset="utf-8">
+<title>Death Counter</title>
+<style>
+  body { margin: 0; background: transparent; color: #fff; font: bold 36px sans-serif;
+         text-shadow: 2px 2px 4px #000; }
+  .line { white-space: pre; }
+  #boss[hidden] { display: none; }
+  .bump { animation: bump 0.6s ease-out; }
+  @keyframes bump { from { color: #f33; transform: scale(1.15); } to { color: inherit; transform: none; } }
+</style>
+</head>
+<body>
+<div class="line">śmierci: <span id="deaths"></span></div>
+<div id="boss" hidden>
+  <br>
+  <div class="line">boss: <span id="boss_name"></span></div>
+  <div class="line">śmierci: <span id="deaths_boss"></span></div>
+  <div class="line">czas: <span id="timer"></span></div>
+</div>
+<script>
+const channel = new URLSearchParams(location.search).get('channel') || '';
+const state = {};
+let skew = 0;  // Różnica zegarów przeglądarki i bota
+
+const pad = n => String(n).padStart(2, '0');
+function format(ms) {
+  const s = Math.max(0, Math.floor(ms / 1000));
+  return pad(Math.floor(s / 3600)) + ':' + pad(Math.floor(s / 60) % 60) + ':' + pad(s % 60);
+}
+function elapsed() {
+  return state.boss === 'running' ? Date.now() - skew - state.timer_start : (state.timer_ms || 0);
+}
+function bump(id) {
+  const el = document.getElementById(id);
+  el.classList.remove('bump');
+  void el.offsetWidth;
+  el.classList.add('bump');
+}
+function render(changed) {
+  document.getElementById('deaths').textContent = state.deaths;
+  document.getElementById('boss_name').textContent = state.boss_name;
+  document.getElementById('deaths_boss').textContent = state.deaths_boss;
+  document.getElementById('boss').hidden = state.boss === 'none';
+  document.getElementById('timer').textContent = format(elapsed());
+  for (const key of ['deaths', 'deaths_boss']) {
+    if (changed.includes(key)) bump(key);
+  }
+}
+
+const source = new EventSource('events?channel=' + encodeURIComponent(channel));
+source.onmessage = event => {
+  const message = JSON.parse(event.data);
+  skew = Date.now() - message.now;
+  delete message.now;
+  const first = !('deaths' in state);
+  Object.assign(state, message);
+  render(first ? [] : Object.keys(message));
+};
+setInterval(() => {
+  if (state.boss === 'running') document.getElementById('timer').textContent = format(elapsed());
+}, 250);
+</script>
+</body>
+</html>
+"""
+
+
+class OverlayClient:
+    __slots__ = ('channel', 'queue', 'closed')
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.queue: queue.Queue = queue.Queue(CLIENT_QUEUE)
+        self.closed = False
+
+
+class OverlayServer:
+    """Lokalny serwer nakładki: strona dla OBS i strumień zmian stanu (Server-Sent Events).
+
+    Klient po połączeniu dostaje pełny stan kanału, a potem tylko pola, które się
+    zmieniły (publish wołane po każdej komendzie). Timer bossa przychodzi jako chwila
+    startu i tyka w przeglądarce, więc w trakcie walki serwer nic nie wysyła. Każdy
+    klient ma wątek i małą kolejkę; zmiana jest serializowana raz dla wszystkich.
+    """
+
+    def __init__(self, channels: dict[str, ChannelState], port: int, host: str = '127.0.0.1'):
+        self.channels = channels
+        self.host = host
+        self.port = port
+        self._clients: dict[str, set[OverlayClient]] = {}
+        self._last: dict[str, dict] = {}  # Ostatni stan wysłany klientom kanału
+        self._lock = threading.Lock()
+        self._server = None
+        self._stopped = threading.Event()
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def client_count(self) -> int:
+        return sum(len(clients) for clients in self._clients.values())
+
+    def publish(self, state: ChannelState) -> None:
+        """Wysyła klientom kanału pola, które zmieniły się od ostatniego wywołania."""
+        channel = state.channel
+        if not self._clients.get(channel):
+            return
+        view = state.overlay_view()
+        with self._lock:
+            last = self._last.get(channel, {})
+            delta = {key: value for key, value in view.items() if last.get(key) != value}
+            if not delta:
+                return
+            self._last[channel] = view
+            clients = list(self._clients.get(channel, ()))
+        delta['now'] = int(time.time() * 1000)
+        payload = f'data: {json.dumps(delta, ensure_ascii=False)}\n\n'.encode('utf-8')
+        OVERLAY_EVENTS.inc()
+        for client in clients:
+            try:
+                client.queue.put_nowait(payload)
+            except queue.Full:
+                client.closed = True  # Wątek klienta zamknie połączenie, przeglądarka połączy się ponownie
+
+    def start(self) -> bool:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        overlay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                channel = parse_qs(url.query).get('channel', [next(iter(overlay.channels))])[0].lower()
+                if url.path in ('/', '/overlay'):
+                    self._send(200, 'text/html; charset=utf-8', OVERLAY_HTML.encode('utf-8'))
+                elif channel not in overlay.channels:
+                    self.send_error(404, f'Unknown channel {channel}')
+                elif url.path == '/state':
+                    body = json.dumps(overlay.channels[channel].overlay_view(), ensure_ascii=False)
+                    self._send(200, 'application/json; charset=utf-8', body.encode('utf-8'))
+                elif url.path == '/events':
+                    overlay.stream(self, channel)
+                else:
+                    self.send_error(404)
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            self.logger.error(f"Overlay server not started on {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self._stopped.clear()
+        Metrics.gauge('twitchbot_overlay_clients', 'Connected overlay clients', callback=lambda: self.client_count)
+        threading.Thread(target=self._server.serve_forever, name='overlay', daemon=True).start()
+        self.logger.info(f"Overlay available at http://{self.host}:{self.port}/overlay?channel="
+                         f"{next(iter(self.channels))}")
+        return True
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._stopped.set()
+        with self._lock:
+            for clients in self._clients.values():
+                for client in clients:
+                    client.closed = True
+                    try:
+                        client.queue.put_nowait(b'')
+                    except queue.Full:
+                        pass
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def stream(self, handler, channel: str) -> None:
+        """Obsługuje jedno połączenie /events aż do jego zamknięcia."""
+        client = OverlayClient(channel)
+        with self._lock:
+            self._clients.setdefault(channel, set()).add(client)
+            view = self.channels[channel].overlay_view()
+            self._last.setdefault(channel, view)  # Pozostali klienci mają stan z _last, nie ruszamy go
+        try:
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            handler.send_header('Cache-Control', 'no-cache')
+            handler.send_header('Access-Control-Allow-Origin', '*')
+            handler.end_headers()
+            view['now'] = int(time.time() * 1000)
+            handler.wfile.write(f'retry: {RETRY_MS}\ndata: {json.dumps(view, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            handler.wfile.flush()
+            while not client.closed and not self._stopped.is_set():
+                try:
+                    payload = client.queue.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    payload = b': ping\n\n'
+                if not payload:
+                    break
+                handler.wfile.write(payload)
+                handler.wfile.flush()
+        except OSError:
+            pass  # Przeglądarka zamknęła połączenie
+        finally:
+            with self._lock:
+                clients = self._clients.get(channel)
+                if clients is not None:
+                    clients.discard(client)
+                    if not clients:
+                        del self._clients[channel]
+                        self._last.pop(channel, None)
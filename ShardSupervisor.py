@@ -0,0 +1,331 @@
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from bisect import bisect_right
+from typing import Optional
+
+import LogPipeline
+import Metrics
+from ConfigManager import ConfigManager
+from ConnectionSupervisor import STABLE_AFTER, Backoff
+
+VNODES = 256  # Punkty na pierścieniu na proces; więcej to równiejszy podział kanałów (budowany raz, przy starcie)
+REPORT_INTERVAL = 5.0  # Co ile sekund proces wysyła nadzorcy swoje obciążenie
+REBALANCE_INTERVAL = 60.0  # Co ile sekund sprawdzać, czy przenieść kanał
+REBALANCE_RATIO = 1.5  # Przenosimy, gdy najbardziej obciążony proces ma tyle razy więcej wiadomości niż średnia
+REBALANCE_MIN_RATE = 5.0  # ...i różnica między skrajnymi procesami to co najmniej tyle wiadomości na sekundę
+STOP_TIMEOUT = 10.0  # Ile sekund czekać na zamknięcie procesu, zanim zostanie zabity
+
+SHARD_RATE = Metrics.gauge('twitchbot_shard_messages_per_second', 'Chat messages per second handled by a worker',
+                           ('shard',))
+SHARD_CPU = Metrics.gauge('twitchbot_shard_cpu_ratio', 'CPU time of a worker per second of wall time', ('shard',))
+SHARD_CHANNELS = Metrics.gauge('twitchbot_shard_channels', 'Channels assigned to a worker', ('shard',))
+SHARD_RESTARTS = Metrics.counter('twitchbot_shard_restarts_total', 'Workers restarted after exiting', ('shard',))
+CHANNEL_MOVES = Metrics.counter('twitchbot_channel_moves_total', 'Channels moved between workers')
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Spójne haszowanie: kanał trafia do pierwszego punktu procesu na pierścieniu za swoim haszem.
+
+    Każdy proces ma VNODES punktów, więc kanały rozkładają się równo, a zmiana liczby
+    procesów przenosi tylko te kanały, których punkty przejął lub oddał zmieniony proces.
+    """
+
+    def __init__(self, nodes: list[int], vnodes: int = VNODES):
+        self._ring = sorted((_hash(f'{node}#{i}'), node) for node in nodes for i in range(vnodes))
+        self._keys = [key for key, _ in self._ring]
+
+    def node(self, key: str) -> int:
+        return self._ring[bisect_right(self._keys, _hash(key)) % len(self._ring)][1]
+
+
+# Proces roboczy
+
+def run_worker(shard: int, channels: list[str], commands, reports, server: Optional[str] = None) -> None:
+    """Punkt wejścia procesu: TwitchBot w trybie asyncio dla kanałów swojej części."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C obsługuje nadzorca, który zamyka procesy po kolei
+    from TwitchBot import TwitchBot
+    bot = TwitchBot(use_asyncio=True, channels=channels, shard=shard)
+    if server:
+        host, _, port = server.partition(':')
+        bot.connection.server = host
+        bot.connection.port = int(port or bot.connection.port)
+    asyncio.run(_worker_main(bot, shard, commands, reports))
+
+
+async def _worker_main(bot, shard: int, commands, reports) -> None:
+    loop = asyncio.get_running_loop()
+
+    def execute(action: str, channel: Optional[str]) -> None:
+        if action == 'adopt':
+            bot.add_channel(channel)
+            reports.put(('adopted', shard, channel))
+        elif action == 'release':
+            bot.remove_channel(channel)
+            reports.put(('released', shard, channel))
+        elif action == 'stop':
+            bot.stop()
+
+    def listen() -> None:
+        # Polecenia nadzorcy wykonuje pętla zdarzeń, jak obsługę wiadomości czatu
+        while True:
+            action, channel = commands.get()
+            loop.call_soon_threadsafe(execute, action, channel)
+            if action == 'stop':
+                return
+
+    threading.Thread(target=listen, name='shard-commands', daemon=True).start()
+    reporter = asyncio.create_task(_report_load(bot, shard, reports))
+    try:
+        await bot.start_async()
+    finally:
+        reporter.cancel()
+
+
+async def _report_load(bot, shard: int, reports, interval: float = REPORT_INTERVAL) -> None:
+    """Co interval sekund wysyła nadzorcy wiadomości na sekundę (w sumie i na kanał) oraz zużycie CPU."""
+    last_wall, last_cpu = time.monotonic(), time.process_time()
+    last_received: dict[str, int] = {}
+    while True:
+        await asyncio.sleep(interval)
+        wall, cpu = time.monotonic(), time.process_time()
+        elapsed = wall - last_wall
+        received = {name: state.received for name, state in bot.channels.items()}
+        rates = {name: (count - last_received.get(name, 0)) / elapsed for name, count in received.items()}
+        reports.put(('load', shard, {'pid': os.getpid(), 'rate': sum(rates.values()), 'cpu': (cpu - last_cpu) / elapsed,
+                                     'channels': rates, 'connected': bot.connection.is_connected()}))
+        last_wall, last_cpu, last_received = wall, cpu, received
+
+
+# Nadzorca
+
+class Worker:
+    __slots__ = ('shard', 'process', 'commands', 'load', 'started', 'restart_at', 'backoff')
+
+    def __init__(self, shard: int):
+        self.shard = shard
+        self.process = None
+        self.commands = None
+        self.load: dict = {}  # Ostatni raport obciążenia
+        self.started = 0.0
+        self.restart_at: Optional[float] = None  # Kiedy uruchomić ponownie proces, który się zakończył
+        self.backoff = Backoff()
+
+
+class ShardSupervisor:
+    """Rozdziela kanały między procesy robocze, z których każdy ma własne połączenie i pętlę TwitchBot.
+
+    Kanał trafia do procesu przez spójne haszowanie (HashRing), więc przydział jest stały
+    między uruchomieniami. Proces, który się zakończył, jest uruchamiany ponownie z tymi
+    samymi kanałami i wczytuje ich stan z dziennika. Procesy co REPORT_INTERVAL raportują
+    wiadomości na sekundę (też na kanał) i CPU; gdy jeden jest wyraźnie bardziej obciążony,
+    jego kanał przenoszony jest do najmniej obciążonego: stary proces opuszcza kanał
+    i zapisuje snapshot dziennika, dopiero potem nowy go wczytuje i dołącza.
+    """
+
+    def __init__(self, channels: list[str], workers: int, server: Optional[str] = None,
+                 rebalance_interval: float = REBALANCE_INTERVAL):
+        import multiprocessing
+        # 'spawn' na każdym systemie: proces startuje czysto, bez wątków i kolejek logów rodzica
+        self.context = multiprocessing.get_context('spawn')
+        self.server = server
+        self.rebalance_interval = rebalance_interval
+        self.workers = [Worker(shard) for shard in range(workers)]
+        self.ring = HashRing([worker.shard for worker in self.workers])
+        self.assignment: dict[str, int] = {channel: self.ring.node(channel) for channel in channels}
+        self.pinned: dict[str, int] = {}  # Kanały przeniesione z punktu na pierścieniu
+        self.moving: dict[str, int] = {}  # Kanał -> proces docelowy, czekający na oddanie przez obecny
+        self.reports = self.context.Queue()
+
+        self._stop = threading.Event()
+        self._next_rebalance = 0.0
+        self.logger = logging.getLogger(__name__)
+
+    def channels_of(self, shard: int) -> list[str]:
+        return [channel for channel, owner in self.assignment.items() if owner == shard and channel not in self.moving]
+
+    def start(self) -> None:
+        for worker in self.workers:
+            self._spawn(worker)
+        self._next_rebalance = time.monotonic() + self.rebalance_interval
+
+    def run(self) -> None:
+        """Pętla nadzorcy: raporty procesów, ponowne uruchamianie i równoważenie obciążenia."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                self._drain_reports(1.0)
+                self._check_workers()
+                if time.monotonic() >= self._next_rebalance:
+                    self._next_rebalance = time.monotonic() + self.rebalance_interval
+                    self.rebalance()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def shutdown(self) -> None:
+        """Zamyka procesy poleceniem 'stop' (zapis stanu), a po STOP_TIMEOUT zabija te, które zostały."""
+        for worker in self.workers:
+            worker.restart_at = None
+            if worker.process is not None and worker.process.is_alive():
+                worker.commands.put(('stop', None))
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                self.logger.warning(f"Worker {worker.shard} did not stop in time, terminating")
+                worker.process.terminate()
+                worker.process.join()
+
+    def move(self, channel: str, target: int) -> None:
+        """Przenosi kanał do procesu target bez utraty stanu (najpierw 'release', potem 'adopt')."""
+        source = self.assignment[channel]
+        if source == target or channel in self.moving:
+            return
+        self.moving[channel] = target
+        CHANNEL_MOVES.inc()
+        self.logger.info(f"Moving {channel} from worker {source} to {target}")
+        worker = self.workers[source]
+        if worker.process is not None and worker.process.is_alive():
+            worker.commands.put(('release', channel))
+        else:
+            self._released(channel)  # Martwy proces nie trzyma kanału, stan jest w dzienniku
+
+    def rebalance(self) -> Optional[str]:
+        """Przenosi jeden kanał z najbardziej do najmniej obciążonego procesu; zwraca przeniesiony kanał."""
+        loads = {worker.shard: worker.load['rate'] for worker in self.workers if worker.load}
+        if len(loads) < 2 or self.moving:
+            return None
+        busiest = max(loads, key=loads.get)
+        idlest = min(loads, key=loads.get)
+        gap = loads[busiest] - loads[idlest]
+        mean = sum(loads.values()) / len(loads)
+        if loads[busiest] < REBALANCE_RATIO * mean or gap < REBALANCE_MIN_RATE:
+            return None
+        # Kanał o obciążeniu do połowy różnicy zawsze ją zmniejsza; bierzemy największy taki
+        rates = self.workers[busiest].load['channels']
+        candidates = {channel: rate for channel, rate in rates.items()
+                      if 0 < rate <= gap / 2 and self.assignment.get(channel) == busiest}
+        if not candidates:
+            return None
+        channel = max(candidates, key=candidates.get)
+        self.pinned[channel] = idlest
+        self.move(channel, idlest)
+        return channel
+
+    def stats(self) -> list[dict]:
+        return [{'shard': worker.shard, 'pid': worker.load.get('pid'), 'channels': len(self.channels_of(worker.shard)),
+                 'rate': round(worker.load.get('rate', 0.0), 1), 'cpu': round(worker.load.get('cpu', 0.0), 3)}
+                for worker in self.workers]
+
+    def _spawn(self, worker: Worker) -> None:
+        worker.commands = self.context.Queue()
+        worker.process = self.context.Process(
+            target=run_worker, name=f'shard{worker.shard}', daemon=False,
+            args=(worker.shard, self.channels_of(worker.shard), worker.commands, self.reports, self.server))
+        worker.process.start()
+        worker.started = time.monotonic()
+        worker.restart_at = None
+        worker.load = {}
+        SHARD_CHANNELS.labels(str(worker.shard)).set(len(self.channels_of(worker.shard)))
+        self.logger.info(f"Worker {worker.shard} started (pid {worker.process.pid}) with "
+                         f"{len(self.channels_of(worker.shard))} channels")
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    SHARD_RESTARTS.labels(str(worker.shard)).inc()
+                    self._spawn(worker)
+                continue
+            if worker.process is None or worker.process.is_alive():
+                continue
+            # Kanały oddawane przez ten proces idą od razu do nowego właściciela
+            for channel, target in list(self.moving.items()):
+                if self.assignment[channel] == worker.shard:
+                    self._released(channel)
+            if now - worker.started >= STABLE_AFTER:
+                worker.backoff.reset()
+            delay = worker.backoff.next_delay()
+            worker.restart_at = now + delay
+            worker.load = {}
+            self.logger.error(f"Worker {worker.shard} exited with code {worker.process.exitcode}, "
+                              f"restarting in {delay:.1f} s")
+
+    def _drain_reports(self, timeout: float) -> None:
+        try:
+            report = self.reports.get(timeout=timeout)
+            while True:
+                self._on_report(*report)
+                report = self.reports.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _on_report(self, kind: str, shard: int, payload) -> None:
+        if kind == 'load':
+            worker = self.workers[shard]
+            worker.load = payload
+            SHARD_RATE.labels(str(shard)).set(round(payload['rate'], 2))
+            SHARD_CPU.labels(str(shard)).set(round(payload['cpu'], 4))
+        elif kind == 'released':
+            if self.moving.get(payload) is not None and self.assignment.get(payload) == shard:
+                self._released(payload)
+        elif kind == 'adopted':
+            self.logger.info(f"Worker {shard} took over {payload}")
+
+    def _released(self, channel: str) -> None:
+        target = self.moving.pop(channel)
+        source = self.assignment[channel]
+        self.assignment[channel] = target
+        for shard in (source, target):
+            SHARD_CHANNELS.labels(str(shard)).set(len(self.channels_of(shard)))
+        worker = self.workers[target]
+        if worker.process is not None and worker.process.is_alive():
+            worker.commands.put(('adopt', channel))
+        # Proces docelowy, który właśnie się restartuje, dostanie kanał na liście startowej
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Twitch Death Counter: kanały rozdzielone między procesy")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="liczba procesów roboczych")
+    parser.add_argument('--server', metavar='HOST[:PORT]', help="inny serwer IRC niż irc.twitch.tv")
+    parser.add_argument('--rebalance-interval', type=float, default=REBALANCE_INTERVAL,
+                        help="co ile sekund sprawdzać, czy przenieść kanał (0 wyłącza)")
+    args = parser.parse_args()
+
+    config_manager = ConfigManager()
+    LogPipeline.setup('shards.log')
+    interval = args.rebalance_interval or float('inf')
+    supervisor = ShardSupervisor(config_manager.channels(), max(1, args.workers), args.server, interval)
+    metrics_server = None
+    if config_manager.snapshot.metrics_enabled:
+        metrics_server = Metrics.MetricsServer(config_manager.snapshot.metrics_port)
+        metrics_server.start()
+    try:
+        supervisor.run()
+    finally:
+        logging.info(f"Shards: {supervisor.stats()}")
+        if metrics_server is not None:
+            metrics_server.stop()
+        LogPipeline.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import Metrics
+from ChannelState import ChannelState
+
+COALESCE_DELAY = 0.25  # Ile sekund czekać na kolejne zmiany, zanim zapiszemy plik
+STATS_INTERVAL = 600.0  # Co ile sekund logować statystyki zapisów
+REPLACE_RETRIES = 3  # Windows nie pozwala podmienić pliku, który akurat czyta OBS
+
+WRITES = Metrics.counter('twitchbot_persistence_writes_total', 'Channel files written to disk')
+SKIPPED = Metrics.counter('twitchbot_persistence_skipped_total', 'Flushes skipped because file content was unchanged')
+WRITE_ERRORS = Metrics.counter('twitchbot_persistence_errors_total', 'Failed channel file writes')
+WRITE_SECONDS = Metrics.histogram('twitchbot_persistence_write_seconds', 'Time to write one channel file')
+
+
+class StatePersistence:
+    """Zapisuje pliki kanałów tylko wtedy, gdy zmieniła się ich treść.
+
+    Zmiany zgłaszane przez mark_dirty są zbierane przez COALESCE_DELAY i zapisywane
+    jednym zapisem. Kanały z trwającym bossem są odświeżane, gdy zmieni się wyświetlana
+    sekunda timera. Plik jest zapisywany do pliku tymczasowego i podmieniany przez
+    os.replace, więc OBS nigdy nie widzi połowy zapisu.
+    """
+
+    def __init__(self, channels: dict[str, ChannelState], coalesce_delay: float = COALESCE_DELAY):
+        self.channels = channels
+        self.coalesce_delay = coalesce_delay
+        self.writes = 0  # Liczba faktycznych zapisów na dysk
+        self.skipped = 0  # Liczba sprawdzeń, w których treść się nie zmieniła
+
+        self._dirty: set[str] = set(channels)  # Przy starcie zapisujemy wszystkie kanały
+        self._last_written: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._async_wakeup: Optional[asyncio.Event] = None
+        self._stop = threading.Event()
+        self._last_stats = time.monotonic()
+
+        self.logger = logging.getLogger(__name__)
+
+    def mark_dirty(self, state: ChannelState) -> None:
+        """Zgłasza zmianę stanu kanału."""
+        with self._lock:
+            self._dirty.add(state.channel)
+        self._wakeup.set()
+        if self._async_wakeup is not None:
+            self._async_wakeup.set()
+
+    def forget(self, channel: str) -> None:
+        """Zapomina kanał przekazany innemu procesowi (po ostatnim flush)."""
+        with self._lock:
+            self._dirty.discard(channel)
+        self._last_written.pop(channel, None)
+
+    def flush(self) -> int:
+        """Zapisuje zmienione kanały i kanały z tykającym timerem, zwraca liczbę zapisów."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+
+        written = 0
+        # Kopia, bo kanały mogą być dodawane i usuwane w trakcie zapisu z innego wątku
+        for name, state in list(self.channels.items()):
+            if name not in dirty and not state.boss_running:
+                continue
+            content = state.render_data()
+            if self._last_written.get(name) == content:
+                self.skipped += 1
+                SKIPPED.inc()
+                continue
+            if self._write_atomic(state.name_file, content):
+                self._last_written[name] = content
+                written += 1
+            else:
+                with self._lock:
+                    self._dirty.add(name)  # Spróbujemy ponownie przy następnym obiegu
+
+        self.writes += written
+        self._log_stats()
+        return written
+
+    def next_timeout(self) -> Optional[float]:
+        """Zwraca czas do najbliższej zmiany sekundy timera lub None, gdy żaden boss nie trwa."""
+        timeouts = [state.seconds_to_next_tick() for state in list(self.channels.values()) if state.boss_running]
+        return min(timeouts) if timeouts else None
+
+    def run(self) -> None:
+        """Pętla zapisu dla trybu wątkowego."""
+        self.flush()
+        while not self._stop.is_set():
+            self._wakeup.wait(self.next_timeout())
+            if self._wakeup.is_set():
+                self._wakeup.clear()
+                time.sleep(self.coalesce_delay)
+            self.flush()
+        self.flush()
+
+    async def run_async(self) -> None:
+        """Pętla zapisu dla trybu asyncio."""
+        self._async_wakeup = asyncio.Event()
+        self.flush()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._async_wakeup.wait(), self.next_timeout())
+                except asyncio.TimeoutError:
+                    pass
+                if self._async_wakeup.is_set():
+                    self._async_wakeup.clear()
+                    await asyncio.sleep(self.coalesce_delay)
+                self.flush()
+        finally:
+            self._async_wakeup = None
+
+    def stop(self) -> None:
+        """Kończy pętlę run() po ostatnim zapisie."""
+        self._stop.set()
+        self._wakeup.set()
+
+    def report(self) -> None:
+        self.logger.info(f"Persistence: {self.writes} writes, {self.skipped} unchanged checks skipped")
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if now - self._last_stats >= STATS_INTERVAL:
+            self._last_stats = now
+            self.report()
+
+    def _write_atomic(self, path: str, content: str) -> bool:
+        started = time.perf_counter()
+        if self._replace(path, content):
+            WRITES.inc()
+            WRITE_SECONDS.observe(time.perf_counter() - started)
+            return True
+        WRITE_ERRORS.inc()
+        return False
+
+    def _replace(self, path: str, content: str) -> bool:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path), suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(content)
+            for attempt in range(REPLACE_RETRIES):
+                try:
+                    os.replace(tmp_path, path)
+                    return True
+                except PermissionError:
+                    if attempt == REPLACE_RETRIES - 1:
+                        raise
+                    time.sleep(0.05)
+        except OSError as e:
+            self.logger.error(f'Error: Could not write file {path}. {e}')
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return False
@@ -1,21 +1,60 @@
 
+import asyncio
+import atexit
 import logging
 import os
 import random
 import threading
 import time
 
-from datetime import timedelta, datetime
-from typing import Optional, Any
+from typing import Any, Optional
+import IrcMessage
+import LogPipeline
+import Metrics
 from TwitchConnection import TwitchConnection
+from AsyncTwitchConnection import AsyncTwitchConnection
+from ConnectionSupervisor import ConnectionSupervisor
+from ChannelState import ChannelState
 from ConfigManager import ConfigManager
-from dotenv import load_dotenv
-
-load_dotenv()
+from ConfigSnapshot import ConfigSnapshot
+from AuthPolicy import AuthPolicy, AUTH_KEYS
+from StatePersistence import StatePersistence
+from EventJournal import EventJournal
+from BossHistory import BossHistory
+from MessageScheduler import MessageScheduler, PRIORITY_BROADCAST
+
+
+def load_environment():
+    """Wczytuje USER_NAME i OAUTH_TOKEN z pliku .env, chyba że są już w środowisku (wtedy bez importu dotenv)."""
+    if not (os.getenv("USER_NAME") and os.getenv("OAUTH_TOKEN")):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = Metrics.counter('twitchbot_messages_total', 'IRC lines handled')
+IGNORED = Metrics.counter('twitchbot_messages_ignored_total', 'Lines that carried no chat for a joined channel',
+                          ('reason',))
+IGNORED_UNPARSABLE = IGNORED.labels('unparsable')
+IGNORED_NOT_CHAT = IGNORED.labels('not_privmsg')
+IGNORED_UNKNOWN_CHANNEL = IGNORED.labels('unknown_channel')
+IGNORED_EMPTY = IGNORED.labels('empty')
+COMMANDS = Metrics.counter('twitchbot_commands_total', 'Chat messages starting with the command prefix')
+FAST_PATH = Metrics.counter('twitchbot_messages_fast_path_total', 'Chat lines without a command handled without '
+                            'parsing tags, user or permissions')
+ERRORS = Metrics.counter('twitchbot_message_errors_total', 'Lines that raised an error while being handled')
+PARSE_SECONDS = Metrics.histogram('twitchbot_parse_seconds', 'Time to parse one IRC line')
+AUTH_SECONDS = Metrics.histogram('twitchbot_auth_seconds', 'Time to check permissions of one chat message')
+CHAT_LAG = Metrics.histogram('twitchbot_chat_lag_seconds', 'Delay between Twitch accepting the newest line of a '
+                             'received batch and the bot handling it (tmi-sent-ts)',
+                             buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
 
 
 class TwitchBot:
-    def __init__(self):
+    def __init__(self, use_asyncio: bool = False, channels: Optional[list[str]] = None, shard: Optional[int] = None):
 
         from CommandHandler import CommandHandler
         self.username = os.getenv("USER_NAME")
@@ -31,214 +70,359 @@ class TwitchBot:
             print("❌ ERROR: Missing OAUTH_TOKEN in environment variables.")
             exit(1)
 
-        self.deaths = 0  # Licznik ogólnych śmierci
-        self.boss_paused = False  # Flaga, czy boss jest zatrzymany
-        self.boss_paused_time = timedelta()
-        self.boss_start_time: Optional[datetime] = None
-        self.boss_pause_time = None
-        self.boss_name = ""  # Nazwa bossa
-        self.boss_timer = timedelta()  # Timer dla bossa (jeśli potrzebny)
-        self.deaths_boss = 0  # Licznik śmierci bossa
-        self.boss_active = False
-        self.message_count = 0
-
-        self.temp_timer = None
-        self.temp_boss = ' '
-        self.temp_boss_deaths = ' '
-        self.temp_deaths = ' '
-
         self.config_manager = ConfigManager()
-        self.connection = TwitchConnection()
+        tls = self.config_manager.snapshot.tls_enabled
+        self.connection = AsyncTwitchConnection(tls=tls) if use_asyncio else TwitchConnection(tls=tls)
         self.command_handler = CommandHandler(self, self.config_manager)
 
-        self.channel = self.config_manager['channel']  # Nazwa kanału (zmień na właściwą)
-        self.emotes = self.config_manager['emotes']  # Lista emotikon do użycia
+        # Stan każdego kanału, wyszukiwany po polu '#kanał' wiadomości PRIVMSG
+        self.shard = shard  # Numer procesu w trybie ShardSupervisor; wtedy kanały podaje nadzorca
+        self.channels: dict[str, ChannelState] = {
+            channel: ChannelState(channel, self.config_manager.for_channel(channel))
+            for channel in (self.config_manager.channels() if channels is None else channels)
+        }
+        if not self.channels and shard is None:
+            logging.error("❌ ERROR: No channel configured in settings.")
+            print("❌ ERROR: No channel configured in settings.")
+            exit(1)
+        # Od pierwszego kanału (albo numeru procesu) nazywany jest plik logów
+        self.channel = f'shard{shard}' if shard is not None else next(iter(self.channels))
 
-        self.name_file = self.channel + '.txt'
+        # Skompilowane reguły uprawnień, kluczem jest snapshot konfiguracji, z którego powstały
+        self.auth_policies: dict[ConfigSnapshot, AuthPolicy] = {}
+        self.config_manager.on_reload(self.apply_config)
+
+        self.journal = EventJournal()
+        self.history = BossHistory()
         self.read_data_from_file()
+        self.persistence = StatePersistence(self.channels)
+        self.outbox = MessageScheduler(self.config_manager.snapshot.response_coalesce_window)
+        self.supervisor = ConnectionSupervisor(self.connection, self.username, self.oauth_token, list(self.channels),
+                                               self.outbox)
+        self.register_metrics()
+        self.metrics_server = None
+        self.overlay = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # Pętla zdarzeń w trybie asyncio
+        self.reminders_checked = time.monotonic()  # Ostatnie sprawdzenie przypominajek na cichych kanałach
+
+    def register_metrics(self):
+        """Metryki czytane z obiektów bota dopiero przy pobraniu /metrics."""
+        outbox = self.outbox
+        cooldowns = self.command_handler.router.cooldowns
+        Metrics.gauge('twitchbot_send_queue_depth', 'Outbound messages waiting to be sent',
+                      callback=lambda: outbox.depth)
+        Metrics.counter('twitchbot_outbound_sent_total', 'Chat messages sent', callback=lambda: outbox.sent)
+        Metrics.counter('twitchbot_outbound_dropped_total', 'Chat messages dropped from a full queue',
+                        callback=lambda: outbox.dropped)
+        Metrics.counter('twitchbot_outbound_coalesced_total', 'Replies merged into a newer reply',
+                        callback=lambda: outbox.coalesced)
+        Metrics.gauge('twitchbot_cooldowns_active', 'Cooldowns currently tracked', callback=lambda: len(cooldowns))
+        connection = self.connection
+        Metrics.gauge('twitchbot_connected', '1 while connected to Twitch IRC',
+                      callback=lambda: int(connection.is_connected()))
+
+    def start_metrics(self):
+        snapshot = self.config_manager.snapshot
+        if snapshot.metrics_enabled and self.metrics_server is None:
+            # Procesy ShardSupervisor mają kolejne porty, metrics_port zajmuje nadzorca
+            port = snapshot.metrics_port if self.shard is None else snapshot.metrics_port + 1 + self.shard
+            self.metrics_server = Metrics.MetricsServer(port)
+            if not self.metrics_server.start():
+                self.metrics_server = None
+
+    def stop_metrics(self):
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+    def start_overlay(self):
+        snapshot = self.config_manager.snapshot
+        if snapshot.overlay_enabled and self.shard is not None:
+            # Kanały przenoszone między procesami zmieniałyby adres nakładki w OBS
+            logging.warning("Overlay is not available when running sharded, use the <channel>.txt files")
+            return
+        if snapshot.overlay_enabled and self.overlay is None:
+            from OverlayServer import OverlayServer
+            overlay = OverlayServer(self.channels, snapshot.overlay_port)
+            if overlay.start():
+                self.overlay = overlay
+
+    def stop_overlay(self):
+        if self.overlay is not None:
+            self.overlay.stop()
+            self.overlay = None
+
+    def setup_logging(self):
+        """Logi idą przez kolejkę do wątku zapisującego JSON do '<kanał>.log' (albo 'shard<n>.log'), więc nie
+        blokują czatu."""
+        LogPipeline.setup(self.channel + ".log")
+        atexit.register(LogPipeline.shutdown)
 
     def start(self):
-        """Rozpocznij działanie bota."""
-
-        logging.basicConfig(filename=(self.channel + ".log"), encoding='utf-8', level=logging.INFO,
-                            format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+        """Rozpocznij działanie bota (tryb wątkowy)."""
+        self.setup_logging()
+        self.start_metrics()
+        self.start_overlay()
+        self.history.start()
+        self.config_manager.start_watching()
         try:
-            self.connection.connect(self.username, self.oauth_token, self.channel)
-            logging.info(f"Bot connected to {self.channel} as {self.username}")
             self.listen_to_chat()
         except Exception as e:
             logging.error(f"Error starting bot: {str(e)}")
             self.connection.disconnect()
+        finally:
+            logging.info(f"Connection: {self.supervisor.stats()}")
+            logging.info(f"Cooldowns: {self.command_handler.router.cooldowns.stats()}")
+            self.config_manager.stop_watching()
+            self.stop_metrics()
+            self.stop_overlay()
+            self.history.stop()
+            self.history.report()
+            self.journal.close(list(self.channels.values()))
 
     def listen_to_chat(self):
-        """Nasłuchuje wiadomości na czacie Twitcha."""
-        while self.connection.is_connected():
-            try:
-                message = self.connection.receive_messages()
-                self.handle_message(message)
-            except Exception as e:
-                logging.error(f"Error receiving message: {str(e)}")
-                self.connection.disconnect()
-                break
+        """Nasłuchuje wiadomości na czacie Twitcha; po zerwaniu połączenia łączy się ponownie."""
+        self.supervisor.run(self.handle_messages)
+
+    async def start_async(self):
+        """Rozpocznij działanie bota w pętli asyncio razem z zadaniem zapisu danych."""
+        self.loop = asyncio.get_running_loop()
+        self.setup_logging()
+        self.start_metrics()
+        self.start_overlay()
+        self.history.start()
+        self.config_manager.start_watching()
+        writer = asyncio.create_task(self.persistence.run_async())
+        sender = asyncio.create_task(self.outbox.run_async(self.connection.send_privmsg, self.connection.flush))
+        try:
+            await self.listen_to_chat_async()
+        except Exception as e:
+            logging.error(f"Error starting bot: {str(e)}")
+            await self.connection.disconnect()
+        finally:
+            writer.cancel()
+            sender.cancel()
+            self.write_data_to_file()
+            self.persistence.report()
+            self.outbox.report()
+            logging.info(f"Connection: {self.supervisor.stats()}")
+            logging.info(f"Cooldowns: {self.command_handler.router.cooldowns.stats()}")
+            self.config_manager.stop_watching()
+            self.stop_metrics()
+            self.stop_overlay()
+            self.history.stop()
+            self.history.report()
+            self.journal.close(list(self.channels.values()))
+
+    async def listen_to_chat_async(self):
+        """Nasłuchuje czatu bez blokowania pętli zdarzeń; po zerwaniu połączenia łączy się ponownie."""
+        await self.supervisor.run_async(self.handle_messages)
+
+    def stop(self):
+        """Kończy nasłuchiwanie bez ponownego łączenia (np. przy zamykaniu programu)."""
+        self.supervisor.stop()
+        self.connection.drop()
+
+    def handle_messages(self, messages: list[str]):
+        """Przetwarza paczkę linii odebranych w jednym odczycie."""
+        for message in messages:
+            self.handle_message(message)
+        if messages:
+            self.observe_lag(messages[-1])
+        self.check_idle_reminders()
+
+    @staticmethod
+    def observe_lag(line: str):
+        """Opóźnienie najnowszej linii paczki względem chwili, w której przyjął ją Twitch (tag tmi-sent-ts)."""
+        start = line.find('tmi-sent-ts=', 0, line.find(' '))
+        if start < 0:
+            return
+        start += len('tmi-sent-ts=')
+        end = line.find(';', start)
+        sent_ts = line[start:end] if end >= 0 else line[start:line.find(' ', start)]
+        if sent_ts.isdigit():
+            CHAT_LAG.observe(max(0.0, time.time() - int(sent_ts) / 1000))  # Zegary mogą się nieco rozjeżdżać
 
     def handle_message(self, message: str):
         """Przetwarzaj wiadomości i wykonuj odpowiednie komendy."""
-        message = message.strip()  # Usuwamy białe znaki z początku i końca
+        MESSAGES.inc()
+        started = time.perf_counter()
         try:
-            # Podział wiadomości na tagi i pozostałą część
-            if message.startswith('@'):
-                tag_part, rest = message.split(' ', 1)
-                tags = tag_part[1:].split(';')  # Usuwamy '@' i dzielimy po ';'
-            else:
+            if self.handle_chat_fast(message):
                 return
-
-            # Rozdzielamy użytkownika i resztę wiadomości
-            if ' :' in rest:
-                user_part, command_part = rest.split(' :', 1)
-            else:
-                logging.warning(f"No command part found in message: {rest}")
+            msg = IrcMessage.parse(message)
+            PARSE_SECONDS.observe(time.perf_counter() - started)
+            if msg is None:
+                IGNORED_UNPARSABLE.inc()
+                return
+            if msg.command == 'USERSTATE':
+                self.update_bot_rank(msg)
+                return
+            if msg.command != 'PRIVMSG' or msg.trailing is None:
+                IGNORED_NOT_CHAT.inc()
                 return
 
-            user_info = user_part.split('!')
-            user = user_info[0][1:]  # Ekstrakcja użytkownika
-            command = command_part.split()[0]  # Pierwszy element po ':', czyli komenda
-            args = command_part.split()[1:]  # Reszta to argumenty
-            badge = tags[1][7:]
-            authorized = self.is_authorized(badge, user)
+            state = self.channels.get(msg.channel)
+            if state is None:
+                IGNORED_UNKNOWN_CHANNEL.inc()
+                return
+            config = state.config
 
-            if self.config_manager['spam_bot_enabled']:
-                if self.message_count >= self.config_manager['spam_bot_messages']:
-                    print("tutaj bym coś napisał ehhe")
-                    self.connection.send_privmsg(self.config_manager['spam_bot_message'] + " " + random.choice(self.config_manager['emotes']))
-                    self.message_count = 0
-                self.message_count += 1
+            words = msg.trailing.split()
+            if not words:
+                IGNORED_EMPTY.inc()
+                return
 
             # Sprawdzenie, czy komenda zaczyna się od prefiksu
-            prefix = self.config_manager['prefix']
-            if command.startswith(prefix):
-                command = command[1:]  # Usuwamy prefix
-                response = self.command_handler.execute_command(command, user, authorized, args)
+            command = words[0]  # Pierwszy element po ':', czyli komenda
+            prefix = config.prefix
+            is_command = command.startswith(prefix)
+            # Nazwa komendy z tablicy tras, wspólna dla wszystkich aliasów; None dla nieznanej komendy
+            router = self.command_handler.router
+            route = router.route_name(config, command[len(prefix):].lower()) if is_command else None
+            self.count_chat_message(state, msg.user, msg.tag('emotes') or '', msg.trailing, command=route)
+            if is_command:
+                user = msg.user
+                args = words[1:]  # Reszta to argumenty
+                auth_started = time.perf_counter()
+                authorized = self.is_authorized(msg.badge_string, user, state)
+                AUTH_SECONDS.observe(time.perf_counter() - auth_started)
+                command = command[len(prefix):]  # Usuwamy prefix
+                COMMANDS.inc()
+                response = self.command_handler.execute_command(state, command, user, authorized, args)
+                self.persistence.mark_dirty(state)
+                if self.overlay is not None:
+                    self.overlay.publish(state)
                 if response:
-                    self.connection.send_privmsg(response)
+                    self.outbox.submit(state.channel, response, key=route or command.lower())
+                latency_ms = (time.perf_counter() - started) * 1000
+                logger.info('%s: %s%s (%.2f ms)', user, prefix, command, latency_ms,
+                            extra={'event': 'command', 'channel': state.channel, 'user': user,
+                                   'command': command, 'latency_ms': round(latency_ms, 3)})
 
         except Exception as e:
+            ERRORS.inc()
             logging.error(f"Failed to process message: {message} | Error: {str(e)}")
 
-    def read_data_from_file(self):
-        self.boss_name = ""
-        try:
-            with open(self.name_file, 'r', encoding='utf-8') as file:
-                data = file.read().splitlines()
-                if len(data) == 1:
-                    temp = data[0].split(" ")
-                    self.deaths = int(temp[1])
-
-                elif len(data) == 5:
-                    temp = data[0].split(" ")
-                    self.deaths = int(temp[1])
-                    temp = data[2].split(" ")
-                    self.boss_name = " ".join(temp[1:])
-                    if data[2] != ' ':
-                        self.boss_active = False
-                        self.boss_paused = True
-                    if data[3] != ' ':
-                        temp = data[3].split(" ")
-                        self.deaths_boss = int(temp[1])
-                    if data[4] != ' ':
-                        temp = data[4].split(" ")
-                        time_str = temp[1]
-                        h, m, s = map(int, time_str.split(':'))
-                        self.boss_timer = timedelta(hours=h, minutes=m, seconds=s)
-                    else:
-                        self.boss_timer = timedelta()
-                else:
-                    print(f'Error: Incorrect data format in file {self.name_file}.')
-        except FileNotFoundError as e:
-            logging.error(e)
-            print(f'Error: File {self.name_file} not found. Creating...')
-
-        if self.boss_active and not self.boss_paused:
-            self.boss_start_time = datetime.now() - self.boss_timer
-        else:
-            self.boss_start_time = None
+    def handle_chat_fast(self, line: str) -> bool:
+        """Obsługuje zwykłą wiadomość czatu bez komendy, bez pełnego parsowania i sprawdzania uprawnień.
 
-    def write_data_to_file(self):
+        Patrzy tylko, czy linia to PRIVMSG na znany kanał, którego tekst nie zaczyna się
+        od prefiksu; wtedy wystarczy wyciąć nadawcę i tag emotes i policzyć ją w statystykach
+        czatu. Zwraca False dla wszystkiego
+        innego (komendy, inne polecenia IRC, nietypowy zapis), co idzie pełną ścieżką.
         """
-            Zapisuje aktualne dane do pliku, w tym liczbę śmierci, nazwę bossa, liczbę śmierci bossa oraz czas bossa.
+        marker = line.find(' PRIVMSG #')
+        if marker < 0:
+            return False
+        # ' PRIVMSG #' musi być poleceniem linii, a nie fragmentem tekstu innego polecenia
+        tags_end = line.find(' ') if line.startswith('@') else -1
+        pos = prefix = tags_end + 1
+        if line.startswith(':', pos):
+            pos = line.find(' ', pos) + 1
+        if pos != marker + 1:
+            return False
+        channel_end = line.find(' ', marker + 10)
+        if channel_end < 0 or not line.startswith(':', channel_end + 1):
+            return False
+        state = self.channels.get(line[marker + 10:channel_end])
+        if state is None:
+            return False
+        text_start = channel_end + 2
+        if (text_start >= len(line) or line.startswith(state.config.prefix, text_start)
+                or line[text_start].isspace()):
+            return False  # Komenda, pusta wiadomość albo tekst od spacji: pełna ścieżka
+        FAST_PATH.inc()
+        nick_end = line.find('!', prefix, marker)
+        user = line[prefix + 1:nick_end] if nick_end > prefix else None
+        emotes = ''
+        if tags_end > 0:
+            # Tagi są w kolejności alfabetycznej, więc emotes nigdy nie stoi na początku
+            start = line.find(';emotes=', 0, tags_end) + 8
+            if start > 7:
+                end = line.find(';', start, tags_end)
+                emotes = line[start:end if end >= 0 else tags_end]
+        self.count_chat_message(state, user, emotes, line, text_start)
+        return True
+
+    def count_chat_message(self, state: ChannelState, user: Optional[str], emotes: str = '', text: str = '',
+                           offset: int = 0, command: Optional[str] = None):
+        """Dodaje wiadomość do statystyk czatu kanału i wysyła wiadomość spam bota, gdy przyszła jej pora.
+        emotes to surowy tag emotes, którego pozycje liczone są od indeksu offset w text."""
+        state.received += 1
+        now = time.monotonic()
+        chat = state.chat
+        chat.record(now, user, command, emotes, text, offset)
+        self.remind(state, now)
+
+    def remind(self, state: ChannelState, now: float):
+        """Wysyła wiadomość spam bota, gdy przyszła jej pora."""
+        config = state.config
+        if config.spam_bot_enabled and state.chat.reminder_due(config, now):
+            self.outbox.submit(state.channel, config.spam_bot_message + " " + random.choice(config.emotes),
+                               PRIORITY_BROADCAST, key='spam_bot')
+            state.chat.reminded(now)
+
+    def check_idle_reminders(self):
+        """Przypominajka po spam_bot_max_interval ma wyjść także na kanale, na którym nikt nie pisze.
+
+        Bez wiadomości czatu nic nie woła count_chat_message, ale paczki linii przychodzą i tak
+        (przynajmniej PONG po PING co PING_INTERVAL sekund ciszy), więc kanały sprawdzane są tutaj,
+        nie częściej niż co sekundę."""
+        now = time.monotonic()
+        if now - self.reminders_checked < 1.0:
+            return
+        self.reminders_checked = now
+        for state in list(self.channels.values()):
+            self.remind(state, now)
+
+    def update_bot_rank(self, msg: IrcMessage.IrcMessage):
+        """USERSTATE mówi, czy bot jest modem/VIP-em na kanale, co daje wyższy limit wiadomości."""
+        if msg.channel not in self.channels:
+            return
+        badges = msg.badges
+        elevated = (msg.tag('mod') == '1' or 'moderator' in badges or 'broadcaster' in badges or 'vip' in badges)
+        self.outbox.set_elevated(msg.channel, elevated)
+
+    def add_channel(self, channel: str) -> ChannelState:
+        """Przejmuje kanał w trakcie działania: wczytuje jego stan z dziennika i dołącza do czatu.
+
+        Wołane z wątku pętli czatu (w trybie asyncio z pętli zdarzeń), jak handle_message.
         """
-        self.boss_timer = self.calculate_and_format_boss_time()
+        state = self.channels.get(channel)
+        if state is not None:
+            return state
+        state = ChannelState(channel, self.config_manager.for_channel(channel))
+        if not self.journal.restore(state, handoff=True):
+            state.read_data_from_file()
+        self.channels[channel] = state
+        self.persistence.mark_dirty(state)
+        self.supervisor.join(channel)
+        logging.info(f"Channel {channel} added")
+        return state
+
+    def remove_channel(self, channel: str) -> None:
+        """Oddaje kanał: opuszcza czat, zapisuje plik i snapshot dziennika, żeby inny proces mógł go przejąć."""
+        state = self.channels.get(channel)
+        if state is None:
+            return
+        self.supervisor.part(channel)
+        self.persistence.flush()
+        self.journal.snapshot(state)
+        del self.channels[channel]
+        self.persistence.forget(channel)
+        self.outbox.set_elevated(channel, False)
+        logging.info(f"Channel {channel} removed")
 
-        try:
-            with open(self.name_file, 'w', encoding='utf-8') as file:
-                if self.boss_active or self.boss_paused:
-                    file.write(
-                        f'śmierci: {self.deaths}\n\n'
-                        f'boss: {self.boss_name}\n'
-                        f'śmierci: {self.deaths_boss}\n'
-                        f'czas: {self.boss_timer}'
-                    )
-                else:
-                    file.write(f'śmierci: {self.deaths}\n\n \n \n ')
-        except FileNotFoundError as e:
-            logging.error(f'Error: File {self.name_file} not found. {e}')
-            print(f'Error: File {self.name_file} not found.')
-
-    def pause_boss(self):
-        if self.boss_active and not self.boss_paused:
-            self.boss_paused = True
-            self.boss_active = False
-            self.boss_pause_time = datetime.now()
-
-    def resume_boss(self):
-        current_time = datetime.now()
-
-        if not self.boss_active:
-            # Pierwsze uruchomienie bossa
-            self.boss_active = True
-            if type(self.boss_timer) == str:
-                t = datetime.strptime(self.boss_timer, "%H:%M:%S")
-                self.boss_timer = timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
-            self.boss_start_time = current_time - self.boss_timer
-            self.boss_paused = False
-            self.boss_pause_time = None
-        elif self.boss_paused:
-            # Wznowienie po pauzie
-            if self.boss_pause_time:
-                self.boss_paused_time += current_time - datetime.strptime(self.boss_pause_time, '%H:%M:%S')
-            self.boss_paused = False
-            self.boss_pause_time = None
-            if self.boss_start_time is None:
-                self.boss_start_time = current_time - self.boss_timer
-
-    def clear_temps(self):
-        self.temp_boss = ' '
-        self.temp_boss_deaths = ' '
-        self.temp_deaths = ' '
-        self.temp_timer = ' '
-
-    def calculate_and_format_boss_time(self):
-        current_time = datetime.now()
-
-        # Jeśli boss nie jest aktywny lub start nie jest ustawiony, zwracamy dotychczasowy czas
-        if not self.boss_active or self.boss_start_time is None:
-            return self.boss_timer
-
-        # Obliczanie czasu, w zależności od tego, czy boss jest wstrzymany
-        if self.boss_paused:
-            elapsed_time = (self.boss_pause_time or current_time) - self.boss_start_time
-        else:
-            elapsed_time = current_time - self.boss_start_time
-
-        # Odejmujemy czas, w którym boss był wstrzymany
-        total_time = elapsed_time - self.boss_paused_time
-
-        # Konwersja czasu na sekundy
-        total_seconds = int(total_time.total_seconds())
-        hours, remainder = divmod(total_seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
+    def read_data_from_file(self):
+        """Wczytuje stan kanałów z dziennika, a gdy go nie ma, ze starego pliku tekstowego."""
+        for state in self.channels.values():
+            if not self.journal.restore(state):
+                state.read_data_from_file()
 
-        # Zwracamy sformatowany czas jako string
-        return f'{hours:02d}:{minutes:02d}:{seconds:02d}'
+    def write_data_to_file(self):
+        """Zapisuje dane kanałów, których treść się zmieniła."""
+        self.persistence.flush()
 
     def __getitem__(self, key: str) -> Any:
         """Pobiera wartość z konfiguracji za pomocą nawiasów kwadratowych."""
@@ -248,49 +432,79 @@ class TwitchBot:
         """Ustawia wartość w konfiguracji za pomocą nawiasów kwadratowych."""
         setattr(self, key, value)
 
-    def is_authorized(self, badge: str, user: str) -> bool:
+    def is_authorized(self, badge: str, user: str, state: ChannelState) -> bool:
         """
         Sprawdź, czy użytkownik ma uprawnienia do używania komendy,
-        na podstawie rang (badge) i ustawień w 'bot_moderators'.
+        na podstawie rang (badge) i ustawień w 'bot_moderators' kanału.
         """
-        if self.config_manager['all_users_mod']: return True
-
-        if self.config_manager['white_list_enabled']:
-            if user in self.config_manager['white_list']:
-                return True
-
-        elif self.config_manager['black_list_enabled']:
-            if user in self.config_manager['black_list']:
-                return False
-
-        # Parsowanie badge do listy rang
-        user_badges = [b.split('/')[0] for b in badge.split(',')]
-
-        # Sprawdzenie, czy jakakolwiek ranga z user_badges jest w bot_moderators
-        for user_badge in user_badges:
-            if user_badge in self.config_manager['bot_moderators']:
-                return True
+        return self.auth_policy(state).is_authorized(badge, user)
+
+    def auth_policy(self, state: ChannelState) -> AuthPolicy:
+        """Zwraca skompilowane reguły uprawnień kanału, budując je przy pierwszym użyciu."""
+        config = state.config
+        if config.overridden.isdisjoint(AUTH_KEYS):
+            config = self.config_manager.snapshot  # Kanały bez nadpisań uprawnień dzielą jedną politykę
+        policy = self.auth_policies.get(config)
+        if policy is None:
+            policy = AuthPolicy.from_config(config)
+            self.auth_policies[config] = policy
+        return policy
+
+    def apply_config(self, snapshot: ConfigSnapshot):
+        """Podmienia konfigurację kanałów po przeładowaniu settings.yaml.
+
+        Wołane z wątku obserwatora konfiguracji. W trybie asyncio zmiana trafia do pętli zdarzeń,
+        jak dodawanie i usuwanie kanałów, więc nie przeplata się z nimi.
+        """
+        loop = self.loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(self._apply_config, snapshot)
+        else:
+            self._apply_config(snapshot)
 
-        return False
+    def _apply_config(self, snapshot: ConfigSnapshot):
+        for state in list(self.channels.values()):  # Kopia: w trybie wątkowym czat działa równolegle
+            state.config = snapshot.for_channel(state.channel)
+        self.outbox.coalesce_window = snapshot.response_coalesce_window
+        self.auth_policies.clear()
+        self.command_handler.router.clear()
 
 
 def write_data_thread():
-    finished_timer = 0.0
-    while True:
-        bot.write_data_to_file()
-        if finished_timer < 10.0:
-            finished_timer += 0.5
-        else:
-            finished_timer = 0.0
-            bot.clear_temps()
-        time.sleep(0.5)
+    try:
+        bot.persistence.run()
+    finally:
+        bot.persistence.report()
 
 
 if __name__ == "__main__":
-    bot = TwitchBot()
-
-    write_data_thread = threading.Thread(target=write_data_thread)
-    start_thread = threading.Thread(target=bot.start)
-
-    start_thread.start()
-    write_data_thread.start()
+    import argparse
+    parser = argparse.ArgumentParser(description="Twitch Death Counter")
+    parser.add_argument('--threaded', action='store_true',
+                        help="stary tryb z osobnymi wątkami dla czatu i zapisu danych")
+    parser.add_argument('--server', metavar='HOST[:PORT]',
+                        help="inny serwer IRC niż irc.twitch.tv, np. 127.0.0.1:6667 (benchmarks/fake_twitch.py)")
+    cli_args = parser.parse_args()
+
+    bot = TwitchBot(use_asyncio=not cli_args.threaded)
+    if cli_args.server:
+        host, _, port = cli_args.server.partition(':')
+        bot.connection.server = host
+        bot.connection.port = int(port or bot.connection.port)
+
+    if cli_args.threaded:
+        # bot.start działa w głównym wątku: uruchamia wątki pomocnicze (logi, historia, metryki, nakładka,
+        # obserwator konfiguracji), a Python 3.12 nie tworzy nowych wątków, gdy główny wątek już się skończył
+        write_data_thread = threading.Thread(target=write_data_thread)
+        send_thread = threading.Thread(target=bot.outbox.run, args=(bot.connection.send_privmsg, bot.connection.flush),
+                                       daemon=True)
+
+        write_data_thread.start()
+        send_thread.start()
+        try:
+            bot.start()
+        finally:
+            bot.persistence.stop()
+            write_data_thread.join()
+    else:
+        asyncio.run(bot.start_async())
@@ -1,48 +1,234 @@
 import socket
 import logging
+import threading
 from typing import Optional
 
+import Metrics
+
+PLAIN_PORT = 6667
+TLS_PORT = 6697
+RECV_SIZE = 4096
+MAX_IOV = 512  # Najwięcej buforów w jednym sendmsg (systemowy IOV_MAX to zwykle 1024)
+MAX_BUFFER_SIZE = 64 * 1024  # Twitch nie wysyła linii dłuższych niż kilka KB
+CONNECT_TIMEOUT = 10.0  # Ile sekund czekać na nawiązanie połączenia TCP
+PING_INTERVAL = 60.0  # Po tylu sekundach ciszy bot sam wysyła PING
+PONG_TIMEOUT = 15.0  # Jeśli po naszym PING nic nie przyjdzie w tym czasie, połączenie uznajemy za martwe
+KEEPALIVE_IDLE = 30  # TCP keepalive: sekundy bezczynności przed pierwszą próbą
+KEEPALIVE_INTERVAL = 10  # Odstęp między kolejnymi próbami
+KEEPALIVE_COUNT = 3  # Nieudane próby, po których system zamyka połączenie
+CAPABILITIES = 'twitch.tv/tags twitch.tv/commands'  # commands: USERSTATE i RECONNECT
+
+# Odpowiedzi Twitcha na błędny token; ponowne łączenie nic tu nie da
+LOGIN_FAILED = ('Login authentication failed', 'Improperly formatted auth')
+
+# Wspólne dla TwitchConnection i AsyncTwitchConnection
+BYTES_RECEIVED = Metrics.counter('twitchbot_received_bytes_total', 'Bytes received from Twitch IRC')
+LINES_RECEIVED = Metrics.counter('twitchbot_received_lines_total', 'IRC lines received from Twitch')
+LINES_SENT = Metrics.counter('twitchbot_sent_lines_total', 'IRC lines sent to Twitch')
+SOCKET_WRITES = Metrics.counter('twitchbot_socket_writes_total', 'Writes of buffered outgoing lines to the socket '
+                                '(one vectored write per flush, more after partial writes)')
+CONNECTS = Metrics.counter('twitchbot_connects_total', 'Successful connections to Twitch IRC')
+RECONNECTS = Metrics.counter('twitchbot_reconnects_total', 'Connections after the first one')
+PINGS_SENT = Metrics.counter('twitchbot_pings_sent_total', 'PINGs sent by the bot after a quiet period')
+JOIN_BATCH_SIZE = 20  # Ile kanałów łączyć w jednym poleceniu JOIN/PART
+
+
+class PingTimeout(ConnectionError):
+    """Serwer nie odpowiedział na PING w PONG_TIMEOUT sekund."""
+
+
+class ReconnectRequested(ConnectionError):
+    """Twitch wysłał RECONNECT (np. przed restartem serwera)."""
+
+
+class LoginFailed(Exception):
+    """Twitch odrzucił login albo token; nie jest to błąd połączenia, więc nie łączymy się ponownie."""
+
+
+def check_control_line(line: str) -> None:
+    """Rzuca wyjątek dla linii, po których dalsze czytanie nie ma sensu (RECONNECT, zły token)."""
+    if line.startswith(':tmi.twitch.tv RECONNECT'):
+        raise ReconnectRequested("Twitch requested a reconnect")
+    if line.startswith(':tmi.twitch.tv NOTICE * :') and any(text in line for text in LOGIN_FAILED):
+        raise LoginFailed(line.partition(' :')[2])
+
+
+def enable_keepalive(sock: socket.socket) -> None:
+    """Włącza TCP keepalive, żeby system wykrył zerwane połączenie także wtedy, gdy nic nie wysyłamy."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'SIO_KEEPALIVE_VALS'):  # Windows
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, KEEPALIVE_IDLE * 1000, KEEPALIVE_INTERVAL * 1000))
+        return
+    # TCP_KEEPALIVE to odpowiednik TCP_KEEPIDLE na macOS
+    for name, value in (('TCP_KEEPIDLE', KEEPALIVE_IDLE), ('TCP_KEEPALIVE', KEEPALIVE_IDLE),
+                        ('TCP_KEEPINTVL', KEEPALIVE_INTERVAL), ('TCP_KEEPCNT', KEEPALIVE_COUNT)):
+        option = getattr(socket, name, None)
+        if option is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+            except OSError:
+                pass
+
+
+def configure_socket(sock: socket.socket) -> None:
+    """TCP_NODELAY i keepalive. Bez algorytmu Nagle'a nic nie czeka na ACK; małych pakietów
+    nie ma, bo linie i tak są łączone w buforze i wysyłane jednym zapisem (flush)."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    enable_keepalive(sock)
+
+
+def tls_context():
+    """Kontekst TLS z weryfikacją certyfikatu i nazwy serwera; ssl importowany tylko, gdy jest potrzebny."""
+    import ssl
+    return ssl.create_default_context()
+
+
+def send_vectored(sock: socket.socket, buffers: list[bytes]) -> int:
+    """Wysyła bufory przez sendmsg, po częściowym zapisie dosyłając resztę. Zwraca liczbę wywołań."""
+    views = [memoryview(buffer) for buffer in buffers]
+    start = 0
+    calls = 0
+    while start < len(views):
+        sent = sock.sendmsg(views[start:start + MAX_IOV])
+        calls += 1
+        while sent:
+            size = len(views[start])
+            if sent < size:
+                views[start] = views[start][sent:]  # Reszta przerwanej linii idzie w następnym wywołaniu
+                break
+            sent -= size
+            start += 1
+    return calls
+
+
+def join_batches(channels: list[str]) -> list[str]:
+    """Dzieli kanały na listy '#a,#b,...' do wysłania w pojedynczych JOIN/PART."""
+    return [','.join(f'#{c}' for c in channels[i:i + JOIN_BATCH_SIZE])
+            for i in range(0, len(channels), JOIN_BATCH_SIZE)]
+
+
+class LineBuffer:
+    """Składa linie IRC z kolejnych odczytów gniazda."""
+
+    def __init__(self):
+        self._buffer = bytearray()  # Niepełna linia z poprzedniego odczytu
+        self.logger = logging.getLogger(__name__)
+
+    def clear(self) -> None:
+        self._buffer.clear()
+
+    def feed(self, chunk: bytes) -> list[str]:
+        """Dokleja dane i zwraca kompletne linie, niepełną końcówkę zostawia na następny odczyt."""
+        self._buffer += chunk
+        end = self._buffer.rfind(b'\n')
+        if end < 0:
+            if len(self._buffer) > MAX_BUFFER_SIZE:
+                self.logger.warning(f"Dropping {len(self._buffer)} bytes without line terminator")
+                self._buffer.clear()
+            return []
+
+        complete = bytes(self._buffer[:end])
+        del self._buffer[:end + 1]
+
+        lines = []
+        for raw in complete.split(b'\n'):
+            if raw.endswith(b'\r'):
+                raw = raw[:-1]
+            if raw:
+                # Dekodujemy dopiero całą linię, więc znaki UTF-8 rozcięte między odczytami są poprawne
+                lines.append(raw.decode('utf-8', errors='replace'))
+        return lines
+
 
 class TwitchConnection:
-    def __init__(self, server: str = 'irc.twitch.tv', port: int = 6667):
+    """Połączenie z czatem Twitcha na blokującym gnieździe (tryb wątkowy).
+
+    Wysyłane linie trafiają do bufora, a flush() wysyła cały bufor jednym wektorowym
+    zapisem (sendmsg), więc JOIN-y wielu kanałów albo seria odpowiedzi kosztują jedno
+    wywołanie systemowe. tls=True szyfruje połączenie (domyślnie port 6697); dane TLS
+    idą przez ten sam bufor, tylko jednym sendall, bo SSLSocket nie ma sendmsg.
+    """
+
+    def __init__(self, server: str = 'irc.twitch.tv', port: Optional[int] = None, tls: bool = False):
         self.server: str = server
-        self.port: int = port
+        self.tls = tls
+        self.port: int = port or (TLS_PORT if tls else PLAIN_PORT)
         self.irc: Optional[socket.socket] = None
         self.username: Optional[str] = None
         self.oauth_token: Optional[str] = None
-        self.channel: Optional[str] = None
+        self.channels: list[str] = []
         self._connected: bool = False
+        self.connect_count = 0  # Udane połączenia tego obiektu; każde po pierwszym to ponowne połączenie
+        self._lines = LineBuffer()
+        self._ping_pending = False  # Wysłaliśmy PING i czekamy na jakiekolwiek dane
+        self._pending: list[bytes] = []  # Linie czekające na flush()
+        self._vectored = False  # Czy gniazdo ma sendmsg (nie ma go TLS ani Windows)
+        self._pending_lock = threading.Lock()  # Dopisywanie do bufora, nigdy nie czeka na sieć
+        self._send_lock = threading.Lock()  # Jeden flush naraz, żeby zapisy z dwóch wątków się nie przeplatały
 
         self.logger = logging.getLogger(__name__)
 
-    def connect(self, username: str, oauth_token: str, channel: str) -> None:
+    def connect(self, username: str, oauth_token: str, channels: list[str]) -> None:
         if self._connected:
             self.logger.warning("Already connected. Disconnecting and reconnecting.")
             self.disconnect()
 
         self.username = username
         self.oauth_token = oauth_token
-        self.channel = channel
+        self.channels = list(channels)
 
         try:
-            self.irc = socket.socket()
-            self.irc.connect((self.server, self.port))
+            self._lines.clear()
+            self._ping_pending = False
+            with self._pending_lock:
+                self._pending.clear()  # Niewysłane linie starego połączenia
+            sock = socket.create_connection((self.server, self.port), timeout=CONNECT_TIMEOUT)
+            configure_socket(sock)
+            if self.tls:
+                try:
+                    sock = tls_context().wrap_socket(sock, server_hostname=self.server)
+                except Exception:
+                    sock.close()
+                    raise
+            self.irc = sock
+            self._vectored = hasattr(sock, 'sendmsg') and not self.tls
+            # Po tym czasie ciszy recv() kończy się wyjątkiem timeout i wysyłamy PING
+            sock.settimeout(PING_INTERVAL)
+            self._send_command(f'CAP REQ :{CAPABILITIES}')
             self._send_command(f'PASS {self.oauth_token}')
             self._send_command(f'NICK {self.username}')
-            self._send_command(f'JOIN #{self.channel}')
-            self._send_raw('CAP REQ :twitch.tv/tags\r\n')
+            self._join_channels()
+            self.flush()
             self._connected = True
-            self.logger.info(f"Connected to {self.channel} as {self.username}")
+            CONNECTS.inc()
+            if self.connect_count:
+                RECONNECTS.inc()
+            self.connect_count += 1
+            self.logger.info(f"Connected to {', '.join(self.channels)} as {self.username}")
         except Exception as e:
             self.logger.error(f"Failed to connect: {str(e)}")
+            self.drop()
             raise
 
+    def drop(self) -> None:
+        """Zamyka martwe połączenie bez żegnania się z serwerem (PART i tak by nie doszedł)."""
+        irc, self.irc = self.irc, None
+        self._connected = False
+        if irc is not None:
+            try:
+                irc.shutdown(socket.SHUT_RDWR)  # Budzi wątek czekający w recv()
+            except OSError:
+                pass
+            irc.close()
+
     def disconnect(self) -> None:
         if self._connected and self.irc:
             try:
-                self._send_command(f'PART #{self.channel}')
+                for batch in join_batches(self.channels):
+                    self._send_command(f'PART {batch}')
+                self.flush()
                 self.irc.close()
-                self.logger.info(f"Disconnected from {self.channel}")
+                self.logger.info(f"Disconnected from {', '.join(self.channels)}")
             except Exception as e:
                 self.logger.error(f"Error during disconnection: {str(e)}")
             finally:
@@ -52,30 +238,98 @@ class TwitchConnection:
     def is_connected(self) -> bool:
         return self._connected
 
-    def send_privmsg(self, message: str) -> None:
+    def send_privmsg(self, channel: str, message: str) -> None:
+        """Dopisuje wiadomość do bufora; wychodzi przy najbliższym flush()."""
         if not self._connected:
             raise ConnectionError("Not connected to Twitch IRC")
-        self._send_command(f'PRIVMSG #{self.channel} :{message}')
+        self._send_command(f'PRIVMSG #{channel} :{message}')
 
-    def receive_messages(self) -> str:
-        if not self._connected or not self.irc:
+    def _join_channels(self) -> None:
+        for batch in join_batches(self.channels):
+            self._send_command(f'JOIN {batch}')
+
+    def join(self, channel: str) -> None:
+        """Dołącza do kanału w trakcie działania; po ponownym połączeniu kanał jest już na liście JOIN."""
+        if channel not in self.channels:
+            self.channels.append(channel)
+        if self._connected:
+            self._send_command(f'JOIN #{channel}')
+            self.flush()
+
+    def part(self, channel: str) -> None:
+        if channel in self.channels:
+            self.channels.remove(channel)
+        if self._connected:
+            self._send_command(f'PART #{channel}')
+            self.flush()
+
+    def receive_messages(self) -> list[str]:
+        """Odbiera dane z gniazda i zwraca wszystkie kompletne linie IRC (bez CRLF)."""
+        irc = self.irc
+        if not self._connected or not irc:
             raise ConnectionError("Not connected to Twitch IRC")
-        messages = self.irc.recv(4096).decode('utf-8')
-        if messages.startswith('PING'):
-            self.pong()
-        return messages
+        while True:
+            try:
+                chunk = irc.recv(RECV_SIZE)
+            except socket.timeout:
+                self._ping(irc)
+                continue
+            if not chunk:
+                raise ConnectionError("Connection closed by Twitch IRC")
+            if self._ping_pending:
+                self._ping_pending = False
+                irc.settimeout(PING_INTERVAL)
+            BYTES_RECEIVED.inc(len(chunk))
+            lines = self._lines.feed(chunk)
+            LINES_RECEIVED.inc(len(lines))
+            for line in lines:
+                if line.startswith('PING'):
+                    self.pong(line[5:] or ':tmi.twitch.tv')
+                elif line.startswith(':tmi.twitch.tv ') and not line.startswith(':tmi.twitch.tv PONG'):
+                    check_control_line(line)
+            if self._pending:
+                self.flush()  # PONG
+            if lines:
+                return lines
 
-    def _send_command(self, command: str) -> None:
-        if not self.irc:
-            raise ConnectionError("Socket not initialized")
-        if 'PASS' not in command:
-            print(f'< {command}')
-        self.irc.send((command + '\r\n').encode())
+    def _ping(self, irc: socket.socket) -> None:
+        """Po PING_INTERVAL ciszy sprawdza, czy serwer żyje; po drugim przekroczeniu czasu rzuca PingTimeout."""
+        if self._ping_pending:
+            raise PingTimeout(f"No reply to PING in {PONG_TIMEOUT:.0f} s")
+        self._ping_pending = True
+        irc.settimeout(PONG_TIMEOUT)
+        self._send_command('PING :tmi.twitch.tv')
+        self.flush()
+        PINGS_SENT.inc()
 
-    def _send_raw(self, message: str) -> None:
+    def flush(self) -> None:
+        """Wysyła wszystkie zbuforowane linie jednym zapisem. Przy błędzie gniazda bufor przepada razem
+        z połączeniem (wyjątek OSError), a wołający ponawia to, co potrzebne, po ponownym połączeniu."""
+        with self._send_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, []
+            irc = self.irc  # Wątek czatu może w tym czasie wywołać drop()
+            if not irc:
+                raise ConnectionError("Socket not initialized")
+            if self._vectored:
+                writes = send_vectored(irc, pending)
+            else:
+                irc.sendall(b''.join(pending))
+                writes = 1
+        SOCKET_WRITES.inc(writes)
+        LINES_SENT.inc(len(pending))
+
+    def _send_command(self, command: str) -> None:
+        """Dopisuje linię do bufora wysyłania (bez wywołania systemowego)."""
         if not self.irc:
             raise ConnectionError("Socket not initialized")
-        self.irc.sendall(message.encode())
+        if not command.startswith('PASS'):
+            self.logger.info('< %s', command, extra={'event': 'send'})
+        data = (command + '\r\n').encode()
+        with self._pending_lock:
+            self._pending.append(data)
 
     def __enter__(self):
         return self
@@ -83,5 +337,5 @@ class TwitchConnection:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.disconnect()
 
-    def pong(self):
-        self._send_command('PONG :tmi.twitch.tv')
\ No newline at end of file
+    def pong(self, payload: str = ':tmi.twitch.tv'):
+        self._send_command(f'PONG {payload}')
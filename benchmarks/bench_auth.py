@@ -0,0 +1,90 @@
+"""Koszt sprawdzania uprawnień na wiadomość: dawne listy vs skompilowany AuthPolicy.
+
+    python benchmarks/bench_auth.py [--names 1000 10000] [--messages 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AuthPolicy import AuthPolicy
+from ConfigSnapshot import build_snapshot
+from chatlog import BADGES
+
+
+class DictConfig:
+    """Zamiennik dawnego ConfigManager: słownik czytany przez __getitem__ przy każdym wywołaniu."""
+
+    def __init__(self, data: dict):
+        self.config = data
+
+    def __getitem__(self, key):
+        return self.config.get(key)
+
+
+def legacy_is_authorized(config, badge: str, user: str) -> bool:
+    """Dawne TwitchBot.is_authorized: odczyty konfiguracji i liniowe 'in' na listach przy każdym wywołaniu."""
+    if config['all_users_mod']: return True
+    if config['white_list_enabled']:
+        if user in config['white_list']:
+            return True
+    elif config['black_list_enabled']:
+        if user in config['black_list']:
+            return False
+    user_badges = [b.split('/')[0] for b in badge.split(',')]
+    for user_badge in user_badges:
+        if user_badge in config['bot_moderators']:
+            return True
+    return False
+
+
+def traffic(count: int, chatters: int, seed: int = 1) -> list[tuple[str, str]]:
+    """Wiadomości od chatterów o rozkładzie zbliżonym do Zipfa (kilku bardzo aktywnych, długi ogon)."""
+    rng = random.Random(seed)
+    users = [(f'user{i}', rng.choice(BADGES)) for i in range(chatters)]
+    weights = [1 / (i + 1) for i in range(chatters)]
+    return [(badge, user) for user, badge in rng.choices(users, weights, k=count)]
+
+
+def bench(func, messages, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for badge, user in messages:
+            func(badge, user)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, nargs='+', default=[100, 1000, 10000], help='rozmiary whitelisty')
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--chatters', type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = traffic(args.messages, args.chatters)
+    for size in args.names:
+        config = DictConfig({
+            'all_users_mod': False,
+            'white_list_enabled': True,
+            'white_list': [f'whitelisted{i}' for i in range(size)],
+            'black_list_enabled': False,
+            'black_list': [],
+            'bot_moderators': ['mod', 'subscriber', 'vip', 'broadcaster'],
+        })
+        legacy = bench(lambda badge, user: legacy_is_authorized(config, badge, user), messages)
+        snapshot = build_snapshot(config.config)
+        policy = AuthPolicy.from_config(snapshot)
+        compiled = bench(policy.is_authorized, messages)
+        uncached = AuthPolicy.from_config(snapshot, cache_size=0)
+        no_cache = bench(uncached.is_authorized, messages)
+        print(f'whitelist {size:>6}: legacy {legacy * 1e9:9.0f} ns/msg   compiled {no_cache * 1e9:6.0f} ns/msg   '
+              f'compiled+cache {compiled * 1e9:6.0f} ns/msg   (cache hit rate {policy.hits / (policy.hits + policy.misses):.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Czas zapytań historii bossów na bazie z wieloletnią historią i koszt dopisania zdarzenia na wątku czatu.
+
+    python benchmarks/bench_history.py [--years 10] [--channels 5] [--calls 2000]
+
+Domyślnie: 10 lat po 250 streamów na 5 kanałach, 15 bossów i 400 śmierci na stream.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BossHistory import BossHistory, boss_key
+from ChannelState import ChannelState
+from ConfigSnapshot import build_snapshot, default_config
+
+STREAMS_PER_YEAR = 250
+BOSSES_PER_STREAM = 15
+DEATHS_PER_STREAM = 400
+
+
+def fill(history: BossHistory, channels: list[str], years: int) -> tuple[int, int]:
+    """Wypełnia bazę bezpośrednio (z pominięciem kolejki), zwraca liczbę walk i śmierci."""
+    import sqlite3
+    rng = random.Random(1)
+    bosses = [f'Boss {i}' for i in range(300)]
+    db = sqlite3.connect(history.path)
+    fights = deaths = 0
+    now = time.time()
+    start = now - years * 365 * 86400
+    with db:
+        for stream in range(years * STREAMS_PER_YEAR):
+            ts = start + stream * (years * 365 * 86400 / (years * STREAMS_PER_YEAR))
+            for channel in channels:
+                fight_rows = []
+                for _ in range(BOSSES_PER_STREAM):
+                    boss = rng.choice(bosses)
+                    fight_rows.append((channel, boss, boss_key(boss), ts + rng.uniform(0, 14400),
+                                       rng.randint(30, 7200), rng.randint(0, 60)))
+                death_rows = [(channel, ts + i * 30, 1, None, 'mod') for i in range(DEATHS_PER_STREAM)]
+                db.executemany('INSERT INTO fights (channel, boss, boss_key, finished, seconds, deaths) '
+                               'VALUES (?, ?, ?, ?, ?, ?)', fight_rows)
+                db.executemany('INSERT INTO deaths (channel, ts, delta, boss, user) VALUES (?, ?, ?, ?, ?)',
+                               death_rows)
+                fights += len(fight_rows)
+                deaths += len(death_rows)
+    db.close()
+    return fights, deaths
+
+
+def bench(func, calls: int) -> tuple[float, float]:
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--channels', type=int, default=5)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    channels = [f'kanal{i}' for i in range(args.channels)]
+    with tempfile.TemporaryDirectory() as directory:
+        history = BossHistory(os.path.join(directory, 'history.sqlite3'))
+        history.start()
+        started = time.perf_counter()
+        fights, deaths = fill(history, channels, args.years)
+        size = os.path.getsize(history.path) / 1e6
+        print(f'{fights} fights, {deaths} deaths, {size:.0f} MB, filled in {time.perf_counter() - started:.1f} s')
+
+        queries = {
+            'bossstats': lambda: history.boss_stats('kanal0', 'boss 17'),
+            'pb': lambda: history.personal_best('kanal0', 'Boss 17'),
+            'pb (last)': lambda: history.personal_best('kanal0'),
+            'dph': lambda: history.deaths_per_hour('kanal0'),
+        }
+        history.session_start = time.time() - 4 * 3600  # Czterogodzinny stream
+        for name, query in queries.items():
+            p50, p99 = bench(query, args.calls)
+            print(f'  {name:<10} p50 {p50 * 1e6:8.1f} us   p99 {p99 * 1e6:8.1f} us')
+
+        state = ChannelState('kanal0', build_snapshot(default_config()))
+        p50, p99 = bench(lambda: history.add_deaths(state, 1, 'mod'), min(args.calls, 5000))
+        print(f'  {"add_deaths":<10} p50 {p50 * 1e6:8.1f} us   p99 {p99 * 1e6:8.1f} us   (wątek czatu)')
+        history.stop()
+        history.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Porównanie parsera IrcMessage z dawnym parsowaniem z TwitchBot.handle_message.
+
+    python benchmarks/bench_parser.py [--log nagrany_czat.log] [--lines 50000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import IrcMessage
+from chatlog import load_lines, synthetic_lines
+
+
+def legacy_parse(message: str):
+    """Parsowanie sprzed modułu IrcMessage (kilka split-ów na linię, badges z tags[1])."""
+    message = message.strip()
+    if not message.startswith('@'):
+        return None
+    tag_part, rest = message.split(' ', 1)
+    tags = tag_part[1:].split(';')
+    if ' :' not in rest:
+        return None
+    user_part, command_part = rest.split(' :', 1)
+    user_info = user_part.split(' ')
+    if len(user_info) < 3:
+        return None
+    channel = user_info[2][1:]
+    user = user_info[0].split('!')[0][1:]
+    command = command_part.split()[0]
+    args = command_part.split()[1:]
+    badge = tags[1][7:]
+    return channel, user, command, args, badge
+
+
+def new_parse(message: str):
+    msg = IrcMessage.parse(message)
+    if msg is None or msg.command != 'PRIVMSG' or msg.trailing is None:
+        return None
+    words = msg.trailing.split()
+    if not words:
+        return None
+    return msg.channel, msg.user, words[0], words[1:], msg.badge_string
+
+
+def bench(parser, lines: list[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            try:
+                parser(line)
+            except (ValueError, IndexError):
+                pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--log', help='nagrany log czatu (surowe linie IRC)')
+    parser.add_argument('--lines', type=int, default=50000, help='liczba linii syntetycznych')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    lines = load_lines(args.log) if args.log else synthetic_lines(args.lines, ['krwawyy'])
+    print(f'{len(lines)} lines, best of {args.repeat}')
+    for name, func in (('legacy', legacy_parse), ('IrcMessage', new_parse)):
+        elapsed = bench(func, lines, args.repeat)
+        print(f'{name:>12}: {elapsed * 1000:8.1f} ms  {len(lines) / elapsed:12,.0f} lines/s  '
+              f'{elapsed / len(lines) * 1e9:7.0f} ns/line')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Przepustowość całej ścieżki wiadomości: parsowanie, uprawnienia, komendy, kolejka i zapis stanu.
+
+Ruch (nagrany log albo syntetyczny) przechodzi przez prawdziwe TwitchBot.handle_message,
+CommandHandler, MessageScheduler i StatePersistence; zamiast socketu jest NullTransport.
+Wyniki zapisywane są do benchmarks/results/<nazwa>.json, żeby porównać je między wersjami.
+
+    python benchmarks/bench_pipeline.py [--lines 200000] [--channels 1 10] [--log chat.log]
+                                        [--name baseline] [--compare benchmarks/results/baseline.json]
+"""
+import argparse
+import array
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ruamel.yaml import YAML
+
+from ConfigSnapshot import default_config
+from StatePersistence import COALESCE_DELAY
+from chatlog import load_lines, synthetic_lines
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+class NullTransport:
+    """Zamiast socketu: liczy wiadomości, które bot by wysłał."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_privmsg(self, channel: str, message: str) -> None:
+        self.sent += 1
+
+
+def make_bot(channels: list[str]):
+    """Buduje TwitchBot w bieżącym katalogu (tymczasowym) z ustawieniami dla podanych kanałów."""
+    os.environ.setdefault('USER_NAME', 'benchbot')
+    os.environ.setdefault('OAUTH_TOKEN', 'oauth:bench')
+    config = default_config()
+    config.update(channel=channels, spam_bot_enabled=True, all_users_mod=False, white_list_enabled=False)
+    with open('settings.yaml', 'w', encoding='utf-8') as file:
+        YAML().dump(config, file)
+
+    import TwitchBot
+    return TwitchBot.TwitchBot(use_asyncio=True)
+
+
+def percentile(sorted_values: list[int], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def replay(bot, lines: list[str], transport: NullTransport) -> dict:
+    """Przepuszcza linie przez bota, mierząc czas każdej wiadomości i całości."""
+    handle = bot.handle_message
+    persistence = bot.persistence
+    outbox = bot.outbox
+    latencies = array.array('q', bytes(8 * len(lines)))  # Bez obiektów int, żeby nie psuć pomiaru pamięci
+    clock = time.perf_counter_ns
+    flush_every = int(COALESCE_DELAY * 1e9)
+
+    gc.collect()
+    gc_before = gc.get_stats()[0]['collections']
+    blocks_before = sys.getallocatedblocks()
+    start = last_flush = clock()
+    for i, line in enumerate(lines):
+        t0 = clock()
+        handle(line)
+        t1 = clock()
+        latencies[i] = t1 - t0
+        # Pętle zapisu i wysyłania jak w trybie asyncio, tylko bez czekania
+        if t1 - last_flush >= flush_every:
+            persistence.flush()
+            while True:
+                message, _ = outbox.take()
+                if message is None:
+                    break
+                transport.send_privmsg(message.channel, message.text)
+            last_flush = t1
+    elapsed = (clock() - start) / 1e9
+    blocks_after = sys.getallocatedblocks()
+    gc_after = gc.get_stats()[0]['collections']
+
+    latencies = sorted(latencies)
+    count = len(lines)
+    return {
+        'messages': count,
+        'seconds': round(elapsed, 4),
+        'msgs_per_sec': round(count / elapsed),
+        'p50_us': round(percentile(latencies, 0.50) / 1000, 2),
+        'p99_us': round(percentile(latencies, 0.99) / 1000, 2),
+        'max_us': round(latencies[-1] / 1000, 2),
+        'retained_blocks_per_msg': round((blocks_after - blocks_before) / count, 3),
+        'gen0_gcs_per_1k_msgs': round((gc_after - gc_before) * 1000 / count, 3),
+        'sent': transport.sent,
+    }
+
+
+def traced_allocations(bot, lines: list[str]) -> dict:
+    """Osobny, krótszy przebieg pod tracemalloc: szczytowa pamięć i bajty przydzielone na wiadomość."""
+    handle = bot.handle_message
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    allocated = 0
+    for line in lines:
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        handle(line)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - start  # Najwięcej pamięci zajętej naraz w trakcie obsługi wiadomości
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'peak_bytes_per_msg': round(allocated / len(lines), 1),
+        'retained_bytes_per_msg': round((current - before) / len(lines), 1),
+    }
+
+
+def scenarios(args) -> list[tuple[str, list[str], list[str]]]:
+    if args.log:
+        lines = load_lines(args.log)
+        channels = sorted({line.split(' #', 1)[1].split(' ', 1)[0] for line in lines if ' PRIVMSG #' in line})
+        return [(f'log:{os.path.basename(args.log)}', channels or ['krwawyy'], lines)]
+    result = []
+    for count in args.channels:
+        channels = [f'kanal{i}' for i in range(count)]
+        result.append((f'chat/{count}ch', channels, synthetic_lines(args.lines, channels, command_ratio=0.03)))
+        result.append((f'burst/{count}ch', channels, synthetic_lines(args.lines, channels, command_ratio=0.5)))
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, path: str) -> None:
+    with open(path, 'r', encoding='utf-8') as file:
+        previous = json.load(file)
+    print(f"\ncompared with {os.path.basename(path)} ({previous.get('revision')}):")
+    for name, current in results['scenarios'].items():
+        old = previous['scenarios'].get(name)
+        if old is None:
+            continue
+        changes = []
+        for key in ('msgs_per_sec', 'p50_us', 'p99_us', 'peak_bytes_per_msg'):
+            if old.get(key):
+                changes.append(f'{key} {(current[key] - old[key]) / old[key]:+.1%}')
+        print(f'  {name:<14} ' + '   '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=200000, help='liczba syntetycznych linii na scenariusz')
+    parser.add_argument('--channels', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--log', help='nagrany log: jedna surowa linia IRC na wiersz')
+    parser.add_argument('--traced', type=int, default=20000, help='linie mierzone pod tracemalloc')
+    parser.add_argument('--name', help='nazwa pliku z wynikami (domyślnie rewizja git)')
+    parser.add_argument('--compare', help='plik z wcześniejszymi wynikami do porównania')
+    args = parser.parse_args()
+
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'scenarios': {},
+    }
+    cwd = os.getcwd()
+    for name, channels, lines in scenarios(args):
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                bot = make_bot(channels)
+                stats = replay(bot, lines, NullTransport())
+                bot.journal.close()
+                traced_bot = make_bot(channels)
+                stats.update(traced_allocations(traced_bot, lines[:args.traced]))
+                traced_bot.journal.close()
+            finally:
+                os.chdir(cwd)
+        results['scenarios'][name] = stats
+        print(f"{name:<14} {stats['msgs_per_sec']:>9} msg/s   p50 {stats['p50_us']:7.2f} us   "
+              f"p99 {stats['p99_us']:7.2f} us   peak {stats['peak_bytes_per_msg']:8.1f} B/msg   "
+              f"retained {stats['retained_blocks_per_msg']:.3f} blocks/msg   sent {stats['sent']}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{args.name or results['revision']}.json")
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f'\nresults saved to {os.path.relpath(path, cwd)}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Koszt obsługi komendy przez CommandRouter w zależności od liczby własnych komend.
+
+    python benchmarks/bench_router.py [--custom 0 50 500] [--calls 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ChannelState import ChannelState
+from CommandHandler import CommandHandler
+from ConfigSnapshot import build_snapshot, default_config
+
+
+class NullJournal:
+    def append(self, state, event, user):
+        pass
+
+
+class NullHistory:
+    available = False
+
+    def add_deaths(self, state, delta, user):
+        pass
+
+
+class NullBot:
+    journal = NullJournal()
+    history = NullHistory()
+
+
+def bench(func, calls: int, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--custom', type=int, nargs='+', default=[0, 50, 500], help='liczba własnych komend')
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    handler = CommandHandler(NullBot(), None)
+    for custom in args.custom:
+        raw = default_config()
+        raw['commands'] = {f'custom{i}': {'response': f'Komenda {i} dla {{user}} {{emote}}', 'aliases': [f'c{i}']}
+                           for i in range(custom)}
+        state = ChannelState('bench', build_snapshot(raw))
+        results = []
+        for command in ('deaths', 'death+', f'c{custom - 1}' if custom else 'author', 'nieznana'):
+            per_call = bench(lambda: handler.execute_command(state, command, 'user', True, []), args.calls)
+            results.append(f'{command} {per_call * 1e9:6.0f} ns')
+        print(f'{custom:>4} custom commands: ' + '   '.join(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Czas startu bota: import, wczytanie konfiguracji, wczytanie stanu kanałów i czas do pierwszego JOIN.
+
+Każdy pomiar to nowy proces Pythona w katalogu tymczasowym z settings.yaml dla --channels
+kanałów oraz snapshotem i ogonem dziennika każdego z nich. Konfiguracja mierzona jest bez
+pliku settings.yaml.cache (pierwszy start albo zmieniony plik) i z nim (zwykły restart).
+Czas do JOIN liczony jest od uruchomienia 'python TwitchBot.py --server ...' (albo --exe)
+do odebrania pierwszej linii JOIN przez lokalny serwer.
+
+    python benchmarks/bench_startup.py [--channels 50] [--runs 10] [--exe dist/bot/bot]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ruamel.yaml import YAML
+
+from ChannelState import ChannelState
+from ConfigSnapshot import build_snapshot, default_config
+from EventJournal import EventJournal
+
+JOURNAL_TAIL = 100  # Zdarzeń w dzienniku kanału po ostatnim snapshocie
+JOIN_TIMEOUT = 30.0
+
+# Mierzone w osobnym procesie, żeby import zaczynał się od pustego sys.modules
+PHASES = r"""
+import json, time
+started = time.perf_counter()
+import TwitchBot
+imported = time.perf_counter()
+from ConfigManager import ConfigManager
+config_manager = ConfigManager()
+configured = time.perf_counter()
+from ChannelState import ChannelState
+from EventJournal import EventJournal
+journal = EventJournal()
+for channel in config_manager.channels():
+    state = ChannelState(channel, config_manager.for_channel(channel))
+    if not journal.restore(state):
+        state.read_data_from_file()
+loaded = time.perf_counter()
+print(json.dumps({'import': imported - started, 'config': configured - imported, 'state': loaded - configured}))
+"""
+
+
+def prepare(directory: str, channels: list[str]) -> None:
+    """settings.yaml i stan kanałów (snapshot plus JOURNAL_TAIL zdarzeń) w katalogu testu."""
+    config = default_config()
+    config.update(channel=channels, channel_overrides={channels[0]: {'prefix': '^'}},
+                  commands={'discord': {'response': 'discord.gg/bench'}})
+    with open(os.path.join(directory, 'settings.yaml'), 'w', encoding='utf-8') as file:
+        YAML().dump(config, file)
+
+    rng = random.Random(1)
+    snapshot = build_snapshot(config)
+    journal = EventJournal(directory)
+    for channel in channels:
+        state = ChannelState(channel, snapshot.for_channel(channel))
+        state.set_deaths(rng.randint(0, 5000))
+        journal.snapshot(state)
+        for _ in range(JOURNAL_TAIL):
+            state.add_deaths(1)
+            journal.append(state, 'increment_deaths', 'bench')
+
+
+def environment() -> dict:
+    env = dict(os.environ, USER_NAME='benchbot', OAUTH_TOKEN='oauth:bench')
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def drop_cache(directory: str) -> None:
+    try:
+        os.remove(os.path.join(directory, 'settings.yaml.cache'))
+    except FileNotFoundError:
+        pass
+
+
+def run_phases(directory: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', PHASES], cwd=directory, env=environment(),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_interpreter(directory: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], cwd=directory, env=environment(), check=True)
+    return time.perf_counter() - started
+
+
+async def run_until_join(directory: str, exe: str) -> float:
+    """Uruchamia bota na lokalnym serwerze i mierzy czas do pierwszej linii JOIN."""
+    joined = asyncio.get_running_loop().create_future()
+
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while not joined.done():
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b'JOIN'):
+                joined.set_result(time.perf_counter())
+        writer.close()
+
+    server = await asyncio.start_server(client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    command = [exe] if exe else [sys.executable, os.path.join(ROOT, 'TwitchBot.py')]
+    started = time.perf_counter()
+    process = subprocess.Popen(command + ['--server', f'127.0.0.1:{port}'], cwd=directory, env=environment(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return await asyncio.wait_for(joined, JOIN_TIMEOUT) - started
+    finally:
+        process.terminate()
+        process.wait()
+        server.close()
+
+
+def summary(values: list[float]) -> str:
+    values = sorted(values)
+    return f'p50 {values[len(values) // 2] * 1000:7.1f} ms   min {values[0] * 1000:7.1f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--exe', help='zamrożony plik wykonywalny (PyInstaller) zamiast python TwitchBot.py')
+    args = parser.parse_args()
+
+    results: dict[str, list[float]] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        prepare(directory, [f'kanal{i}' for i in range(args.channels)])
+        for _ in range(args.runs):
+            results.setdefault('interpreter', []).append(run_interpreter(directory))
+            for cache in ('cold', 'warm'):
+                if cache == 'cold':
+                    drop_cache(directory)
+                phases = run_phases(directory)
+                for name, value in phases.items():
+                    results.setdefault(f'{name} ({cache} cache)', []).append(value)
+            drop_cache(directory)
+            results.setdefault('first JOIN (cold cache)', []).append(asyncio.run(run_until_join(directory, args.exe)))
+            results.setdefault('first JOIN (warm cache)', []).append(asyncio.run(run_until_join(directory, args.exe)))
+
+    print(f'{args.channels} channels, {args.runs} runs' + (f', {args.exe}' if args.exe else ''))
+    for name in ('interpreter', 'import (cold cache)', 'config (cold cache)', 'config (warm cache)',
+                 'state (warm cache)', 'first JOIN (cold cache)', 'first JOIN (warm cache)'):
+        print(f'  {name:<24} {summary(results[name])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Wczytywanie nagranych logów czatu i generowanie syntetycznego ruchu Twitch IRC."""
+import random
+from typing import Optional
+
+WORDS = ['xD', 'KEKW', 'ale', 'gra', 'chat', 'boss', 'znowu', 'OMEGALUL', 'pog', 'gg', 'jak', 'to',
+         'przeszedł', 'nie', 'wierzę', 'monkaS', 'zaraz', 'będzie', 'śmierć', 'LUL', 'ez', 'dawaj']
+BADGES = ['', 'subscriber/12', 'subscriber/3,premium/1', 'vip/1', 'moderator/1,subscriber/24',
+          'broadcaster/1,subscriber/0', 'glhf-pledge/1', 'turbo/1']
+COMMANDS = ['!death+', '!death+', '!death+', '!deaths', '!deaths', '!help', '!death-', '!startboss Malenia',
+            '!pauseboss', '!resumeboss', '!finishboss', '!setdeaths 42']
+
+
+def privmsg(rng: random.Random, channel: str, text: str, user: Optional[str] = None) -> str:
+    """Buduje linię PRIVMSG z kompletem tagów, jakie wysyła Twitch."""
+    user = user or f'user{rng.randrange(50000)}'
+    badges = rng.choice(BADGES)
+    emotes = '' if rng.random() < 0.7 else f'25:0-4,{rng.randrange(6, 30)}-{rng.randrange(31, 40)}/1902:6-10'
+    tags = (f'@badge-info=subscriber/{rng.randrange(1, 40)};badges={badges};client-nonce={rng.getrandbits(64):016x};'
+            f'color=#{rng.getrandbits(24):06X};display-name={user};emotes={emotes};first-msg=0;flags=;'
+            f'id={rng.getrandbits(128):032x};mod={int("moderator" in badges)};returning-chatter=0;'
+            f'room-id=12345678;subscriber={int("subscriber" in badges)};tmi-sent-ts={1700000000000 + rng.randrange(10**9)};'
+            f'turbo=0;user-id={rng.randrange(10**9)};user-type=')
+    return f'{tags} :{user}!{user}@{user}.tmi.twitch.tv PRIVMSG #{channel} :{text}'
+
+
+def synthetic_lines(count: int, channels: list[str], command_ratio: float = 0.03, seed: int = 1) -> list[str]:
+    """Generuje ruch: głównie zwykły czat, trochę komend, PINGi i inne zdarzenia serwera."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        channel = rng.choice(channels)
+        roll = rng.random()
+        if roll < 0.002:
+            lines.append('PING :tmi.twitch.tv')
+        elif roll < 0.01:
+            lines.append(f'@emote-only=0;followers-only=-1;r9k=0;room-id=12345678;slow=0;subs-only=0 '
+                         f':tmi.twitch.tv ROOMSTATE #{channel}')
+        elif roll < 0.02:
+            user = f'user{rng.randrange(50000)}'
+            lines.append(f':{user}!{user}@{user}.tmi.twitch.tv JOIN #{channel}')
+        elif roll < 0.02 + command_ratio:
+            lines.append(privmsg(rng, channel, rng.choice(COMMANDS)))
+        else:
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(1, 12)))
+            lines.append(privmsg(rng, channel, text))
+    return lines
+
+
+def load_lines(path: str) -> list[str]:
+    """Wczytuje nagrany log: jedna surowa linia IRC na wiersz."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        return [line.rstrip('\r\n') for line in file if line.strip()]
@@ -0,0 +1,354 @@
+"""Lokalny zamiennik irc.twitch.tv do testów obciążeniowych i długich testów (soak).
+
+Obsługuje to, czego używa bot: PASS/NICK/JOIN/PART/CAP REQ, tagi IRCv3, PING/PONG
+w obie strony i limit PRIVMSG po stronie serwera (jak Twitch: 20 albo 100 na 30 s).
+Zalewa dołączone kanały czatem z zadaną częstotliwością, z mieszanką komend,
+zapisuje wszystko, co bot odeśle, i co --report sekund wypisuje statystyki.
+Z --drop-every co zadany czas psuje połączenie (zamknięcie, zawieszenie albo
+RECONNECT) i mierzy, po jakim czasie bot ponownie dołącza do kanałów.
+
+    python benchmarks/fake_twitch.py --port 6667 --rate 2000 --channels 50 --duration 3600 \\
+        --mix '!death+=5,!deaths=3,!help=1' --record bot_output.log --pid <pid bota>
+    python TwitchBot.py --server 127.0.0.1:6667
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatlog import COMMANDS, WORDS, privmsg
+
+RATE_WINDOW = 30.0
+RATE_LIMIT_NORMAL = 20
+RATE_LIMIT_MOD = 100
+TICK = 0.01  # Co ile sekund wysyłamy kolejną porcję czatu
+MAX_PENDING = 1000  # Ile komend na kanał czeka na odpowiedź, zanim najstarsze uznamy za bez odpowiedzi
+
+
+def parse_mix(text: Optional[str]) -> tuple[list[str], list[float]]:
+    """'!death+=5,!deaths=3' -> (['!death+', '!deaths'], [5, 3]); bez --mix komendy z chatlog.COMMANDS."""
+    if not text:
+        return COMMANDS, [1.0] * len(COMMANDS)
+    commands, weights = [], []
+    for item in text.split(','):
+        command, _, weight = item.rpartition('=')
+        if not command:
+            command, weight = weight, '1'
+        commands.append(command.strip())
+        weights.append(float(weight))
+    return commands, weights
+
+
+class Client:
+    """Jedno połączenie bota."""
+
+    def __init__(self, server: 'FakeTwitchServer', reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.nick = '*'
+        self.password = None
+        self.tags = False
+        self.channels: set[str] = set()
+        self.limit = RATE_LIMIT_MOD if server.bot_mod else RATE_LIMIT_NORMAL
+        self.privmsgs: deque[float] = deque()  # Chwile przyjętych PRIVMSG z ostatnich RATE_WINDOW sekund
+        self.ping_sent: Optional[float] = None
+        self.stalled = False  # Zawieszone połączenie: nic nie wysyłamy i ignorujemy, co przyjdzie
+
+    def send(self, line: str) -> None:
+        if not self.stalled:
+            self.writer.write(line.encode() + b'\r\n')
+
+    def chat_line(self, line: str) -> str:
+        """Twitch wysyła tagi tylko po 'CAP REQ :twitch.tv/tags'."""
+        if not self.tags and line.startswith('@'):
+            return line.split(' ', 1)[1]
+        return line
+
+    def allow_privmsg(self) -> bool:
+        """Przesuwane okno jak u Twitcha: najwyżej limit PRIVMSG w dowolnych RATE_WINDOW sekundach."""
+        now = time.monotonic()
+        privmsgs = self.privmsgs
+        while privmsgs and privmsgs[0] <= now - RATE_WINDOW:
+            privmsgs.popleft()
+        if len(privmsgs) >= self.limit:
+            return False
+        privmsgs.append(now)
+        return True
+
+    def handle(self, line: str) -> None:
+        server = self.server
+        if self.stalled:
+            return
+        command, _, rest = line.partition(' ')
+        command = command.upper()
+        if command == 'PASS':
+            self.password = rest
+        elif command == 'NICK':
+            self.nick = rest.strip().lower()
+            for code, text in (('001', 'Welcome, GLHF!'), ('002', 'Your host is tmi.twitch.tv'),
+                               ('003', 'This server is rather new'), ('004', '-'), ('375', '-'),
+                               ('372', 'You are in a maze of twisty passages, all alike.'), ('376', '>')):
+                self.send(f':tmi.twitch.tv {code} {self.nick} :{text}')
+        elif command == 'CAP':
+            capabilities = rest.partition(':')[2]
+            self.tags = self.tags or 'twitch.tv/tags' in capabilities
+            self.send(f':tmi.twitch.tv CAP * ACK :{capabilities}')
+        elif command == 'JOIN':
+            for channel in rest.strip().split(','):
+                self.join(channel.lstrip('#').lower())
+        elif command == 'PART':
+            for channel in rest.strip().split(','):
+                channel = channel.lstrip('#').lower()
+                self.channels.discard(channel)
+                self.send(f':{self.nick}!{self.nick}@{self.nick}.tmi.twitch.tv PART #{channel}')
+        elif command == 'PING':
+            self.send(f':tmi.twitch.tv PONG tmi.twitch.tv {rest}')
+        elif command == 'PONG':
+            if self.ping_sent is not None:
+                server.stats['pong_rtt_ms'] = round((time.monotonic() - self.ping_sent) * 1000, 3)
+                self.ping_sent = None
+        elif command == 'PRIVMSG':
+            channel = rest.partition(' ')[0].lstrip('#').lower()
+            if not self.allow_privmsg():
+                server.stats['rate_limited'] += 1
+                self.send(f'@msg-id=msg_ratelimit :tmi.twitch.tv NOTICE #{channel} '
+                          f':Your message was not sent because you are sending messages too quickly.')
+                return
+            server.stats['bot_privmsgs'] += 1
+            server.reply_received(channel)
+
+    def join(self, channel: str) -> None:
+        self.channels.add(channel)
+        self.server.rejoined()
+        nick = self.nick
+        self.send(f':{nick}!{nick}@{nick}.tmi.twitch.tv JOIN #{channel}')
+        self.send(f':{nick}.tmi.twitch.tv 353 {nick} = #{channel} :{nick}')
+        self.send(f':{nick}.tmi.twitch.tv 366 {nick} #{channel} :End of /NAMES list')
+        badges = 'moderator/1' if self.server.bot_mod else ''
+        self.send(self.chat_line(f'@badge-info=;badges={badges};color=;display-name={nick};emote-sets=0;'
+                                 f'mod={int(self.server.bot_mod)};subscriber=0;user-type= '
+                                 f':tmi.twitch.tv USERSTATE #{channel}'))
+        self.send(self.chat_line(f'@emote-only=0;followers-only=-1;r9k=0;room-id=12345678;slow=0;subs-only=0 '
+                                 f':tmi.twitch.tv ROOMSTATE #{channel}'))
+
+
+class FakeTwitchServer:
+    def __init__(self, rate: float, channels: int, command_ratio: float, mix: Optional[str], bot_mod: bool,
+                 ping_interval: float, record: Optional[str], seed: int = 1, drop_mode: str = 'close'):
+        self.rate = rate
+        self.channel_limit = channels  # Zalewamy najwyżej tyle kanałów spośród dołączonych
+        self.command_ratio = command_ratio
+        self.commands, self.weights = parse_mix(mix)
+        self.bot_mod = bot_mod
+        self.ping_interval = ping_interval
+        self.rng = random.Random(seed)
+        self.clients: list[Client] = []
+        self.record = open(record, 'a', encoding='utf-8') if record else None
+        self.started = time.monotonic()
+        # Czasy wysłania komend bez odpowiedzi, per kanał; odpowiedź zamyka wszystkie (bot łączy odpowiedzi)
+        self.pending: dict[str, deque[float]] = {}
+        self.latencies: list[float] = []
+        self.drop_mode = drop_mode
+        self.dropped_at: Optional[float] = None  # Kiedy zepsuliśmy połączenie; zerowane przy pierwszym JOIN
+        self.stats = {'connections': 0, 'chat_sent': 0, 'commands_sent': 0, 'bot_lines': 0, 'bot_privmsgs': 0,
+                      'rate_limited': 0, 'unanswered': 0, 'backlog_bytes': 0, 'pong_rtt_ms': None, 'drops': 0,
+                      'recovery_ms': None}
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = Client(self, reader, writer)
+        self.clients.append(client)
+        self.stats['connections'] += 1
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+                if not line:
+                    continue
+                self.stats['bot_lines'] += 1
+                if self.record is not None and not line.startswith('PASS'):
+                    self.record.write(f'{time.time():.3f} {line}\n')
+                client.handle(line)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.remove(client)
+            writer.close()
+
+    def rejoined(self) -> None:
+        if self.dropped_at is not None:
+            self.stats['recovery_ms'] = round((time.monotonic() - self.dropped_at) * 1000, 1)
+            self.dropped_at = None
+
+    async def dropper(self, interval: float) -> None:
+        """Co interval sekund psuje połączenia botów w sposób wybrany przez --drop-mode."""
+        while True:
+            await asyncio.sleep(interval)
+            clients = [client for client in self.clients if not client.stalled]
+            if not clients:
+                continue
+            self.dropped_at = time.monotonic()
+            self.stats['drops'] += 1
+            for client in clients:
+                if self.drop_mode == 'reconnect':
+                    client.send(':tmi.twitch.tv RECONNECT')
+                elif self.drop_mode == 'stall':
+                    client.channels.clear()  # Bez zalewania; gniazdo zostaje otwarte, aż bot sam je zamknie
+                    client.stalled = True
+                else:
+                    client.writer.transport.abort()
+
+    def reply_received(self, channel: str) -> None:
+        pending = self.pending.get(channel)
+        if not pending:
+            return
+        now = time.monotonic()
+        self.latencies.append(now - pending[0])
+        pending.clear()
+
+    def chat_for(self, channel: str) -> tuple[str, bool]:
+        rng = self.rng
+        if rng.random() < self.command_ratio:
+            return privmsg(rng, channel, rng.choices(self.commands, self.weights)[0]), True
+        return privmsg(rng, channel, ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(1, 12)))), False
+
+    async def flood(self) -> None:
+        """Wysyła rate wiadomości na sekundę, po równo w porcjach co TICK."""
+        budget = 0.0
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(TICK)
+            now = time.monotonic()
+            budget += (now - last) * self.rate
+            last = now
+            channels = sorted({c for client in self.clients for c in client.channels})[:self.channel_limit]
+            if not channels:
+                budget = 0.0
+                continue
+            count = int(budget)
+            budget -= count
+            for _ in range(count):
+                channel = self.rng.choice(channels)
+                line, is_command = self.chat_for(channel)
+                for client in self.clients:
+                    if channel in client.channels:
+                        client.send(client.chat_line(line))
+                self.stats['chat_sent'] += 1
+                if is_command:
+                    self.stats['commands_sent'] += 1
+                    pending = self.pending.setdefault(channel, deque())
+                    if len(pending) >= MAX_PENDING:
+                        pending.popleft()
+                        self.stats['unanswered'] += 1
+                    pending.append(now)
+            # Jeśli bot nie nadąża czytać, drain() spowalnia zalewanie; widać to w chat_sent i backlog_bytes
+            self.stats['backlog_bytes'] = sum(c.writer.transport.get_write_buffer_size() for c in self.clients)
+            for client in list(self.clients):
+                try:
+                    await client.writer.drain()
+                except ConnectionError:
+                    pass
+
+    async def pinger(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for client in self.clients:
+                client.ping_sent = time.monotonic()
+                client.send('PING :tmi.twitch.tv')
+
+    def snapshot(self, pid: Optional[int]) -> dict:
+        latencies = sorted(self.latencies)
+        self.latencies = []
+        elapsed = time.monotonic() - self.started
+        result = dict(self.stats, uptime_s=round(elapsed), chat_rate=round(self.stats['chat_sent'] / elapsed))
+        if latencies:
+            result['reply_p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+            result['reply_p99_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+        if pid:
+            result['bot_rss_kb'] = process_rss(pid)
+        return result
+
+    async def reporter(self, interval: float, pid: Optional[int]) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps(self.snapshot(pid)), flush=True)
+            if self.record is not None:
+                self.record.flush()
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """Pamięć procesu bota (VmRSS z /proc, tylko Linux)."""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def main_async(args) -> None:
+    server = FakeTwitchServer(args.rate, args.channels, args.command_ratio, args.mix, args.bot_mod,
+                              args.ping_interval, args.record, drop_mode=args.drop_mode)
+    listener = await asyncio.start_server(server.handle_client, args.host, args.port, limit=2 ** 20)
+    print(f'fake Twitch IRC listening on {args.host}:{args.port}', flush=True)
+    tasks = [asyncio.create_task(server.flood()), asyncio.create_task(server.pinger()),
+             asyncio.create_task(server.reporter(args.report, args.pid))]
+    if args.drop_every:
+        tasks.append(asyncio.create_task(server.dropper(args.drop_every)))
+    try:
+        async with listener:
+            if args.duration:
+                await asyncio.sleep(args.duration)
+            else:
+                await listener.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        final = server.snapshot(args.pid)
+        print(json.dumps(final), flush=True)
+        if args.stats_file:
+            with open(args.stats_file, 'w', encoding='utf-8') as file:
+                json.dump(final, file, indent=2)
+        if server.record is not None:
+            server.record.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6667)
+    parser.add_argument('--rate', type=float, default=100.0, help='wiadomości czatu na sekundę (łącznie)')
+    parser.add_argument('--channels', type=int, default=1000, help='ile dołączonych kanałów zalewać')
+    parser.add_argument('--command-ratio', type=float, default=0.03, help='udział komend w czacie')
+    parser.add_argument('--mix', help="mieszanka komend z wagami, np. '!death+=5,!deaths=3,!help=1'")
+    parser.add_argument('--bot-mod', action='store_true', help='bot ma rangę moda (limit 100 zamiast 20 na 30 s)')
+    parser.add_argument('--ping-interval', type=float, default=60.0)
+    parser.add_argument('--drop-every', type=float, help='co ile sekund psuć połączenie bota')
+    parser.add_argument('--drop-mode', choices=('close', 'stall', 'reconnect'), default='close',
+                        help='close: zerwanie TCP, stall: cisza bez zamykania (test PING), reconnect: RECONNECT')
+    parser.add_argument('--record', help='plik, do którego dopisywane są linie wysłane przez bota')
+    parser.add_argument('--report', type=float, default=10.0, help='co ile sekund wypisać statystyki')
+    parser.add_argument('--duration', type=float, help='po ilu sekundach zakończyć (domyślnie bez końca)')
+    parser.add_argument('--pid', type=int, help='PID bota, żeby śledzić jego pamięć')
+    parser.add_argument('--stats-file', help='zapisz końcowe statystyki jako JSON')
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 
 
 a = Analysis(
-    ['bot.py'],
+    ['TwitchBot.py'],
     pathex=[],
     binaries=[],
     datas=[],
@@ -10,7 +10,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter'],
     noarchive=False,
 )
 pyz = PYZ(a.pure)
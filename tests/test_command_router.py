@@ -0,0 +1,144 @@
+import pytest
+
+from ChannelState import ChannelState
+from CommandHandler import CommandHandler
+from CommandRouter import ACTIONS, CommandRouter, build_command_specs
+from ConfigSnapshot import ConfigError, build_snapshot, default_config
+from CooldownTracker import CooldownTracker
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make(commands=None, **values):
+    """Router z akcjami, które zapisują wywołania i zwracają wynik z outcomes, oraz stan kanału 'kanal'."""
+    raw = default_config()
+    raw.update(values)
+    if commands is not None:
+        raw['commands'] = commands
+    state = ChannelState('kanal', build_snapshot(raw))
+    state.set_deaths(7)
+    calls, outcomes = [], {}
+
+    def action(name):
+        def run(state, user, arg):
+            calls.append((name, user, arg))
+            return outcomes.get(name, 'ok')
+        return run
+
+    clock = Clock()
+    router = CommandRouter({name: action(name) for name in ACTIONS}, CooldownTracker(clock=clock))
+    return router, state, calls, outcomes, clock
+
+
+def test_alias_dispatches_to_the_same_route():
+    router, state, calls, _, _ = make({'deaths': {'aliases': ['d', 'Smierci']}})
+    for word in ('deaths', 'd', 'smierci'):
+        assert router.route_name(state.config, word) == 'deaths'
+        assert router.dispatch(state, word, 'widz', False, []).startswith('@widz kanal wypierdolił się już 7 razy')
+    assert [name for name, _, _ in calls] == ['show_deaths'] * 3
+    assert router.route_name(state.config, 'nieznana') is None
+    assert router.dispatch(state, 'nieznana', 'widz', False, []) is None
+
+
+def test_text_command_template_fields():
+    router, state, _, _, _ = make({'discord': {'response': '@{user} {channel}: {deaths}, {prefix}deaths {args}'}})
+    assert router.dispatch(state, 'discord', 'widz', False, ['a', 'b']) == '@widz kanal: 7, !deaths a b'
+
+
+def test_template_without_fields_is_plain_text():
+    router, state, _, _, _ = make({'zasady': {'response': 'Bez spamu, proszę'}})
+    assert router.dispatch(state, 'zasady', 'widz', False, []) == 'Bez spamu, proszę'
+
+
+def test_legacy_extra_command_is_not_formatted():
+    router, state, _, _, _ = make(extra_command_1_enabled=True, extra_command_1='Kod',
+                                  extra_command_1_text='{nie} jest polem')
+    assert router.dispatch(state, 'kod', 'widz', False, []) == '{nie} jest polem'
+
+
+def test_action_outcome_picks_response_and_none_means_silence():
+    router, state, calls, outcomes, _ = make()
+    outcomes['increment_deaths'] = 'vote'
+    assert router.dispatch(state, 'death+', 'mod', True, []) is None
+    assert calls == [('increment_deaths', 'mod', None)]
+
+
+def test_action_fields_fill_the_template():
+    router, state, _, outcomes, _ = make({'staty': {'action': 'chat_stats', 'response': '{msgs_per_min}/min'}})
+    outcomes['chat_stats'] = ('ok', {'msgs_per_min': '42'})
+    assert router.dispatch(state, 'staty', 'widz', False, []) == '42/min'
+
+
+def test_mod_command_denied_without_running_action():
+    router, state, calls, _, _ = make()
+    assert router.dispatch(state, 'death-', 'widz', False, []) == 'Nie masz uprawnień do używania tej komendy.'
+    assert calls == []
+
+
+def test_int_argument_schema():
+    router, state, calls, outcomes, _ = make({'setbossdeaths': {'cooldown': None}})
+    for args in (['12'], ['abc'], [], ['-1']):
+        router.dispatch(state, 'setbossdeaths', 'mod', True, args)
+    assert calls == [('set_boss_deaths', 'mod', 12)] + [('set_boss_deaths', 'mod', None)] * 3
+    outcomes['set_boss_deaths'] = 'usage'
+    assert router.dispatch(state, 'setbossdeaths', 'mod', True, ['abc']).startswith('@mod Coś się Zepsuło')
+
+
+@pytest.mark.parametrize('args', [[], ['abc'], ['5']])
+def test_set_boss_deaths_without_boss_says_so_before_usage(args):
+    router = CommandHandler(None, None).router
+    state = ChannelState('kanal', build_snapshot(default_config()))
+    assert router.dispatch(state, 'setbossdeaths', 'mod', True, args) == 'Nie ma ustawionego bossa hm'
+
+
+@pytest.mark.parametrize('args', [[], ['abc']])
+def test_set_boss_deaths_usage_with_boss(args):
+    router = CommandHandler(None, None).router
+    state = ChannelState('kanal', build_snapshot(default_config()))
+    state.start_boss('Malenia')
+    assert router.dispatch(state, 'setbossdeaths', 'mod', True, args).startswith('@mod Coś się Zepsuło')
+    assert state.deaths_boss == 0
+
+
+def test_cooldown_is_shared_by_aliases_and_charged_only_on_success():
+    router, state, calls, outcomes, clock = make({'death+': {'aliases': ['d+'], 'cooldown': 15}})
+    outcomes['increment_deaths'] = 'vote'  # Głos bez zaliczenia nie zaczyna cooldownu
+    router.dispatch(state, 'death+', 'mod', True, [])
+    outcomes['increment_deaths'] = 'ok'
+    router.dispatch(state, 'death+', 'mod', True, [])
+    router.dispatch(state, 'd+', 'mod', True, [])  # Ten sam cooldown co nazwa
+    assert len(calls) == 2
+    clock.now += 15
+    router.dispatch(state, 'd+', 'mod', True, [])
+    assert len(calls) == 3
+
+
+def test_clear_rebuilds_tables_for_new_snapshot():
+    router, state, _, _, _ = make({'deaths': {'aliases': ['d']}})
+    assert router.route_name(state.config, 'd') == 'deaths'
+    raw = default_config()
+    raw['commands'] = {'deaths': {'aliases': ['x']}}
+    state.config = build_snapshot(raw)
+    router.clear()
+    assert router.route_name(state.config, 'd') is None
+    assert router.route_name(state.config, 'x') == 'deaths'
+
+
+@pytest.mark.parametrize('commands, message', [
+    ({'deaths': {'aliases': ['death+']}}, 'already used'),
+    ({'nowa': {'action': 'text'}}, "needs a 'response'"),
+    ({'nowa': {'response': '{brak}'}}, 'unknown field'),
+    ({'deaths': {'permission': 'vip'}}, 'permission'),
+    ({'deaths': {'cooldown': {'kanal': 5}}}, 'scopes'),
+])
+def test_invalid_declarations_are_rejected(commands, message):
+    with pytest.raises(ValueError, match=message):
+        build_command_specs(default_config(), commands)
+    with pytest.raises(ConfigError):
+        build_snapshot({**default_config(), 'commands': commands})
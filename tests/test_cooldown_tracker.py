@@ -0,0 +1,89 @@
+from CooldownTracker import CooldownPolicy, CooldownTracker, NO_COOLDOWN
+
+GLOBAL = CooldownPolicy(global_seconds=2)
+COMMAND = CooldownPolicy(command_seconds=5)
+USER = CooldownPolicy(user_seconds=60)
+ALL = CooldownPolicy(2, 5, 60)
+
+
+def test_no_cooldown_policy_is_falsy():
+    assert not NO_COOLDOWN
+    assert ALL
+
+
+def test_user_scope_blocks_only_that_user_and_command():
+    tracker = CooldownTracker()
+    tracker.start('kanal', 'deaths', 'Widz', USER, now=0)
+    assert tracker.remaining('kanal', 'deaths', 'widz', USER, now=10) == 50  # Nick bez rozróżniania wielkości liter
+    assert tracker.remaining('kanal', 'deaths', 'inny', USER, now=10) == 0
+    assert tracker.remaining('kanal', 'pb', 'widz', USER, now=10) == 0
+    assert tracker.remaining('inny_kanal', 'deaths', 'widz', USER, now=10) == 0
+
+
+def test_command_scope_blocks_everyone_for_that_command():
+    tracker = CooldownTracker()
+    tracker.start('kanal', 'deaths', 'a', COMMAND, now=0)
+    assert tracker.remaining('kanal', 'deaths', 'b', COMMAND, now=1) == 4
+    assert tracker.remaining('kanal', 'pb', 'b', COMMAND, now=1) == 0
+    assert tracker.remaining('kanal', 'deaths', 'b', COMMAND, now=5) == 0
+
+
+def test_global_scope_blocks_other_commands_with_global_scope():
+    tracker = CooldownTracker()
+    tracker.start('kanal', 'deaths', 'a', GLOBAL, now=0)
+    assert tracker.remaining('kanal', 'pb', 'b', GLOBAL, now=1) == 1
+    assert tracker.remaining('kanal', 'pb', 'b', COMMAND, now=1) == 0  # Komenda bez zakresu globalnego
+    assert tracker.remaining('inny_kanal', 'pb', 'b', GLOBAL, now=1) == 0
+
+
+def test_longest_running_scope_wins():
+    tracker = CooldownTracker()
+    tracker.start('kanal', 'deaths', 'a', ALL, now=0)
+    assert tracker.remaining('kanal', 'deaths', 'a', ALL, now=1) == 59  # Użytkownik
+    assert tracker.remaining('kanal', 'deaths', 'b', ALL, now=1) == 4  # Komenda
+    assert tracker.remaining('kanal', 'pb', 'b', ALL, now=1) == 1  # Globalny
+    assert tracker.remaining('kanal', 'pb', 'b', ALL, now=2) == 0
+
+
+def test_restart_extends_and_old_heap_entry_does_not_expire_it():
+    tracker = CooldownTracker()
+    tracker.start('kanal', 'deaths', 'a', COMMAND, now=0)
+    tracker.start('kanal', 'deaths', 'a', COMMAND, now=4)
+    assert tracker.remaining('kanal', 'deaths', 'b', COMMAND, now=6) == 3
+    assert len(tracker) == 1
+
+
+def test_expired_entries_are_purged():
+    tracker = CooldownTracker()
+    for i in range(100):
+        tracker.start('kanal', 'deaths', f'u{i}', USER, now=i)
+    tracker.remaining('kanal', 'deaths', 'x', USER, now=130)
+    assert len(tracker) == 29  # Trwają tylko cooldowny rozpoczęte po chwili 70
+    assert tracker.stats()['heap'] == 29
+
+
+def test_max_entries_evicts_earliest_expiring():
+    tracker = CooldownTracker(max_entries=10)
+    for i in range(20):
+        tracker.start('kanal', 'deaths', f'u{i}', USER, now=i)
+    assert len(tracker) == 10
+    assert tracker.evicted == 10
+    assert tracker.remaining('kanal', 'deaths', 'u0', USER, now=20) == 0
+    assert tracker.remaining('kanal', 'deaths', 'u19', USER, now=20) == 59
+
+
+def test_reset_channel():
+    tracker = CooldownTracker()
+    tracker.start('a', 'deaths', 'u', ALL, now=0)
+    tracker.start('b', 'deaths', 'u', ALL, now=0)
+    tracker.reset('a')
+    assert tracker.remaining('a', 'deaths', 'u', ALL, now=1) == 0
+    assert tracker.remaining('b', 'deaths', 'u', ALL, now=1) == 59
+
+
+def test_injected_clock_is_used_by_default():
+    now = [100.0]
+    tracker = CooldownTracker(clock=lambda: now[0])
+    tracker.start('kanal', 'deaths', 'a', COMMAND)
+    now[0] = 103.0
+    assert tracker.remaining('kanal', 'deaths', 'b', COMMAND) == 2
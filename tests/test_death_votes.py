@@ -0,0 +1,80 @@
+from DeathVotes import DeathVotes
+
+WINDOW = 10
+QUORUM = 3
+ABSORB = 3
+
+
+def vote(votes: DeathVotes, user: str, now: float) -> bool:
+    return votes.vote('kanal', user, WINDOW, QUORUM, ABSORB, now=now)
+
+
+def test_quorum_of_different_users_counts_once():
+    votes = DeathVotes()
+    assert [vote(votes, user, t) for t, user in enumerate(('a', 'b', 'c'))] == [False, False, True]
+    assert votes.pending('kanal') == 0
+
+
+def test_repeated_vote_of_one_user_is_not_a_quorum():
+    votes = DeathVotes()
+    assert not any(vote(votes, 'a', t) for t in range(5))
+    assert votes.pending('kanal') == 1
+
+
+def test_flood_within_absorb_gives_no_second_death():
+    votes = DeathVotes()
+    for user in ('a', 'b', 'c'):
+        vote(votes, user, 0)
+    assert not any(vote(votes, f'u{i}', 0.05 * i) for i in range(40))
+    assert votes.pending('kanal') == 0  # Spóźnione głosy nie zaczynają nowego quorum
+
+
+def test_quorum_member_repeat_later_in_window_is_ignored():
+    votes = DeathVotes()
+    for user in ('a', 'b', 'c'):
+        vote(votes, user, 0)
+    assert not vote(votes, 'a', 5)
+    assert not vote(votes, 'b', 6)
+    assert not vote(votes, 'x', 7)
+    assert votes.pending('kanal') == 1  # Tylko 'x' czeka na quorum
+
+
+def test_new_quorum_after_absorb_counts_second_death():
+    votes = DeathVotes()
+    for user in ('a', 'b', 'c'):
+        vote(votes, user, 0)
+    assert [vote(votes, user, 5) for user in ('d', 'e', 'f')] == [False, False, True]
+
+
+def test_votes_expire_after_window():
+    votes = DeathVotes()
+    vote(votes, 'a', 0)
+    vote(votes, 'b', 1)
+    assert not vote(votes, 'c', 10.5)  # Głos 'a' wypadł z okna
+    assert votes.pending('kanal') == 2
+    assert vote(votes, 'd', 10.9)  # 'b' (chwila 1) jeszcze w oknie
+
+
+def test_quorum_members_count_again_after_window():
+    votes = DeathVotes()
+    for user in ('a', 'b', 'c'):
+        vote(votes, user, 0)
+    assert [vote(votes, user, WINDOW) for user in ('a', 'b', 'c')] == [False, False, True]
+
+
+def test_channels_are_separate():
+    votes = DeathVotes()
+    for user in ('a', 'b'):
+        vote(votes, user, 0)
+    assert not votes.vote('inny', 'c', WINDOW, QUORUM, ABSORB, now=0)
+    assert vote(votes, 'c', 0)
+
+
+def test_injected_clock_is_used_by_default():
+    now = [100.0]
+    votes = DeathVotes(clock=lambda: now[0])
+    assert votes.vote('kanal', 'a', WINDOW, 1, ABSORB)
+    now[0] = 102.0
+    assert not votes.vote('kanal', 'b', WINDOW, 1, ABSORB)
+    now[0] = 103.0
+    assert votes.vote('kanal', 'b', WINDOW, 1, ABSORB)
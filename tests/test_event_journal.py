@@ -0,0 +1,153 @@
+import json
+import time
+from dataclasses import replace
+
+import pytest
+
+from ChannelState import BOSS_NONE, BOSS_PAUSED, BOSS_RUNNING, ChannelState
+from ConfigSnapshot import build_snapshot, default_config
+from EventJournal import EventJournal
+
+
+@pytest.fixture
+def config():
+    return build_snapshot(default_config())
+
+
+@pytest.fixture(autouse=True)
+def in_tmp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Pliki kanałów ('<kanał>.txt') są względne
+    return tmp_path
+
+
+def restored(config, channel='kanal', **kwargs) -> ChannelState:
+    state = ChannelState(channel, config)
+    assert EventJournal().restore(state, **kwargs)
+    return state
+
+
+def test_nothing_to_restore(config):
+    assert not EventJournal().restore(ChannelState('kanal', config))
+
+
+def test_replay_restores_latest_state(config):
+    state = ChannelState('kanal', config)
+    journal = EventJournal()
+    for _ in range(3):
+        state.add_deaths(1)
+        journal.append(state, 'death+', 'mod')
+    state.add_deaths(-1)
+    journal.append(state, 'death-', 'mod')
+    journal.close()
+
+    assert restored(config).deaths == 2
+    with open('kanal.journal', encoding='utf-8') as file:
+        assert [json.loads(line)['seq'] for line in file] == [1, 2, 3, 4]
+
+
+def test_snapshot_compacts_journal_and_seq_continues(config):
+    state = ChannelState('kanal', config)
+    journal = EventJournal(snapshot_every=3)
+    for _ in range(4):
+        state.add_deaths(1)
+        journal.append(state, 'death+', 'mod')
+    journal.close()
+
+    with open('kanal.snapshot.json', encoding='utf-8') as file:
+        assert json.load(file)['seq'] == 3
+    with open('kanal.journal', encoding='utf-8') as file:
+        assert [json.loads(line)['seq'] for line in file] == [4]
+
+    state = ChannelState('kanal', config)
+    journal = EventJournal()
+    journal.restore(state)
+    assert state.deaths == 4
+    state.add_deaths(1)
+    journal.append(state, 'death+', 'mod')
+    journal.close()
+    assert restored(config).deaths == 5
+
+
+def test_damaged_last_line_falls_back_to_previous_record(config):
+    state = ChannelState('kanal', config)
+    journal = EventJournal()
+    state.set_deaths(10)
+    journal.append(state, 'setdeaths', 'mod')
+    journal.close()
+    with open('kanal.journal', 'a', encoding='utf-8') as file:
+        file.write('{"seq": 2, "dea')  # Urwany zapis po awarii
+
+    assert restored(config).deaths == 10
+
+
+def test_running_boss_comes_back_paused_with_its_time(config):
+    state = ChannelState('kanal', config)
+    state.start_boss('Malenia')
+    state.add_deaths(2)
+    state.restore(replace(state.view, boss_base=125.0, boss_since=time.monotonic()))
+    journal = EventJournal()
+    journal.append(state, 'death+', 'mod')
+    journal.close()
+
+    state = restored(config)
+    assert state.view.boss == BOSS_PAUSED
+    assert (state.boss_name, state.deaths, state.deaths_boss) == ('Malenia', 2, 2)
+    assert state.boss_timer == '00:02:05'
+    state.resume_boss()
+    assert state.view.boss == BOSS_RUNNING
+
+
+def test_handoff_keeps_running_boss_ticking(config):
+    state = ChannelState('kanal', config)
+    state.start_boss('Malenia')
+    journal = EventJournal()
+    journal.append(state, 'startboss', 'mod')
+    journal.close()
+
+    state = restored(config, handoff=True)
+    assert state.boss_running
+    assert state.view.boss_since is not None
+
+
+def test_crash_takes_newer_boss_time_from_channel_file(config):
+    state = ChannelState('kanal', config)
+    state.start_boss('Malenia')
+    journal = EventJournal()
+    journal.append(state, 'startboss', 'mod')  # Dziennik zna tylko 0 s walki
+    with open('kanal.txt', 'w', encoding='utf-8') as file:  # Plik odświeżany co sekundę aż do awarii
+        file.write('śmierci: 0\n\nboss: Malenia\nśmierci: 0\nczas: 00:07:00')
+
+    assert restored(config).boss_timer == '00:07:00'
+
+
+def test_channel_file_of_another_fight_is_ignored(config):
+    state = ChannelState('kanal', config)
+    state.start_boss('Malenia')
+    EventJournal().append(state, 'startboss', 'mod')
+    with open('kanal.txt', 'w', encoding='utf-8') as file:
+        file.write('śmierci: 0\n\nboss: Radahn\nśmierci: 0\nczas: 00:07:00')
+
+    assert restored(config).boss_timer == '00:00:00'
+
+
+def test_close_snapshots_ticking_boss_without_new_events(config):
+    state = ChannelState('kanal', config)
+    state.start_boss('Malenia')
+    journal = EventJournal()
+    journal.append(state, 'startboss', 'mod')
+    journal.snapshot(state)
+    state.restore(replace(state.view, boss_base=300.0))  # Timer tykał dalej bez komend
+    journal.close([state])
+
+    assert restored(config).boss_timer == '00:05:00'
+
+
+def test_finished_boss_is_restored_as_none(config):
+    state = ChannelState('kanal', config)
+    state.start_boss('Malenia')
+    state.finish_boss()
+    journal = EventJournal()
+    journal.append(state, 'finishboss', 'mod')
+    journal.close()
+
+    assert restored(config).view.boss == BOSS_NONE
@@ -0,0 +1,61 @@
+import pytest
+
+from ChannelState import ChannelState
+from ConfigSnapshot import build_snapshot, default_config
+from TwitchBot import TwitchBot
+
+
+@pytest.fixture
+def bot():
+    """Bot bez połączenia i konfiguracji z pliku: szybka ścieżka potrzebuje tylko tabeli kanałów."""
+    bot = TwitchBot.__new__(TwitchBot)
+    bot.channels = {'kanal': ChannelState('kanal', build_snapshot(default_config()))}
+    bot.counted = []
+    bot.count_chat_message = lambda state, user, emotes='', text='', offset=0: bot.counted.append(
+        (state.channel, user, emotes, text[offset:]))
+    return bot
+
+
+TAGS = '@badge-info=;badges=;color=;display-name=Widz;emotes=25:0-4/1902:6-10;id=abc;mod=0'
+
+
+@pytest.mark.parametrize('line, counted', [
+    (f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :Kappa Keepo hej',
+     ('kanal', 'widz', '25:0-4/1902:6-10', 'Kappa Keepo hej')),
+    ('@badges=;emotes=;mod=0 :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :hej',
+     ('kanal', 'widz', '', 'hej')),
+    ('@badges=;emotes=25:0-4 :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :Kappa',  # emotes ostatnim tagiem
+     ('kanal', 'widz', '25:0-4', 'Kappa')),
+    (':widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :bez tagów',
+     ('kanal', 'widz', '', 'bez tagów')),
+    ('@badges=;user-emotes=1:0-1 :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :hej',  # Nie tag emotes
+     ('kanal', 'widz', '', 'hej')),
+])
+def test_plain_message_is_counted(bot, line, counted):
+    assert bot.handle_chat_fast(line)
+    assert bot.counted == [counted]
+
+
+@pytest.mark.parametrize('line', [
+    f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :!deaths',  # Komenda
+    f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :',  # Pusty tekst
+    f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal : hej',  # Tekst od spacji
+    f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #inny :hej',  # Nieznany kanał
+    ':tmi.twitch.tv NOTICE #kanal :widz PRIVMSG #kanal :hej',  # ' PRIVMSG #' w tekście innego polecenia
+    '@msg-id=x :tmi.twitch.tv USERNOTICE #kanal :a PRIVMSG #kanal :b',
+    f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal',  # Bez tekstu
+    'PING :tmi.twitch.tv',
+])
+def test_other_lines_take_full_path(bot, line):
+    assert not bot.handle_chat_fast(line)
+    assert bot.counted == []
+
+
+def test_emote_names_come_from_the_line(bot):
+    state = bot.channels['kanal']
+    line = f'{TAGS} :widz!widz@widz.tmi.twitch.tv PRIVMSG #kanal :Kappa Keepo hej'
+    bot.count_chat_message = lambda state, user, emotes='', text='', offset=0: state.chat.record(
+        0.0, user, None, emotes, text, offset)
+    assert bot.handle_chat_fast(line)
+    assert state.chat.emote_names == {'25': 'Kappa', '1902': 'Keepo'}
+    assert state.chat.summary(0.0)['top_emotes'] == 'Kappa ×1, Keepo ×1'
@@ -0,0 +1,80 @@
+import pytest
+
+from IrcMessage import parse, parse_tags, unescape_tag_value
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('plain', 'plain'),
+    (r'a\sb', 'a b'),
+    (r'a\:b', 'a;b'),
+    (r'a\\b', 'a\\b'),
+    (r'line\r\n', 'line\r\n'),
+    (r'\x', 'x'),  # Nieznana sekwencja: sam znak
+    ('end\\', 'end'),  # Samotny '\' na końcu jest pomijany
+    ('', ''),
+])
+def test_unescape_tag_value(raw, expected):
+    assert unescape_tag_value(raw) == expected
+
+
+def test_parse_tags_handles_missing_and_empty_values():
+    assert parse_tags(r'a=1;flag;empty=;msg=hej\sty') == {'a': '1', 'flag': '', 'empty': '', 'msg': 'hej ty'}
+
+
+def test_privmsg_with_tags():
+    msg = parse(r'@badges=moderator/1,subscriber/12;display-name=Ktoś;system-msg=a\sb\:c '
+                ':nick!nick@nick.tmi.twitch.tv PRIVMSG #kanal :!death+ 2')
+    assert msg.command == 'PRIVMSG'
+    assert msg.channel == 'kanal'
+    assert msg.user == 'nick'
+    assert msg.trailing == '!death+ 2'
+    assert msg.badges == {'moderator': '1', 'subscriber': '12'}
+    assert msg.display_name == 'Ktoś'
+    assert msg.tag('system-msg') == 'a b;c'
+    assert msg.tags['system-msg'] == 'a b;c'
+
+
+def test_tag_lookup_does_not_match_key_suffix():
+    msg = parse('@user-id=1;id=2 :tmi.twitch.tv PRIVMSG #a :x')
+    assert msg.tag('id') == '2'
+    assert msg.tag('user-id') == '1'
+    assert msg.tag('missing', 'default') == 'default'
+
+
+def test_tags_are_decoded_lazily():
+    msg = parse('@a=1 :n!n@n PRIVMSG #a :x')
+    assert msg._tags is None
+    assert msg.tag('a') == '1'
+    assert msg._tags is None
+    assert msg.tags == {'a': '1'}
+
+
+@pytest.mark.parametrize('line, prefix, command, params, trailing', [
+    ('PING :tmi.twitch.tv', None, 'PING', [], 'tmi.twitch.tv'),
+    (':tmi.twitch.tv RECONNECT', 'tmi.twitch.tv', 'RECONNECT', [], None),
+    (':n!n@n JOIN #kanal', 'n!n@n', 'JOIN', ['#kanal'], None),
+    (':tmi.twitch.tv 353 bot = #kanal :a b c', 'tmi.twitch.tv', '353', ['bot', '=', '#kanal'], 'a b c'),
+    (':n!n@n PRIVMSG #kanal :', 'n!n@n', 'PRIVMSG', ['#kanal'], ''),
+    (':n!n@n PRIVMSG #kanal :a :b', 'n!n@n', 'PRIVMSG', ['#kanal'], 'a :b'),
+    ('@a=1 PING :x', None, 'PING', [], 'x'),
+])
+def test_prefix_and_params(line, prefix, command, params, trailing):
+    msg = parse(line)
+    assert (msg.prefix, msg.command, msg.params, msg.trailing) == (prefix, command, params, trailing)
+
+
+@pytest.mark.parametrize('line', ['', '@a=1', ':prefix-only', '@a=1 :prefix-only'])
+def test_incomplete_lines_give_none(line):
+    assert parse(line) is None
+
+
+def test_user_without_prefix():
+    msg = parse('PING :x')
+    assert msg.user is None
+    assert msg.channel is None
+    assert msg.display_name == ''
+
+
+def test_emotes_positions():
+    msg = parse('@emotes=25:0-4,12-16/1902:6-10 :n!n@n PRIVMSG #a :Kappa Keepo Kappa')
+    assert msg.emotes == {'25': [(0, 4), (12, 16)], '1902': [(6, 10)]}
@@ -0,0 +1,85 @@
+from MessageScheduler import (MessageScheduler, SendLog, PRIORITY_BROADCAST, RATE_LIMIT_ELEVATED, RATE_LIMIT_NORMAL,
+                              RATE_WINDOW)
+
+
+def drain(scheduler: MessageScheduler, start: float, until: float) -> list[tuple[float, str, str]]:
+    """Wysyła wszystko, na co pozwala limit, przesuwając zegar do kolejnej chwili wysłania."""
+    now, sent = start, []
+    while now < until:
+        message, wait = scheduler.take(now)
+        if message is not None:
+            sent.append((now, message.channel, message.text))
+            continue
+        if wait is None:
+            break
+        now += max(wait, 0.001)
+    return sent
+
+
+def max_in_window(times: list[float], window: float = RATE_WINDOW) -> int:
+    return max(sum(1 for t in times if start <= t < start + window) for start in times)
+
+
+def test_send_log_allows_limit_then_waits_for_oldest():
+    log = SendLog(3, window=30.0)
+    for t in (0.0, 1.0, 2.0):
+        assert log.delay(t) == 0.0
+        log.take(t)
+    assert log.delay(10.0) == 20.0
+    assert log.delay(30.0) == 0.0
+
+
+def test_backlog_never_exceeds_twitch_limit_in_any_window():
+    scheduler = MessageScheduler(coalesce_window=0)
+    for i in range(100):
+        scheduler.submit('kanal', f'm{i}')
+    sent = drain(scheduler, 1000.0, 1200.0)
+    assert len(sent) == 100
+    assert max_in_window([t for t, _, _ in sent]) == RATE_LIMIT_NORMAL
+
+
+def test_elevated_channel_has_higher_limit_and_normal_channels_keep_theirs():
+    scheduler = MessageScheduler(coalesce_window=0)
+    scheduler.set_elevated('mod', True)
+    for i in range(150):
+        scheduler.submit('mod', f'm{i}')
+        scheduler.submit('zwykly', f'z{i}')
+    sent = drain(scheduler, 1000.0, 1100.0)
+    times = [t for t, _, _ in sent]
+    assert max_in_window(times) == RATE_LIMIT_ELEVATED
+    assert max_in_window([t for t, channel, _ in sent if channel == 'zwykly']) == RATE_LIMIT_NORMAL
+
+
+def test_pending_reply_with_same_key_is_replaced():
+    scheduler = MessageScheduler(coalesce_window=5)
+    assert scheduler.submit('kanal', 'stara', key='deaths')
+    assert not scheduler.submit('kanal', 'nowa', key='deaths')
+    sent = drain(scheduler, 1000.0, 1001.0)
+    assert [text for _, _, text in sent] == ['nowa']
+    assert scheduler.coalesced == 1
+
+
+def test_replies_with_same_key_wait_for_coalesce_window():
+    scheduler = MessageScheduler(coalesce_window=5)
+    scheduler.submit('kanal', 'a', key='deaths')
+    assert scheduler.take(1000.0)[0].text == 'a'
+    scheduler.submit('kanal', 'b', key='deaths')
+    message, wait = scheduler.take(1001.0)
+    assert message is None and wait == 4.0
+    assert scheduler.take(1005.0)[0].text == 'b'
+
+
+def test_replies_go_before_broadcasts():
+    scheduler = MessageScheduler()
+    scheduler.submit('kanal', 'spam', PRIORITY_BROADCAST)
+    scheduler.submit('kanal', 'odpowiedz')
+    assert [text for _, _, text in drain(scheduler, 1000.0, 1001.0)] == ['odpowiedz', 'spam']
+
+
+def test_paused_scheduler_keeps_messages():
+    scheduler = MessageScheduler()
+    scheduler.submit('kanal', 'x')
+    scheduler.pause()
+    assert scheduler.take(1000.0) == (None, None)
+    scheduler.resume()
+    assert scheduler.take(1000.0)[0].text == 'x'